@@ -14,19 +14,43 @@
 # limitations under the License.
 
 
+import base64
+import collections
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+
 import pyarrow as pa
-from modelarts import manifest
-from modelarts.field_name import CARBON
 from pyarrow.filesystem import (_ensure_filesystem)
 from pyarrow.filesystem import (_get_fs_from_path)
 from pyarrow.parquet import ParquetFile
 from six.moves.urllib.parse import urlparse
 
 from pycarbon.core.Constants import LOCAL_FILE_PREFIX
+from pycarbon.core.carbon_arrow_utils import deserialize_arrow_schema, serialize_arrow_schema
+from pycarbon.core.carbon_fs_utils import CarbonFilesystemResolver, get_filesystem_path, list_files_with_status
+from pycarbon.core.carbon_manifest import CarbonManifestResolver
+from pycarbon.core.carbon_predicates import build_carbon_expression
+from pycarbon.core.carbon_split_plan import load_split_plan
 from pycarbon.sdk.ArrowCarbonReader import ArrowCarbonReader
 from pycarbon.sdk.CarbonSchemaReader import CarbonSchemaReader
 from pycarbon.sdk.Configuration import Configuration
 
+# Number of rows handed over at once when a split is read incrementally with CarbonDatasetPiece.iter_batches
+DEFAULT_BATCH_MAX_ROWS = 4096
+
+# Number of configured reader builders kept by a CarbonSplitReaderPool
+DEFAULT_SPLIT_READER_POOL_SIZE = 1024
+
+# Version of the metadata persisted by open_carbon_dataset, a file of another version is ignored
+_PERSISTED_DATASET_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
 
 class CarbonDataset(object):
   def __init__(self, path,
@@ -53,17 +77,17 @@ class CarbonDataset(object):
       self.fs = _ensure_filesystem(filesystem)
 
     self.pieces = list()
+    # hadoop configuration the splits of the dataset are listed with
+    self._hadoop_conf = list()
 
     if self.url_path.scheme == 's3a':
       if key is None or secret is None or endpoint is None:
         raise ValueError('key, secret, endpoint should not be None')
 
       if proxy is None and proxy_port is None:
-        carbon_splits = ArrowCarbonReader().builder(self.path) \
-          .withHadoopConf("fs.s3a.access.key", key) \
-          .withHadoopConf("fs.s3a.secret.key", secret) \
-          .withHadoopConf("fs.s3a.endpoint", endpoint) \
-          .getSplits(True)
+        self._hadoop_conf = [("fs.s3a.access.key", key),
+                             ("fs.s3a.secret.key", secret),
+                             ("fs.s3a.endpoint", endpoint)]
 
         configuration = Configuration()
         configuration.set("fs.s3a.access.key", key)
@@ -73,13 +97,11 @@ class CarbonDataset(object):
         self.configuration = configuration
 
       elif proxy is not None and proxy_port is not None:
-        carbon_splits = ArrowCarbonReader().builder(self.path) \
-          .withHadoopConf("fs.s3a.access.key", key) \
-          .withHadoopConf("fs.s3a.secret.key", secret) \
-          .withHadoopConf("fs.s3a.endpoint", endpoint) \
-          .withHadoopConf("fs.s3a.proxy.host", proxy) \
-          .withHadoopConf("fs.s3a.proxy.port", proxy_port) \
-          .getSplits(True)
+        self._hadoop_conf = [("fs.s3a.access.key", key),
+                             ("fs.s3a.secret.key", secret),
+                             ("fs.s3a.endpoint", endpoint),
+                             ("fs.s3a.proxy.host", proxy),
+                             ("fs.s3a.proxy.port", proxy_port)]
 
         configuration = Configuration()
         configuration.set("fs.s3a.access.key", key)
@@ -93,59 +115,38 @@ class CarbonDataset(object):
         raise ValueError('wrong proxy & proxy_port configuration')
 
       if str(path).endswith(".manifest"):
-        from obs import ObsClient
-        obsClient = ObsClient(access_key_id=key, secret_access_key=secret,
-                              server=str(endpoint).replace('http://', ''),
-                              long_conn_mode=True)
-        sources = manifest.getSources(self.manifest_path, CARBON, obsClient)
-        if sources:
-          self.file_path = sources[0]
-        else:
-          raise Exception("Manifest source can't be None!")
-        carbon_schema = CarbonSchemaReader().readSchema(self.file_path, self.configuration.conf)
+        self._manifest_resolver = CarbonManifestResolver(self.manifest_path, self._hadoop_conf,
+                                                         key=key, secret=secret, endpoint=endpoint)
+        self.file_path = self._manifest_resolver.get_sources()[0]
+        carbon_schema = None
       else:
         carbon_schema = CarbonSchemaReader().readSchema(self.path, self.configuration.conf)
 
-      for split in carbon_splits:
-        # split = self.url_path.scheme + "://" + self.url_path.netloc + split
-        folder_path = path
-        if str(path).endswith(".manifest"):
-          folder_path = str(self.file_path)[0:(str(self.file_path).rindex('/'))]
-        self.pieces.append(CarbonDatasetPiece(folder_path, carbon_schema, split,
-                                              key=key, secret=secret, endpoint=endpoint,
-                                              proxy=proxy, proxy_port=proxy_port))
+      self.schema = self.getArrowSchema()
+      for folder_path, folder_carbon_schema, carbon_splits in self._list_folder_splits(carbon_schema):
+        for split in carbon_splits:
+          self.pieces.append(CarbonDatasetPiece(folder_path, folder_carbon_schema, split,
+                                                key=key, secret=secret, endpoint=endpoint,
+                                                proxy=proxy, proxy_port=proxy_port))
 
     else:
       if str(path).endswith(".manifest"):
-        sources = manifest.getSources(self.manifest_path, CARBON)
-        if sources:
-          self.file_path = sources[0]
-        else:
-          raise Exception("Manifest source can't be None!")
-
-        try:
-          carbon_schema = CarbonSchemaReader().readSchema(self.file_path)
-        except:
-          raise Exception("readSchema has some errors: " + self.file_path)
+        self._manifest_resolver = CarbonManifestResolver(self.manifest_path)
+        self.file_path = self._manifest_resolver.get_sources()[0]
+        carbon_schema = None
       else:
         try:
           carbon_schema = CarbonSchemaReader().readSchema(self.path)
         except:
           raise Exception("readSchema has some errors")
 
-      carbon_splits = ArrowCarbonReader().builder(self.path) \
-        .getSplits(True)
-
-      for split in carbon_splits:
-        # split = self.url_path.scheme + "://" + self.url_path.netloc + split
-        if str(path).endswith(".manifest"):
-          self.pieces.append(
-            CarbonDatasetPiece(str(self.file_path)[0:(str(self.file_path).rindex('/'))], carbon_schema, split))
-        else:
-          self.pieces.append(CarbonDatasetPiece(path, carbon_schema, split))
+      self.schema = self.getArrowSchema()
+      for folder_path, folder_carbon_schema, carbon_splits in self._list_folder_splits(carbon_schema):
+        for split in carbon_splits:
+          self.pieces.append(CarbonDatasetPiece(folder_path, folder_carbon_schema, split))
 
     self.number_of_splits = len(self.pieces)
-    self.schema = self.getArrowSchema()
+    self.total_rows = sum(piece.num_rows for piece in self.pieces)
     # TODO add mechanism to get the file path based on file filter
     self.common_metadata_path = self.url_path.path + '/_common_metadata'
     self.common_metadata = None
@@ -155,6 +156,122 @@ class CarbonDataset(object):
           self.common_metadata = ParquetFile(f).metadata
     except:
       self.common_metadata = None
+    # The key-value metadata of the _common_metadata file, kept when the dataset is persisted
+    self.common_metadata_dict = self.common_metadata.metadata if self.common_metadata else None
+    # Unischema of the dataset, loaded or inferred once by infer_or_load_unischema_carbon
+    self.unischema = None
+
+  def _persisted_state(self):
+    """Returns the metadata of the dataset as a json serializable dict, without any credential.
+
+    The schema, the ``_common_metadata`` key-values and the split key and row count of each piece are kept, which
+    is all a dataset needs until its pieces are read. The pieces look their split up when they are first read.
+    """
+    common_metadata = None
+    if self.common_metadata_dict is not None:
+      common_metadata = [[_b64encode(key), _b64encode(value)] for key, value in self.common_metadata_dict.items()]
+    return {
+      'version': _PERSISTED_DATASET_VERSION,
+      'path': self.path,
+      'file_path': getattr(self, 'file_path', None),
+      'schema': _b64encode(serialize_arrow_schema(self.schema)),
+      'common_metadata': common_metadata,
+      'pieces': [[piece.path, piece.split_key, piece.num_rows] for piece in self.pieces],
+    }
+
+  @classmethod
+  def _from_persisted_state(cls, state, key=None, secret=None, endpoint=None, proxy=None, proxy_port=None,
+                            filesystem=None):
+    """Creates a dataset from the metadata returned by :meth:`_persisted_state`, without reading the dataset.
+
+    :param state: the dict returned by :meth:`_persisted_state`
+    :param key: access key, the credentials are not part of the persisted metadata
+    :param secret: secret key
+    :param endpoint: endpoint_url
+    :param proxy: proxy
+    :param proxy_port: proxy_port
+    :param filesystem: the pyarrow filesystem of the dataset
+    :return: a :class:`CarbonDataset`
+    """
+    if state.get('version') != _PERSISTED_DATASET_VERSION:
+      raise ValueError('Unsupported version of persisted dataset metadata: {}'.format(state.get('version')))
+
+    dataset = cls.__new__(cls)
+    dataset.path = state['path']
+    dataset.url_path = urlparse(dataset.path)
+    dataset.fs = _ensure_filesystem(filesystem)
+    dataset.configuration = None
+    dataset._hadoop_conf = list()
+    if dataset.url_path.scheme == 's3a':
+      dataset._hadoop_conf = _s3a_hadoop_conf(key, secret, endpoint, proxy, proxy_port)
+
+    if str(dataset.path).endswith('.manifest'):
+      dataset.manifest_path = dataset.path
+      if str(dataset.path).startswith(LOCAL_FILE_PREFIX):
+        dataset.manifest_path = str(dataset.path)[len(LOCAL_FILE_PREFIX):]
+      if dataset.url_path.scheme == 's3a':
+        dataset._manifest_resolver = CarbonManifestResolver(dataset.manifest_path, dataset._hadoop_conf,
+                                                            key=key, secret=secret, endpoint=endpoint)
+      else:
+        dataset._manifest_resolver = CarbonManifestResolver(dataset.manifest_path)
+      dataset.file_path = state['file_path']
+
+    dataset.schema = deserialize_arrow_schema(_b64decode(state['schema']))
+    dataset.pieces = [CarbonDatasetPiece(piece_path, None, None,
+                                         key=key, secret=secret, endpoint=endpoint,
+                                         proxy=proxy, proxy_port=proxy_port,
+                                         split_key=split_key, num_rows=num_rows)
+                      for piece_path, split_key, num_rows in state['pieces']]
+    dataset.number_of_splits = len(dataset.pieces)
+    dataset.total_rows = sum(piece.num_rows for piece in dataset.pieces)
+    dataset.common_metadata_path = dataset.url_path.path + '/_common_metadata'
+    dataset.common_metadata = None
+    dataset.common_metadata_dict = None
+    if state['common_metadata'] is not None:
+      dataset.common_metadata_dict = dict((_b64decode(key), _b64decode(value))
+                                          for key, value in state['common_metadata'])
+    dataset.unischema = None
+    return dataset
+
+  def get_split_keys(self, carbon_filter):
+    """Lists the splits that may hold rows matching a carbon filter.
+
+    The splits are pruned by the min/max statistics of the blocklets stored in the carbonindex files, so no
+    carbondata file is read.
+
+    :param carbon_filter: a carbon filter (see :func:`~pycarbon.core.carbon_predicates.to_carbon_filter`)
+    :return: a set of the :attr:`CarbonDatasetPiece.split_key` of the splits that may match
+    """
+    if not self.pieces:
+      return set()
+    if str(self.path).endswith('.manifest'):
+      return set(_split_key(split) for _, _, carbon_splits in self._manifest_resolver.list_splits(carbon_filter)
+                 for split in carbon_splits)
+    filter_expression = build_carbon_expression(carbon_filter, self.pieces[0].carbon_schema)
+    carbon_splits = self._create_splits_builder().filter(filter_expression).getSplits(True)
+    return set(_split_key(split) for split in carbon_splits)
+
+  def _list_folder_splits(self, carbon_schema):
+    """Lists the blocklet splits of the dataset, with the folder and the carbon schema of their files.
+
+    The splits of a directory are loaded from its split plan when it is up to date. The splits of the folders of
+    the sources of a manifest are listed concurrently.
+
+    :param carbon_schema: the carbon schema of the dataset directory, ``None`` for a manifest
+    :return: a list of ``(folder, carbon_schema, splits)`` tuples
+    """
+    if str(self.path).endswith('.manifest'):
+      return self._manifest_resolver.list_splits()
+    serialized_splits = load_split_plan(self.fs, self.path, self.schema)
+    if serialized_splits is not None:
+      return [(self.path, carbon_schema, self._create_splits_builder().readSplits(serialized_splits))]
+    return [(self.path, carbon_schema, self._create_splits_builder().getSplits(True))]
+
+  def _create_splits_builder(self):
+    carbon_splits_builder = ArrowCarbonReader().builder(self.path)
+    for key, value in self._hadoop_conf:
+      carbon_splits_builder = carbon_splits_builder.withHadoopConf(key, value)
+    return carbon_splits_builder
 
   def getArrowSchema(self):
     file_path = self.path
@@ -162,12 +279,131 @@ class CarbonDataset(object):
     if str(self.path).endswith(".manifest"):
       file_path = self.file_path
     if self.url_path.scheme == 's3a':
-      buf = CarbonSchemaReader().readSchema(file_path, True, self.configuration.conf).tostring()
-    else:
-      buf = CarbonSchemaReader().readSchema(file_path, True).tostring()
+      return _read_arrow_schema(file_path, self.configuration.conf)
+    return _read_arrow_schema(file_path)
+
+
+def open_carbon_dataset(path,
+                        key=None,
+                        secret=None,
+                        endpoint=None,
+                        proxy=None,
+                        proxy_port=None,
+                        filesystem=None,
+                        metadata_cache_location=None):
+  """Opens a dataset once per process, and optionally once per host.
+
+  Opening a dataset reads its schema twice, lists its splits from all its carbonindex files and reads its
+  ``_common_metadata`` file. The opened datasets are kept by url, filesystem configuration and fingerprint of the
+  listing of the dataset files, sizes and modification times included (or of the content of its manifest), so the
+  dataset is opened again once its files change. The fingerprint only lists the dataset directory, no carbon file
+  is read.
+
+  With a ``metadata_cache_location``, the opened datasets are also persisted to a json file of that local directory,
+  and opening a dataset in another process only reads that file. The file holds no credentials: the dataset loaded
+  from it is given the ones of the caller. The pieces of a persisted dataset list the splits of the dataset again
+  when they are first read, once per process.
+
+  :param path: url of the dataset, as given to :class:`CarbonDataset`
+  :param key: access key
+  :param secret: secret key
+  :param endpoint: endpoint_url
+  :param proxy: proxy
+  :param proxy_port: proxy_port
+  :param filesystem: the pyarrow filesystem of the dataset, resolved from the url by default
+  :param metadata_cache_location: a local directory the opened datasets are persisted in, ``None`` to keep them in
+      this process only
+  :return: a :class:`CarbonDataset`, shared by all the callers opening the same dataset
+  """
+  try:
+    fs = _ensure_filesystem(filesystem) if filesystem is not None else _get_fs_from_path(path)
+    fingerprint = _listing_fingerprint(fs, path)
+  except Exception as e:  # pylint: disable=broad-except
+    logger.debug('Could not fingerprint the files of %s, opening it without cache: %s', path, e)
+    return CarbonDataset(path, key=key, secret=secret, endpoint=endpoint, proxy=proxy, proxy_port=proxy_port,
+                         filesystem=filesystem)
+
+  dataset_key = (path, key, secret, endpoint, proxy, proxy_port, fingerprint)
+  with _opened_datasets_lock:
+    dataset = _opened_datasets.get(dataset_key)
+    if dataset is None:
+      if metadata_cache_location:
+        dataset = _open_persisted_dataset(dataset_key, fs, metadata_cache_location)
+      else:
+        dataset = CarbonDataset(path, key=key, secret=secret, endpoint=endpoint, proxy=proxy, proxy_port=proxy_port,
+                                filesystem=filesystem)
+      _opened_datasets[dataset_key] = dataset
+    return dataset
+
+
+def _open_persisted_dataset(dataset_key, fs, metadata_cache_location):
+  path, key, secret, endpoint, proxy, proxy_port, fingerprint = dataset_key
+  # The file holds json metadata without any credential, named after the dataset only: the dataset is given the
+  # credentials of the caller when it is loaded
+  metadata_path = os.path.join(metadata_cache_location,
+                               hashlib.md5(repr((path, endpoint, fingerprint)).encode('utf-8')).hexdigest() + '.json')
+  if os.path.exists(metadata_path):
+    try:
+      with open(metadata_path, 'rb') as f:
+        state = json.loads(f.read().decode('utf-8'))
+      return CarbonDataset._from_persisted_state(state, key=key, secret=secret, endpoint=endpoint, proxy=proxy,
+                                                 proxy_port=proxy_port, filesystem=fs)
+    except Exception as e:  # pylint: disable=broad-except
+      logger.warning('Could not load the persisted metadata of %s from %s, opening it again: %s', path,
+                     metadata_path, e)
 
-    reader = pa.RecordBatchFileReader(pa.BufferReader(bytes(buf)))
-    return reader.read_all().schema
+  dataset = CarbonDataset(path, key=key, secret=secret, endpoint=endpoint, proxy=proxy, proxy_port=proxy_port,
+                          filesystem=fs)
+  if not os.path.isdir(metadata_cache_location):
+    os.makedirs(metadata_cache_location)
+  # Written to a file of its own, and renamed at once: other processes never load a partially written file
+  temp_path = '{}.{}.tmp'.format(metadata_path, uuid.uuid4().hex)
+  with open(temp_path, 'wb') as f:
+    f.write(json.dumps(dataset._persisted_state()).encode('utf-8'))
+  os.rename(temp_path, metadata_path)
+  return dataset
+
+
+def _listing_fingerprint(fs, path):
+  """Hashes the names, sizes and modification times of the files of a dataset, or the content of its manifest.
+
+  A file rewritten under the same name, e.g. an index file rewritten by a compaction, changes the fingerprint too.
+  The sizes and the modification times come with the listing of each directory, no file is looked up on its own.
+  """
+  fs_path = get_filesystem_path(path)
+
+  digest = hashlib.md5()
+  if str(path).endswith('.manifest'):
+    with fs.open(fs_path, 'rb') as f:
+      digest.update(f.read())
+  else:
+    for file_path, size, modification_time in sorted(list_files_with_status(fs, fs_path)):
+      digest.update('{}:{}:{}\n'.format(file_path, size, modification_time).encode('utf-8'))
+  return digest.hexdigest()
+
+
+def _s3a_hadoop_conf(key, secret, endpoint, proxy=None, proxy_port=None):
+  """Returns the hadoop configuration of the credentials of an obs dataset, as a list of ``(key, value)``"""
+  hadoop_conf = [("fs.s3a.access.key", key),
+                 ("fs.s3a.secret.key", secret),
+                 ("fs.s3a.endpoint", endpoint)]
+  if proxy is not None or proxy_port is not None:
+    hadoop_conf.extend([("fs.s3a.proxy.host", proxy),
+                        ("fs.s3a.proxy.port", proxy_port)])
+  return hadoop_conf
+
+
+def _b64encode(buf):
+  return base64.b64encode(buf).decode('ascii')
+
+
+def _b64decode(text):
+  return base64.b64decode(text.encode('ascii'))
+
+
+# The datasets opened by this process, by url, filesystem configuration and listing fingerprint
+_opened_datasets = dict()
+_opened_datasets_lock = threading.Lock()
 
 
 class CarbonDatasetPiece(object):
@@ -176,14 +412,22 @@ class CarbonDatasetPiece(object):
                secret=None,
                endpoint=None,
                proxy=None,
-               proxy_port=None):
+               proxy_port=None,
+               split_key=None,
+               num_rows=None):
     self.path = path
     self.url_path = urlparse(path)
-    self.input_split = input_split
-    self.carbon_schema = carbon_schema
-    # TODO get record count from carbonapp based on file
-    self.num_rows = 10000
+    self._input_split = input_split
+    self._carbon_schema = carbon_schema
+    if input_split is not None:
+      # The blocklet splits listed by getSplits(True) carry the row count of the blocklet, loaded from the
+      # carbonindex file along with the other blocklet details, so no carbondata file is opened to count the rows
+      self.num_rows = input_split.getRowCount()
+    else:
+      # A piece of a persisted dataset knows its split by key only, and looks it up when it is first read
+      self.num_rows = num_rows
     self.use_s3 = False
+    self._split_key = split_key
 
     if self.url_path.scheme == 's3a':
       self.use_s3 = True
@@ -204,10 +448,132 @@ class CarbonDatasetPiece(object):
       else:
         raise ValueError('wrong proxy & proxy_port configuration')
 
-  def read_all(self, columns):
+  def __getstate__(self):
+    # The java split and schema can't cross the process boundary: a piece unpickled in a worker process looks
+    # them up again by the split key
+    state = self.__dict__.copy()
+    state['_split_key'] = self.split_key
+    state['_input_split'] = None
+    state['_carbon_schema'] = None
+    return state
+
+  @property
+  def input_split(self):
+    if self._input_split is None:
+      self._attach()
+    return self._input_split
+
+  @property
+  def carbon_schema(self):
+    if self._carbon_schema is None:
+      self._attach()
+    return self._carbon_schema
+
+  def _attach(self):
+    splits, carbon_schema = _list_splits(self.path, self._hadoop_conf(), self.filesystem_config_key)
+    if self._split_key not in splits:
+      # The split plan is used without checking the files of the dataset: it may be older than the split
+      splits, carbon_schema = _list_splits(self.path, self._hadoop_conf(), self.filesystem_config_key,
+                                           use_split_plan=False)
+    if self._split_key not in splits:
+      raise RuntimeError('The split {} is not part of the dataset {} anymore'.format(self._split_key, self.path))
+    self._input_split = splits[self._split_key]
+    self._carbon_schema = carbon_schema
+
+  def _hadoop_conf(self):
+    if not self.use_s3:
+      return []
+    return _s3a_hadoop_conf(self.key, self.secret, self.endpoint, self.proxy, self.proxy_port)
+
+  @property
+  def split_key(self):
+    """A string identifying the input split of the piece: the carbondata file and the blocklet"""
+    if self._split_key is None:
+      self._split_key = _split_key(self.input_split)
+    return self._split_key
+
+  @property
+  def filesystem_config_key(self):
+    """The filesystem configuration the reader of the piece is built with"""
+    if not self.use_s3:
+      return None
+    return self.key, self.secret, self.endpoint, self.proxy, self.proxy_port
+
+  def read_all(self, columns, split_reader_pool=None, carbon_filter=None):
+    """Reads the whole split into a single arrow table.
+
+    :param columns: names of the columns to read, ``None`` to read all the columns
+    :param split_reader_pool: an optional :class:`CarbonSplitReaderPool` used to build the reader
+    :param carbon_filter: an optional carbon filter (see :func:`~pycarbon.core.carbon_predicates.to_carbon_filter`),
+        the blocklets and the rows that don't match it are skipped by the java reader
+    :return: ``pyarrow.Table``
+    """
+    carbon_reader, schema = self._build_reader(columns, split_reader_pool, carbon_filter)
+    data = carbon_reader.read(schema)
+    carbon_reader.close()
+    return data
+
+  def read_row_drop_partition(self, columns, shuffle_row_drop_partition, extra_rows=0, split_reader_pool=None,
+                              carbon_filter=None):
+    """Reads the rows of a row drop partition of the split.
+
+    The partitions are contiguous ranges of rows. Without a carbon filter the ranges are known from the row count
+    of the split, and the java reader stops at the end of the range: the rows after it are never read, and the rows
+    before it are not converted to arrow. With a carbon filter, the rows it selects are only known once read, so
+    the whole split is read and the range is sliced out of it.
+
+    :param columns: names of the columns to read, ``None`` to read all the columns
+    :param shuffle_row_drop_partition: a tuple 2 of the partition to read and the number of partitions
+    :param extra_rows: number of rows of the next partition to read after the rows of the partition
+    :param split_reader_pool: an optional :class:`CarbonSplitReaderPool` used to build the reader
+    :param carbon_filter: an optional carbon filter, the blocklets and the rows that don't match it are skipped
+    :return: ``pyarrow.Table``
+    """
+    this_partition, num_partitions = shuffle_row_drop_partition
+    if num_partitions == 1:
+      return self.read_all(columns, split_reader_pool, carbon_filter)
+
+    if carbon_filter is None:
+      row_offset, row_count = row_drop_partition_range(self.num_rows, this_partition, num_partitions, extra_rows)
+      carbon_reader, schema = self._build_reader(columns, split_reader_pool)
+      data = carbon_reader.readRange(schema, row_offset, row_count)
+      carbon_reader.close()
+      return data
+
+    table = self.read_all(columns, split_reader_pool, carbon_filter)
+    row_offset, row_count = row_drop_partition_range(table.num_rows, this_partition, num_partitions, extra_rows)
+    return table.slice(row_offset, row_count)
+
+  def iter_batches(self, columns, max_rows=DEFAULT_BATCH_MAX_ROWS, split_reader_pool=None, carbon_filter=None):
+    """Reads the split incrementally, as the java reader produces the rows.
+
+    :param columns: names of the columns to read, ``None`` to read all the columns
+    :param max_rows: number of rows after which a batch is handed over
+    :param split_reader_pool: an optional :class:`CarbonSplitReaderPool` used to build the reader
+    :param carbon_filter: an optional carbon filter, the blocklets and the rows that don't match it are skipped
+    :return: a generator of ``pyarrow.RecordBatch`` objects
+    """
+    carbon_reader, schema = self._build_reader(columns, split_reader_pool, carbon_filter)
+    try:
+      while True:
+        table = carbon_reader.readNextBatch(schema, max_rows)
+        if table is None:
+          break
+        for batch in table.to_batches():
+          yield batch
+    finally:
+      carbon_reader.close()
+
+  def _build_reader(self, columns, split_reader_pool=None, carbon_filter=None):
+    if split_reader_pool is not None:
+      return split_reader_pool.build_reader(self, columns, carbon_filter)
+    carbon_reader_builder, schema = self._create_reader_builder(columns, carbon_filter=carbon_filter)
+    return carbon_reader_builder.build(), schema
+
+  def _create_reader_builder(self, columns, carbon_schema_reader=None, carbon_filter=None):
     # rebuilding the reader as need to read specific columns
     carbon_reader_builder = ArrowCarbonReader().builder(self.input_split)
-    carbon_schema_reader = CarbonSchemaReader()
+    carbon_schema_reader = carbon_schema_reader or CarbonSchemaReader()
     if columns is not None:
       carbon_reader_builder = carbon_reader_builder.projection(columns)
       updatedSchema = carbon_schema_reader.reorderSchemaBasedOnProjection(columns, self.carbon_schema)
@@ -219,24 +585,154 @@ class CarbonDatasetPiece(object):
       projection = carbon_schema_reader.getProjectionBasedOnSchema(updatedSchema)
       carbon_reader_builder = carbon_reader_builder.projection(projection)
 
-    if self.use_s3:
-      if self.proxy is None and self.proxy_port is None:
-        carbon_reader = carbon_reader_builder \
-          .withHadoopConf("fs.s3a.access.key", self.key) \
-          .withHadoopConf("fs.s3a.secret.key", self.secret) \
-          .withHadoopConf("fs.s3a.endpoint", self.endpoint) \
-          .build()
+    for key, value in self._hadoop_conf():
+      carbon_reader_builder = carbon_reader_builder.withHadoopConf(key, value)
+
+    if carbon_filter is not None:
+      filter_expression = build_carbon_expression(carbon_filter, self.carbon_schema)
+      carbon_reader_builder = carbon_reader_builder.filter(filter_expression)
+
+    return carbon_reader_builder, updatedSchema
+
+
+def row_drop_partition_range(num_rows, this_partition, num_partitions, extra_rows=0):
+  """Returns the contiguous range of rows of a row drop partition.
+
+  The rows are split into ``min(num_rows, num_partitions)`` ranges of about the same size, so that no partition is
+  empty when there are fewer rows than partitions, but the ones past the number of rows.
+
+  :param num_rows: number of rows being partitioned
+  :param this_partition: index of the partition
+  :param num_partitions: number of partitions
+  :param extra_rows: number of rows following the partition to add to its range
+  :return: a ``(row_offset, row_count)`` tuple
+  """
+  partitions = min(num_rows, num_partitions)
+  if this_partition >= partitions:
+    return num_rows, 0
+  # ceil(partition * num_rows / partitions), exactly, with integers
+  start = -(-this_partition * num_rows // partitions)
+  end = -(-(this_partition + 1) * num_rows // partitions)
+  return start, min(end + extra_rows, num_rows) - start
+
+
+def _split_key(input_split):
+  return '{}:{}'.format(input_split.getFilePath(), input_split.getBlockletId())
+
+
+# The splits and the schema of the datasets the pieces of this process were unpickled from, by (path, hadoop conf)
+_listed_splits = dict()
+_listed_splits_lock = threading.Lock()
+
+
+def _list_splits(path, hadoop_conf, filesystem_config=None, use_split_plan=True):
+  """Lists the splits of a dataset once per process, as a dictionary by split key, along with the carbon schema.
+
+  The splits are loaded from the split plan of the dataset when it has one of the same schema, so the worker
+  processes don't read the carbonindex files either. The files of the dataset were checked against the plan when
+  the dataset was opened: they are not listed again, a split missing from the plan is looked up with
+  ``use_split_plan=False``.
+
+  :param path: url of the dataset
+  :param hadoop_conf: list of the ``(key, value)`` hadoop configuration the splits are listed with
+  :param filesystem_config: the :attr:`CarbonDatasetPiece.filesystem_config_key` of the pieces of the dataset
+  :param use_split_plan: whether the splits may be loaded from the split plan of the dataset
+  """
+  key = (path, tuple(hadoop_conf), use_split_plan)
+  with _listed_splits_lock:
+    if key not in _listed_splits:
+      configuration = None
+      if hadoop_conf:
+        configuration = Configuration()
+        for conf_key, conf_value in hadoop_conf:
+          configuration.set(conf_key, conf_value)
+        carbon_schema = CarbonSchemaReader().readSchema(path, conf=configuration.conf)
       else:
-        carbon_reader = carbon_reader_builder \
-          .withHadoopConf("fs.s3a.access.key", self.key) \
-          .withHadoopConf("fs.s3a.secret.key", self.secret) \
-          .withHadoopConf("fs.s3a.endpoint", self.endpoint) \
-          .withHadoopConf("fs.s3a.proxy.host", self.proxy) \
-          .withHadoopConf("fs.s3a.proxy.port", self.proxy_port) \
-          .build()
-    else:
-      carbon_reader = carbon_reader_builder.build()
+        carbon_schema = CarbonSchemaReader().readSchema(path)
+
+      carbon_splits_builder = ArrowCarbonReader().builder(path)
+      for conf_key, conf_value in hadoop_conf:
+        carbon_splits_builder = carbon_splits_builder.withHadoopConf(conf_key, conf_value)
+      serialized_splits = None
+      if use_split_plan:
+        serialized_splits = _load_dataset_split_plan(path, filesystem_config, configuration)
+      if serialized_splits is not None:
+        carbon_splits = carbon_splits_builder.readSplits(serialized_splits)
+      else:
+        carbon_splits = carbon_splits_builder.getSplits(True)
+      splits = dict((_split_key(split), split) for split in carbon_splits)
+      _listed_splits[key] = (splits, carbon_schema)
+    return _listed_splits[key]
 
-    data = carbon_reader.read(updatedSchema)
-    carbon_reader.close()
-    return data
+
+def _load_dataset_split_plan(path, filesystem_config, configuration):
+  """Loads the serialized splits of the split plan of a dataset, ``None`` if it has no up to date split plan"""
+  try:
+    if filesystem_config is not None:
+      fs = CarbonFilesystemResolver(path, *filesystem_config).filesystem()
+    else:
+      fs = _get_fs_from_path(path)
+    schema = _read_arrow_schema(path, configuration.conf if configuration is not None else None)
+  except Exception as e:  # pylint: disable=broad-except
+    logger.debug('Could not look the split plan of %s up, listing its splits: %s', path, e)
+    return None
+  return load_split_plan(fs, path, schema, check_files=False)
+
+
+def _read_arrow_schema(path, conf=None):
+  """Reads the arrow schema of the carbon files of a path"""
+  if conf is not None:
+    buf = CarbonSchemaReader().readSchema(path, True, conf).tostring()
+  else:
+    buf = CarbonSchemaReader().readSchema(path, True).tostring()
+  reader = pa.RecordBatchFileReader(pa.BufferReader(bytes(buf)))
+  return reader.read_all().schema
+
+
+class CarbonSplitReaderPool(object):
+  """Worker local pool of the configured readers of the splits.
+
+  Building a reader means looking up the java classes, creating a builder, setting the projection and the hadoop
+  configuration on it and reordering the schema by the projection. The pool keeps the configured builders and the
+  projected schemas by (input split, projection, carbon filter, filesystem configuration), so that reading a split
+  again (the predicate reads, the following epochs) only builds the java reader itself.
+
+  The pool is not thread safe: each worker owns its pool and must ``close()`` it when it is shut down.
+  """
+
+  def __init__(self, max_entries=DEFAULT_SPLIT_READER_POOL_SIZE):
+    self._max_entries = max_entries
+    self._entries = collections.OrderedDict()
+    self._carbon_schema_reader = None
+
+  def build_reader(self, piece, columns, carbon_filter=None):
+    """Builds a reader of the piece.
+
+    :param piece: :class:`CarbonDatasetPiece` to read
+    :param columns: names of the columns to read, ``None`` to read all the columns
+    :param carbon_filter: an optional carbon filter the reader is configured with
+    :return: a tuple of the built :class:`ArrowCarbonReader` and the carbon schema of the projection
+    """
+    key = (piece.split_key, tuple(columns) if columns is not None else None, carbon_filter,
+           piece.filesystem_config_key)
+    entry = self._entries.pop(key, None)
+    if entry is None:
+      if self._carbon_schema_reader is None:
+        self._carbon_schema_reader = CarbonSchemaReader()
+      entry = piece._create_reader_builder(columns, self._carbon_schema_reader, carbon_filter)
+      if len(self._entries) >= self._max_entries:
+        self._entries.popitem(last=False)
+    # keep the most recently used entries at the end
+    self._entries[key] = entry
+
+    carbon_reader_builder, schema = entry
+    # the builder keeps the reader it built, so build from a copy to keep the pooled builder untouched
+    return copy.copy(carbon_reader_builder).build(), schema
+
+  def close(self):
+    """Releases all the pooled builders and schemas."""
+    self._entries.clear()
+    self._carbon_schema_reader = None
+
+  def size(self):
+    return len(self._entries)
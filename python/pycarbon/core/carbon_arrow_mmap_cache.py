@@ -0,0 +1,188 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import division
+
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import pyarrow as pa
+
+from petastorm.cache import CacheBase
+
+_CACHE_FILE_SUFFIX = '.arrow'
+
+
+class ArrowMmapCache(CacheBase):
+  def __init__(self, path, size_limit_bytes, cleanup=False):
+    """ArrowMmapCache keeps the arrow tables read by the workers in arrow IPC files of a local directory.
+
+    A cached table is memory mapped: it is read without being deserialized or copied to the heap, and the pages of
+    its buffers are shared through the page cache by all the processes reading it. The least recently used files
+    are removed once the files of the cache use more than ``size_limit_bytes`` of the disk. The files of a previous
+    run found in the directory are reused.
+
+    Each process of a process pool tracks the files it reads and writes, so the size limit is enforced by every
+    process separately.
+
+    :param path: Path of the directory the arrow files are stored in.
+    :param size_limit_bytes: Maximal size of the disk-space to be used by cache. A table larger than the limit is
+                             returned without being cached. ``None`` doesn't limit the size of the cache.
+    :param cleanup: If set to True, cache directory would be removed when cleanup() method is called.
+    """
+    if not path:
+      raise ValueError('cache_location must be set for an arrow-mmap cache')
+    if size_limit_bytes is not None and size_limit_bytes < 0:
+      raise ValueError('size_limit_bytes must be a non negative number, got {}'.format(size_limit_bytes))
+    self._path = path
+    self._size_limit_bytes = size_limit_bytes
+    self._cleanup = cleanup
+    self._init_state()
+
+  def _init_state(self):
+    if not os.path.isdir(self._path):
+      try:
+        os.makedirs(self._path)
+      except OSError:
+        # Created by another process in the meantime
+        if not os.path.isdir(self._path):
+          raise
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+    self._evictions = 0
+    self._scan_files()
+
+  def _scan_files(self):
+    """Lists the cached files of the directory, from the least to the most recently modified"""
+    # file name -> size in bytes, from the least to the most recently used
+    self._files = OrderedDict()
+    self._size_bytes = 0
+    file_stats = []
+    for name in os.listdir(self._path):
+      if name.endswith(_CACHE_FILE_SUFFIX):
+        try:
+          file_stats.append((name, os.stat(os.path.join(self._path, name))))
+        except OSError:
+          # Evicted by another process
+          pass
+    for name, file_stat in sorted(file_stats, key=lambda name_stat: name_stat[1].st_mtime):
+      self._files[name] = file_stat.st_size
+      self._size_bytes += file_stat.st_size
+
+  def __getstate__(self):
+    # Each worker process lists the files of the directory again
+    return {'path': self._path, 'size_limit_bytes': self._size_limit_bytes, 'cleanup': self._cleanup}
+
+  def __setstate__(self, state):
+    self._path = state['path']
+    self._size_limit_bytes = state['size_limit_bytes']
+    self._cleanup = state['cleanup']
+    self._init_state()
+
+  def get(self, key, fill_cache_func):
+    name = hashlib.md5(key.encode('utf-8')).hexdigest() + _CACHE_FILE_SUFFIX
+    table = self._read(name)
+    if table is None:
+      table = self._fill(name, fill_cache_func)
+    return table
+
+  def _fill(self, name, fill_cache_func):
+    """Loads a table missing from the cache and writes it to its file"""
+    with self._lock:
+      self._misses += 1
+    table = fill_cache_func()
+    if not isinstance(table, pa.Table):
+      raise TypeError('An arrow-mmap cache can only cache pyarrow tables, got {}'.format(type(table)))
+    self._write(name, table)
+    return table
+
+  def _read(self, name):
+    """Memory maps a cached table, ``None`` if it is not cached"""
+    try:
+      source = pa.memory_map(os.path.join(self._path, name), 'r')
+    except (IOError, OSError):
+      return None
+    table = pa.RecordBatchFileReader(source).read_all()
+
+    with self._lock:
+      file_size = self._files.pop(name, None)
+      if file_size is None:
+        # Written by another process
+        file_size = source.size()
+        self._size_bytes += file_size
+      # Reinserted as the most recently used file
+      self._files[name] = file_size
+      self._hits += 1
+    return table
+
+  def _write(self, name, table):
+    # Written to a file of its own, and renamed at once: the readers never see a partially written table
+    temp_path = os.path.join(self._path, '{}.{}.tmp'.format(name, uuid.uuid4().hex))
+    sink = pa.OSFile(temp_path, 'wb')
+    try:
+      writer = pa.RecordBatchFileWriter(sink, table.schema)
+      writer.write_table(table)
+      writer.close()
+    finally:
+      sink.close()
+    file_size = os.path.getsize(temp_path)
+
+    if self._size_limit_bytes is not None and file_size > self._size_limit_bytes:
+      os.remove(temp_path)
+      return
+
+    with self._lock:
+      os.rename(temp_path, os.path.join(self._path, name))
+      self._size_bytes += file_size - self._files.pop(name, 0)
+      self._files[name] = file_size
+      if self._size_limit_bytes is not None:
+        while self._size_bytes > self._size_limit_bytes:
+          evicted_name, evicted_size = self._files.popitem(last=False)
+          # The tables memory mapped from the file stay readable until they are released
+          try:
+            os.remove(os.path.join(self._path, evicted_name))
+          except OSError:
+            # Evicted by another process
+            pass
+          self._size_bytes -= evicted_size
+          self._evictions += 1
+
+  def cleanup(self):
+    if self._cleanup:
+      shutil.rmtree(self._path, ignore_errors=True)
+
+  def size(self):
+    return len(self._files)
+
+  def size_bytes(self):
+    return self._size_bytes
+
+  @property
+  def diagnostics(self):
+    """Counters of the cache: hits, misses, evictions and the number and the size of the cached files"""
+    with self._lock:
+      return {
+        'cache_hits': self._hits,
+        'cache_misses': self._misses,
+        'cache_evictions': self._evictions,
+        'cache_entries': len(self._files),
+        'cache_size_bytes': self._size_bytes,
+      }
@@ -16,17 +16,20 @@
 
 from __future__ import division
 
-import hashlib
-import operator
-
 import numpy as np
-import pandas as pd
 import pyarrow as pa
 
 from petastorm.cache import NullCache
 from petastorm.workers_pool.worker_base import WorkerBase
 from petastorm.arrow_reader_worker import ArrowReaderWorkerResultsQueueReader
 
+from pycarbon.core.carbon import CarbonSplitReaderPool
+from pycarbon.core.carbon_arrow_utils import filter_table
+from pycarbon.core.carbon_column_cache import CarbonColumnChunkReader
+from pycarbon.core.carbon_jvm import configure_jvm
+from pycarbon.core.carbon_predicates import carbon_field_types, predicate_mask, to_carbon_filter
+from pycarbon.core.carbon_transform import removed_column_names, transform_table
+
 
 class ArrowCarbonReaderWorker(WorkerBase):
   def __init__(self, worker_id, publish_func, args):
@@ -39,6 +42,12 @@ class ArrowCarbonReaderWorker(WorkerBase):
     self._split_pieces = args[4]
     self._local_cache = args[5]
     self._transform_spec = args[6]
+    self._late_materialization = args[7]
+    # The columns a transform spec without func removes are not read at all
+    self._skipped_column_names = removed_column_names(self._transform_spec)
+
+    # A worker process starts its own JVM, configured like the one of the process creating the reader
+    configure_jvm(args[8])
 
     if self._ngram:
       raise NotImplementedError('ngrams are not supported by ArrowReaderWorker')
@@ -47,10 +56,23 @@ class ArrowCarbonReaderWorker(WorkerBase):
     # all Worker constructors are serialized
     self._dataset = None
 
+    # Readers of the pieces are reused across the reads of this worker, until the worker is shut down
+    self._split_reader_pool = CarbonSplitReaderPool()
+    self._carbon_field_types = None
+
+    # With a cache, the columns of the pieces are read through it
+    self._column_chunk_reader = None
+    if not isinstance(self._local_cache, NullCache):
+      self._column_chunk_reader = CarbonColumnChunkReader(self._local_cache, self._dataset_path,
+                                                          self._split_reader_pool)
+
   @staticmethod
   def new_results_queue_reader():
     return ArrowReaderWorkerResultsQueueReader()
 
+  def shutdown(self):
+    self._split_reader_pool.close()
+
   # pylint: disable=arguments-differ
   def process(self, piece_index, worker_predicate, shuffle_row_drop_partition):
     """Main worker function. Loads and returns all rows matching the predicate from a blocklet
@@ -67,25 +89,17 @@ class ArrowCarbonReaderWorker(WorkerBase):
 
     piece = self._split_pieces[piece_index]
 
-    if not isinstance(self._local_cache, NullCache):
-      if worker_predicate:
-        raise RuntimeError('Local cache is not supported together with predicates, '
-                           'unless the dataset is partitioned by the column the predicate operates on.')
-      if shuffle_row_drop_partition[1] != 1:
-        raise RuntimeError('Local cache is not supported together with shuffle_row_drop_partitions > 1')
-
     if worker_predicate:
       all_cols = self._load_rows_with_predicate(piece, worker_predicate, shuffle_row_drop_partition)
+    elif self._column_chunk_reader is None and shuffle_row_drop_partition[1] == 1:
+      # Nothing needs the whole piece at once: publish the batches as they are read, so the memory held by
+      # the worker is bounded by the batch size rather than by the piece size
+      for batch_cols in self._iter_rows(piece):
+        if batch_cols:
+          self.publish_func(batch_cols)
+      return
     else:
-      # Using hash of the dataset path with the relative path in order to:
-      #  1. Make sure if a common cache serves multiple processes (e.g. redis), we don't have conflicts
-      #  2. Dataset path is hashed, to make sure we don't create too long keys, which maybe incompatible with
-      #     some cache implementations
-      #  3. Still leave relative path and the piece_index in plain text to make it easier to debug
-      cache_key = '{}:{}:{}'.format(hashlib.md5(self._dataset_path.encode('utf-8')).hexdigest(),
-                                    piece.path, piece_index)
-      all_cols = self._local_cache.get(cache_key,
-                                       lambda: self._load_rows(piece, shuffle_row_drop_partition))
+      all_cols = self._load_rows(piece, shuffle_row_drop_partition)
 
     if all_cols:
       self.publish_func(all_cols)
@@ -93,18 +107,21 @@ class ArrowCarbonReaderWorker(WorkerBase):
   def _load_rows(self, piece, shuffle_row_drop_range):
     """Loads all rows from a piece"""
 
-    # pyarrow would fail if we request a column names that the dataset is partitioned by, so we strip them from
-    # the `columns` argument.
-    # partitions = self._dataset.partitions
-    column_names_in_schema = list(field.name for field in self._schema.fields.values())
-    # column_names = column_names_in_schema - partitions.partition_names
+    result = self._read_with_shuffle_row_drop(piece, self._read_column_names(), shuffle_row_drop_range)
+    return self._transform(result)
 
-    result = self._read_with_shuffle_row_drop(piece, column_names_in_schema, shuffle_row_drop_range)
+  def _iter_rows(self, piece):
+    """Loads all rows from a piece, one table per batch read"""
+    for batch in piece.iter_batches(self._read_column_names(), split_reader_pool=self._split_reader_pool):
+      yield self._transform(pa.Table.from_batches([batch]))
 
-    if self._transform_spec:
-      result = pa.Table.from_pandas(self._transform_spec.func(result.to_pandas()), preserve_index=False)
+  def _read_column_names(self, needed_column_names=()):
+    """Returns the names of the columns to read, in schema order"""
+    return [field.name for field in self._schema.fields.values()
+            if field.name not in self._skipped_column_names or field.name in needed_column_names]
 
-    return result
+  def _transform(self, table):
+    return transform_table(self._transform_spec, table) if self._transform_spec else table
 
   def _load_rows_with_predicate(self, piece, worker_predicate, shuffle_row_drop_partition):
     """Loads all rows that match a predicate from a piece"""
@@ -127,62 +144,82 @@ class ArrowCarbonReaderWorker(WorkerBase):
                        'are not valid schema names: ({})'.format(', '.join(invalid_column_names),
                                                                  ', '.join(all_schema_names)))
 
+    # Let the carbon reader skip the blocklets and the rows the predicate can't match
+    carbon_filter = self._carbon_filter(piece, worker_predicate)
+
+    if self._late_materialization:
+      return self._load_rows_with_predicate_single_pass(piece, worker_predicate, carbon_filter,
+                                                        shuffle_row_drop_partition)
+
     # Split into 'columns for predicate evaluation' and 'other columns'. We load 'other columns' only if at
     # least one row in the blocklet matched the predicate
-    other_column_names = all_schema_names - predicate_column_names
+    other_column_names = all_schema_names - predicate_column_names - self._skipped_column_names
 
     # Read columns needed for the predicate
     predicate_column_names_list = list(predicate_column_names)
     predicates_table = self._read_with_shuffle_row_drop(piece, predicate_column_names_list,
-                                                        shuffle_row_drop_partition)
+                                                        shuffle_row_drop_partition, carbon_filter)
 
-    predicates_data_frame = predicates_table.to_pandas()
-
-    match_predicate_mask = worker_predicate.do_include(predicates_data_frame)
-    erase_mask = match_predicate_mask.map(operator.not_)
+    match_predicate_mask = np.asarray(predicate_mask(worker_predicate, predicates_table).to_pandas(), dtype=np.bool_)
 
     # Don't have anything left after filtering? Exit early.
-    if erase_mask.all():
+    if not match_predicate_mask.any():
       return []
 
-    predicates_data_frame[erase_mask] = None
-
+    # The selected rows are sliced out of the arrow buffers, the other rows are never copied
+    selected_tables = [filter_table(predicates_table, match_predicate_mask)]
     if other_column_names:
       # Read remaining columns
-      other_column_names_list = list(other_column_names)
-      other_table = self._read_with_shuffle_row_drop(piece, other_column_names_list,
-                                                     shuffle_row_drop_partition)
-      other_data_frame = other_table.to_pandas()
-      other_data_frame[erase_mask] = None
-
-      # Partition-by columns will appear in both other and predicate data frames. Deduplicate.
-      columns_from_predicates = predicates_data_frame.columns.difference(other_data_frame.columns)
-      result_data_frame = pd.merge(predicates_data_frame[columns_from_predicates], other_data_frame,
-                                   copy=False, left_index=True, right_index=True)
-    else:
-      result_data_frame = predicates_data_frame
+      other_table = self._read_with_shuffle_row_drop(piece, list(other_column_names),
+                                                     shuffle_row_drop_partition, carbon_filter)
+      selected_tables.append(filter_table(other_table, match_predicate_mask))
 
-    result = result_data_frame[match_predicate_mask]
+    columns = dict((column.name, column) for table in selected_tables for column in table.columns)
+    result = pa.Table.from_arrays([columns[field.name] for field in self._schema.fields.values()
+                                   if field.name in columns])
+    return self._transform(result)
 
-    if self._transform_spec:
-      result = self._transform_spec.func(result)
+  def _load_rows_with_predicate_single_pass(self, piece, worker_predicate, carbon_filter, shuffle_row_drop_partition):
+    """Loads all rows that match a predicate from a piece, reading the piece only once.
 
-    return pa.Table.from_pandas(result, preserve_index=False)
+    All the columns are read by a single reader, batch by batch. The predicate is evaluated on the predicate
+    columns of a batch first, and only the row ranges it selects are kept from the other columns.
+    """
+    column_names = self._read_column_names(worker_predicate.get_fields())
 
-  def _read_with_shuffle_row_drop(self, piece, column_names, shuffle_row_drop_partition):
-    table = piece.read_all(
-      columns=column_names,
-    )
+    if shuffle_row_drop_partition[1] == 1 and self._column_chunk_reader is None:
+      batches = piece.iter_batches(column_names, split_reader_pool=self._split_reader_pool,
+                                   carbon_filter=carbon_filter)
+    else:
+      batches = self._read_with_shuffle_row_drop(piece, column_names, shuffle_row_drop_partition,
+                                                 carbon_filter).to_batches()
+
+    selected_tables = []
+    for batch in batches:
+      match_predicate_mask = np.asarray(predicate_mask(worker_predicate, batch).to_pandas(), dtype=np.bool_)
+      if match_predicate_mask.any():
+        selected_tables.append(filter_table(batch, match_predicate_mask))
 
-    num_rows = len(table)
-    num_partitions = shuffle_row_drop_partition[1]
-    this_partition = shuffle_row_drop_partition[0]
+    # Don't have anything left after filtering? Exit early.
+    if not selected_tables:
+      return []
 
-    if num_partitions > 1:
-      data_frame_pandas = table.to_pandas()
-      partition_indexes = np.floor(np.arange(num_rows) / (float(num_rows) / min(num_rows, num_partitions)))
+    return self._transform(pa.concat_tables(selected_tables))
 
-      table = pa.Table.from_pandas(data_frame_pandas.loc[partition_indexes == this_partition],
-                                   preserve_index=False)
+  def _carbon_filter(self, piece, worker_predicate):
+    """Translates the predicate into a carbon filter, ``None`` if no part of it can be pushed down"""
+    if self._carbon_field_types is None:
+      self._carbon_field_types = carbon_field_types(piece.carbon_schema)
+    return to_carbon_filter(worker_predicate, self._carbon_field_types)
 
-    return table
+  def _read_with_shuffle_row_drop(self, piece, column_names, shuffle_row_drop_partition, carbon_filter=None):
+    if self._column_chunk_reader is not None:
+      # The cached column chunks hold all the rows of the piece: the rows the carbon filter would have skipped are
+      # dropped by the predicate evaluated on them
+      return self._column_chunk_reader.read_row_drop_partition(piece, column_names, shuffle_row_drop_partition)
+    return piece.read_row_drop_partition(
+      columns=column_names,
+      shuffle_row_drop_partition=shuffle_row_drop_partition,
+      split_reader_pool=self._split_reader_pool,
+      carbon_filter=carbon_filter,
+    )
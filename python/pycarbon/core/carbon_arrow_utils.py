@@ -0,0 +1,89 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""A set of helper functions working on arrow tables and record batches"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+def selected_row_ranges(mask):
+  """Returns the contiguous ranges of selected rows of a selection vector.
+
+  :param mask: a boolean numpy array (or anything convertible to it), one value per row
+  :return: a list of ``(offset, length)`` tuples, in row order
+  """
+  mask = np.asarray(mask, dtype=np.bool_)
+  if not mask.size:
+    return []
+  # Padding with unselected rows on both ends makes every range start and end at a change of the mask value
+  changes = np.flatnonzero(np.diff(np.concatenate(([False], mask, [False])).astype(np.int8)))
+  starts = changes[0::2]
+  ends = changes[1::2]
+  return [(int(start), int(end - start)) for start, end in zip(starts, ends)]
+
+
+def filter_table(table, mask):
+  """Keeps the rows of a table selected by a selection vector.
+
+  The selected rows are sliced out of the original buffers, so the unselected rows are never copied. The result
+  has a chunk per contiguous range of selected rows.
+
+  :param table: ``pyarrow.Table`` or ``pyarrow.RecordBatch``
+  :param mask: a boolean ``pyarrow.Array`` or numpy array (or anything convertible to it), one value per row
+  :return: ``pyarrow.Table`` with the selected rows only
+  """
+  batches = [table] if isinstance(table, pa.RecordBatch) else table.to_batches()
+
+  slices = []
+  batch_offset = 0
+  if isinstance(mask, pa.Array):
+    mask = mask.to_pandas()
+  mask = np.asarray(mask, dtype=np.bool_)
+  for batch in batches:
+    batch_mask = mask[batch_offset:batch_offset + batch.num_rows]
+    batch_offset += batch.num_rows
+    for offset, length in selected_row_ranges(batch_mask):
+      slices.append(batch.slice(offset, length))
+
+  return pa.Table.from_batches(slices, schema=table.schema)
+
+
+def columns_to_pandas(table, column_names):
+  """Converts only some of the columns of a table to a pandas DataFrame.
+
+  :param table: ``pyarrow.Table`` or ``pyarrow.RecordBatch``
+  :param column_names: names of the columns to convert
+  :return: ``pandas.DataFrame`` with the requested columns
+  """
+  data = dict()
+  for name in column_names:
+    data[name] = table.column(table.schema.get_field_index(name)).to_pandas()
+  return pd.DataFrame(data, columns=list(column_names))
+
+
+def serialize_arrow_schema(schema):
+  """Serializes an arrow schema, metadata included, as the bytes of an arrow stream without record batch"""
+  sink = pa.BufferOutputStream()
+  writer = pa.RecordBatchStreamWriter(sink, schema)
+  writer.close()
+  return sink.getvalue().to_pybytes()
+
+
+def deserialize_arrow_schema(buf):
+  """Reads back an arrow schema serialized by :func:`serialize_arrow_schema`"""
+  return pa.open_stream(pa.BufferReader(buf)).schema
@@ -0,0 +1,58 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import abc
+
+import six
+
+from pycarbon.core.carbon_predicates import carbon_field_types, to_carbon_filter
+
+
+@six.add_metaclass(abc.ABCMeta)
+class CarbonBlockletSelectorBase(object):
+  """ Base class for blocklet selectors: a selector picks the blocklets of a dataset to be ventilated """
+
+  @abc.abstractmethod
+  def select_blocklets(self, carbon_dataset):
+    """ Return the indexes of the selected pieces of the dataset
+
+    :param carbon_dataset: :class:`~pycarbon.core.carbon.CarbonDataset` to select the blocklets of
+    :return: an iterable of indexes into ``carbon_dataset.pieces``
+    """
+    pass
+
+
+class MinMaxBlockletSelector(CarbonBlockletSelectorBase):
+  """ Select the blocklets whose min/max statistics may match a predicate.
+
+  The statistics are read by the java sdk from the carbonindex files. The predicate parts that can't be translated
+  into a carbon filter (see :func:`~pycarbon.core.carbon_predicates.to_carbon_filter`) don't prune any blocklet.
+  """
+
+  def __init__(self, predicate):
+    self._predicate = predicate
+
+  def select_blocklets(self, carbon_dataset):
+    all_indexes = range(len(carbon_dataset.pieces))
+    if not carbon_dataset.pieces:
+      return all_indexes
+
+    carbon_filter = to_carbon_filter(self._predicate, carbon_field_types(carbon_dataset.pieces[0].carbon_schema))
+    if carbon_filter is None:
+      return all_indexes
+
+    split_keys = carbon_dataset.get_split_keys(carbon_filter)
+    return [index for index in all_indexes if carbon_dataset.pieces[index].split_key in split_keys]
@@ -0,0 +1,210 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Fills the cache of a reader with the blocklets of a shard of a dataset, before the reader is started.
+
+The blocklets are read by the same code as the reader workers (:class:`.CarbonColumnChunkReader`), so the reader
+finds all the column chunks it needs in the cache. Warming a cache up a second time only reads the blocklets
+missing from it: an interrupted warm-up is resumed by running it again.
+
+Can be run from the command line::
+
+    pycarbon-warm-cache s3a://bucket/dataset --key AK --secret SK --endpoint http://obs.example.com \\
+        --cache-type arrow-mmap --cache-location /mnt/ssd/cache --cur-shard 0 --shard-count 8 --workers 16
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import jnius_config
+
+from pycarbon.core.carbon import open_carbon_dataset
+from pycarbon.core.carbon_column_cache import CarbonColumnChunkReader
+from pycarbon.core.carbon_dataset_metadata import infer_or_load_unischema_carbon
+from pycarbon.core.carbon_fs_utils import CarbonFilesystemResolver, add_obs_arguments
+from pycarbon.core.carbon_local_memory_cache import estimate_size_bytes
+from pycarbon.core.carbon_reader import CarbonDataReader, make_cache
+
+logger = logging.getLogger(__name__)
+
+# Caches that outlive the process warming them up
+PERSISTENT_CACHE_TYPES = ('local-disk', 'arrow-mmap')
+
+
+def warm_cache(dataset_url, cache_type, cache_location,
+               cur_shard=None, shard_count=None,
+               predicate=None, blocklet_selector=None,
+               workers=10,
+               schema_fields=None,
+               cache_size_limit=None, cache_row_size_estimate=None, cache_extra_settings=None,
+               key=None, secret=None, endpoint=None, proxy=None, proxy_port=None,
+               hdfs_driver='libhdfs3',
+               progress_callback=None):
+  """Reads the blocklets of a shard of a dataset into a cache.
+
+  The arguments are the ones of the reader that will use the cache: the blocklets of a shard are the ones read by
+  a reader created with the same ``cur_shard``, ``shard_count``, ``predicate`` and ``blocklet_selector``, as the
+  shards are balanced once the blocklets are pruned. A reader created by ``make_carbon_reader`` with a
+  ``transform_spec`` having a ``func`` doesn't prune the blocklets with its predicate: warm its cache up without
+  the predicate.
+
+  :param dataset_url: an filepath or a url to a carbon directory,
+      e.g. ``'hdfs://some_hdfs_cluster/user/yevgeni/carbon8'``, or ``'file:///tmp/mydataset'``
+      or ``'s3a://bucket/mydataset'``.
+  :param cache_type: A string denoting the cache type, one of ['local-disk', 'arrow-mmap']
+  :param cache_location: A string denoting the location or path of the cache.
+  :param cur_shard: An int denoting the shard to warm the cache up for, ``None`` for the whole dataset.
+  :param shard_count: An int denoting the number of shard partitions there are.
+  :param predicate: instance of predicate object of the reader, the blocklets its min/max statistics can't match
+      are not cached.
+  :param blocklet_selector: instance of :class:`.CarbonBlockletSelectorBase` object of the reader, selecting the
+      blocklets to cache.
+  :param workers: An int for the number of blocklets read at the same time. Defaults to 10
+  :param schema_fields: A list of regex pattern strings. Only columns matching at least one of the
+      patterns in the list are cached. By default all the columns are cached.
+  :param cache_size_limit: An int specifying the size limit of the cache in bytes
+  :param cache_row_size_estimate: An int specifying the estimated size of a row in the dataset
+  :param cache_extra_settings: A dictionary of extra settings to pass to the cache implementation
+  :param key: access key
+  :param secret: secret key
+  :param endpoint: endpoint_url
+  :param proxy: proxy
+  :param proxy_port:  proxy_port
+  :param hdfs_driver: A string denoting the hdfs driver to use (if using a dataset on hdfs).
+  :param progress_callback: A function called with a :class:`WarmupProgress` after each blocklet is read.
+      By default the progress is logged.
+  :return: the :class:`WarmupProgress` of the whole warm-up
+  """
+  if cache_type not in PERSISTENT_CACHE_TYPES:
+    raise ValueError('Only a cache outliving the warm-up can be warmed up, cache_type must be one of {}, got {}'
+                     .format(', '.join(PERSISTENT_CACHE_TYPES), cache_type))
+  if not isinstance(workers, int) or workers < 1:
+    raise ValueError('workers must be a positive integer, got {}'.format(workers))
+
+  # Normalized like by the reader factories: the dataset path is part of the cache keys
+  dataset_url = dataset_url[:-1] if dataset_url[-1] == '/' else dataset_url
+  cache = make_cache(cache_type, cache_location, cache_size_limit, cache_row_size_estimate, cache_extra_settings)
+
+  resolver = CarbonFilesystemResolver(dataset_url, key=key, secret=secret, endpoint=endpoint, proxy=proxy,
+                                      proxy_port=proxy_port, hdfs_driver=hdfs_driver)
+  dataset = open_carbon_dataset(dataset_url, key=key, secret=secret, endpoint=endpoint, proxy=proxy,
+                                proxy_port=proxy_port, filesystem=resolver.filesystem())
+  schema = infer_or_load_unischema_carbon(dataset)
+  if schema_fields:
+    schema = schema.create_schema_view(schema_fields)
+  column_names = [field.name for field in schema.fields.values()]
+
+  # The blocklets of the shard are the ones the reader of the shard reads
+  # pylint: disable=protected-access
+  piece_indexes = CarbonDataReader._filter_blocklets(dataset, predicate, blocklet_selector, cur_shard, shard_count)
+  pieces = [dataset.pieces[piece_index] for piece_index in piece_indexes]
+
+  progress = WarmupProgress(len(pieces), sum(piece.num_rows for piece in pieces))
+  progress_callback = progress_callback or _log_progress
+  chunk_reader = CarbonColumnChunkReader(cache, dataset_url)
+
+  # At most 'workers' blocklets are read and held in memory at the same time
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    futures = [executor.submit(chunk_reader.read_all, piece, column_names) for piece in pieces]
+    for future in as_completed(futures):
+      table = future.result()
+      progress.update(table.num_rows, estimate_size_bytes(table))
+      progress_callback(progress)
+
+  return progress
+
+
+class WarmupProgress(object):
+  """Progress of a cache warm-up: blocklets, rows and bytes read so far, and the throughput"""
+
+  def __init__(self, total_pieces, total_rows):
+    self.total_pieces = total_pieces
+    self.total_rows = total_rows
+    self.pieces = 0
+    self.rows = 0
+    self.bytes = 0
+    self._start_time = time.time()
+
+  def update(self, rows, size_bytes):
+    self.pieces += 1
+    self.rows += rows
+    self.bytes += size_bytes
+
+  @property
+  def elapsed_seconds(self):
+    return time.time() - self._start_time
+
+  @property
+  def rows_per_second(self):
+    return self.rows / max(self.elapsed_seconds, 1e-9)
+
+  @property
+  def bytes_per_second(self):
+    return self.bytes / max(self.elapsed_seconds, 1e-9)
+
+  def __str__(self):
+    return '{}/{} blocklets, {}/{} rows, {:.1f} MB in {:.1f}s ({:.0f} rows/s, {:.1f} MB/s)'.format(
+      self.pieces, self.total_pieces, self.rows, self.total_rows, self.bytes / 2 ** 20, self.elapsed_seconds,
+      self.rows_per_second, self.bytes_per_second / 2 ** 20)
+
+
+def _log_progress(progress):
+  logger.info('Cache warm-up: %s', progress)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Reads the blocklets of a shard of a carbon dataset into a cache')
+  parser.add_argument('dataset_url', type=str, help='url of the carbon dataset')
+  parser.add_argument('--cache-type', type=str, required=True, choices=PERSISTENT_CACHE_TYPES, help='cache type')
+  parser.add_argument('--cache-location', type=str, required=True, help='location of the cache')
+  parser.add_argument('--cache-size-limit', type=int, default=None, help='size limit of the cache in bytes')
+  parser.add_argument('--cache-row-size-estimate', type=int, default=None,
+                      help='estimated size of a row, needed by the local-disk cache')
+  parser.add_argument('--cur-shard', type=int, default=None, help='shard to warm the cache up for')
+  parser.add_argument('--shard-count', type=int, default=None, help='number of shards')
+  parser.add_argument('--workers', type=int, default=10, help='number of blocklets read at the same time')
+  parser.add_argument('--schema-fields', type=str, nargs='+', default=None, help='columns to cache')
+  parser.add_argument('--hdfs-driver', type=str, default='libhdfs3', choices=['libhdfs3', 'libhdfs'],
+                      help='hdfs driver of a dataset on hdfs')
+  add_obs_arguments(parser)
+  parser.add_argument('-c', '--carbon-sdk-path', type=str, default=None, help='carbon sdk path')
+  args = parser.parse_args(argv)
+
+  if args.carbon_sdk_path:
+    jnius_config.set_classpath(args.carbon_sdk_path)
+
+  def print_progress(progress):
+    print('\r{}'.format(progress), end='')
+
+  warm_cache(args.dataset_url, args.cache_type, args.cache_location,
+             cur_shard=args.cur_shard, shard_count=args.shard_count,
+             workers=args.workers,
+             schema_fields=args.schema_fields,
+             cache_size_limit=args.cache_size_limit,
+             cache_row_size_estimate=args.cache_row_size_estimate,
+             key=args.key, secret=args.secret, endpoint=args.endpoint,
+             proxy=args.proxy, proxy_port=args.proxy_port,
+             hdfs_driver=args.hdfs_driver,
+             progress_callback=print_progress)
+  print()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,88 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import hashlib
+from functools import partial
+
+import pyarrow as pa
+
+from pycarbon.core.carbon import row_drop_partition_range
+
+
+class CarbonColumnChunkReader(object):
+  """Reads the columns of the pieces through a cache, a column chunk per cache entry.
+
+  A column chunk is a column of a whole piece, as stored in the carbondata file: it is cached before any predicate
+  or row drop partition is applied to its rows. The same chunks serve the predicate columns and the other columns
+  of a predicate read, every row drop partition of the piece, and the readers reading different projections of the
+  dataset.
+  """
+
+  def __init__(self, cache, dataset_path, split_reader_pool=None):
+    """
+    :param cache: an object conforming to :class:`.CacheBase` interface, the chunks are cached in
+    :param dataset_path: path of the dataset the pieces belong to
+    :param split_reader_pool: an optional :class:`~pycarbon.core.carbon.CarbonSplitReaderPool` used to build the
+        readers of the pieces
+    """
+    self._cache = cache
+    # Using hash of the dataset path with the split key in order to:
+    #  1. Make sure if a common cache serves multiple processes (e.g. redis), we don't have conflicts
+    #  2. Dataset path is hashed, to make sure we don't create too long keys, which maybe incompatible with
+    #     some cache implementations
+    #  3. Still leave the carbondata file, the blocklet and the column in plain text to make it easier to debug
+    self._dataset_key = hashlib.md5(dataset_path.encode('utf-8')).hexdigest()
+    self._split_reader_pool = split_reader_pool
+
+  def read_all(self, piece, columns):
+    """Reads all the rows of some columns of a piece.
+
+    The columns missing from the cache are read from the piece by a single reader.
+
+    :param piece: the :class:`~pycarbon.core.carbon.CarbonDatasetPiece` to read
+    :param columns: names of the columns to read
+    :return: ``pyarrow.Table`` with the columns in the given order
+    """
+    # Columns read along with a column missing from the cache, until their own cache entry is filled
+    read_columns = dict()
+    chunks = []
+    for i, name in enumerate(columns):
+      cache_key = '{}:{}:{}'.format(self._dataset_key, piece.split_key, name)
+      chunks.append(self._cache.get(cache_key, partial(self._load_chunk, piece, name, columns[i:], read_columns)))
+    return pa.Table.from_arrays([chunk.column(0) for chunk in chunks])
+
+  def read_row_drop_partition(self, piece, columns, shuffle_row_drop_partition, extra_rows=0):
+    """Reads the rows of a row drop partition of a piece, sliced out of its cached column chunks.
+
+    :param piece: the :class:`~pycarbon.core.carbon.CarbonDatasetPiece` to read
+    :param columns: names of the columns to read
+    :param shuffle_row_drop_partition: a tuple 2 of the partition to read and the number of partitions
+    :param extra_rows: number of rows of the next partition to read after the rows of the partition
+    :return: ``pyarrow.Table`` with the columns in the given order
+    """
+    table = self.read_all(piece, columns)
+    this_partition, num_partitions = shuffle_row_drop_partition
+    if num_partitions == 1:
+      return table
+    row_offset, row_count = row_drop_partition_range(table.num_rows, this_partition, num_partitions, extra_rows)
+    return table.slice(row_offset, row_count)
+
+  def _load_chunk(self, piece, name, remaining_columns, read_columns):
+    """Fills the cache entry of a column chunk, reading the columns still to be looked up along with it"""
+    if name not in read_columns:
+      table = piece.read_all(list(remaining_columns), self._split_reader_pool)
+      read_columns.update((column.name, column) for column in table.columns)
+    return pa.Table.from_arrays([read_columns.pop(name)])
@@ -0,0 +1,158 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Decodes the unischema fields of an arrow table a column at a time.
+
+Produces the same values as :func:`petastorm.utils.decode_row` applied to every row, but the codec of a field is
+dispatched once per column, and the scalar and the ndarray columns are decoded with a few numpy calls. Row
+dictionaries are built only at the end, from the decoded columns.
+"""
+
+import sys
+from contextlib import contextmanager
+from io import BytesIO
+
+import numpy as np
+import six
+
+from petastorm.codecs import NdarrayCodec, ScalarCodec
+from petastorm.utils import DecodeFieldError
+
+_NPY_HEADER_READERS = {
+  (1, 0): np.lib.format.read_array_header_1_0,
+  (2, 0): np.lib.format.read_array_header_2_0,
+}
+
+
+def decode_columns(table, column_names, schema, decode_pool=None):
+  """Decodes some of the columns of a table.
+
+  :param table: ``pyarrow.Table`` or ``pyarrow.RecordBatch`` with the encoded values
+  :param column_names: names of the columns to decode
+  :param schema: :class:`~petastorm.unischema.Unischema` of the dataset
+  :param decode_pool: a :class:`~pycarbon.core.carbon_decode_pool.CarbonDecodePool` decoding the non scalar
+      columns, all at the same time. By default all the columns are decoded on the calling thread.
+  :return: a dictionary of the list of decoded values, one per row, by column name
+  """
+  decoded_columns = dict()
+  pending_columns = dict()
+  for name in column_names:
+    field = schema.fields[name]
+    column = table.column(table.schema.get_field_index(name))
+    values = np.asarray(column.to_pandas())
+    with _decode_field_error(name):
+      if decode_pool is not None and not isinstance(field.codec, ScalarCodec):
+        pending_columns[name] = decode_pool.submit(field, values, column.null_count)
+      else:
+        decoded_columns[name] = decode_column(field, values, column.null_count)
+
+  for name, pending_column in pending_columns.items():
+    with _decode_field_error(name):
+      decoded_columns[name] = pending_column.result()
+  return decoded_columns
+
+
+def decode_column(field, values, null_count=None):
+  """Decodes the values of a column of a unischema field.
+
+  :param field: :class:`~petastorm.unischema.UnischemaField` of the column
+  :param values: numpy array of the encoded values, ``None`` where there is no value
+  :param null_count: number of ``None`` values, counted when not given
+  :return: list of the decoded values
+  """
+  if null_count is None:
+    null_count = sum(1 for value in values if value is None)
+
+  if null_count:
+    return [None if value is None else field.codec.decode(field, value) for value in values]
+
+  if isinstance(field.codec, ScalarCodec):
+    return _decode_scalars(field, values)
+  if isinstance(field.codec, NdarrayCodec):
+    return _decode_ndarrays(field, values)
+  return [field.codec.decode(field, value) for value in values]
+
+
+def columns_to_rows(decoded_columns):
+  """Builds the row dictionaries out of decoded columns.
+
+  :param decoded_columns: a dictionary returned by :func:`decode_columns`
+  :return: a list of dictionaries, one per row
+  """
+  names = list(decoded_columns.keys())
+  return [dict(zip(names, values)) for values in zip(*[decoded_columns[name] for name in names])]
+
+
+def decode_rows(table, column_names, schema, decode_pool=None):
+  """Decodes some of the columns of a table into row dictionaries, like :func:`petastorm.utils.decode_row` would.
+
+  :param table: ``pyarrow.Table`` or ``pyarrow.RecordBatch`` with the encoded values
+  :param column_names: names of the columns to decode
+  :param schema: :class:`~petastorm.unischema.Unischema` of the dataset
+  :param decode_pool: see :func:`decode_columns`
+  :return: a list of dictionaries, one per row
+  """
+  return columns_to_rows(decode_columns(table, column_names, schema, decode_pool))
+
+
+@contextmanager
+def _decode_field_error(name):
+  try:
+    yield
+  except Exception:  # pylint: disable=broad-except
+    six.reraise(DecodeFieldError, DecodeFieldError('Decoding field "{}" failed'.format(name)), sys.exc_info()[2])
+
+
+def _decode_scalars(field, values):
+  numpy_dtype = field.numpy_dtype
+  # Strings are converted one by one: a numpy string array would strip their trailing null characters.
+  # Anything that isn't a numpy type (e.g. Decimal) is converted by its own constructor, like ScalarCodec does.
+  if isinstance(numpy_dtype, type) and issubclass(numpy_dtype, (np.number, np.bool_)):
+    # list() keeps the numpy scalars ScalarCodec returns, where tolist() would return python scalars
+    return list(values.astype(numpy_dtype))
+  return [numpy_dtype(value) for value in values]
+
+
+def _decode_ndarrays(field, values):
+  """Decodes the .npy blobs of a column with a single copy, when they all have the same header"""
+  if not len(values):
+    return []
+
+  header = _read_npy_header(values[0])
+  if header is not None:
+    header_length, shape, fortran_order, dtype = header
+    header_bytes = bytes(values[0][:header_length])
+    blob_length = len(values[0])
+    # Arrays of python objects are pickled, 0-d arrays would come out of the stacked array as numpy scalars
+    if not dtype.hasobject and not fortran_order and shape and \
+        all(len(value) == blob_length and bytes(value[:header_length]) == header_bytes for value in values):
+      stacked = np.stack([np.frombuffer(value, dtype=dtype, offset=header_length) for value in values])
+      return list(stacked.reshape((len(values),) + shape))
+
+  return [field.codec.decode(field, value) for value in values]
+
+
+def _read_npy_header(blob):
+  """Returns ``(header_length, shape, fortran_order, dtype)`` of a .npy blob, ``None`` if it can't be read"""
+  memfile = BytesIO(blob)
+  try:
+    header_reader = _NPY_HEADER_READERS.get(np.lib.format.read_magic(memfile))
+    if header_reader is None:
+      return None
+    shape, fortran_order, dtype = header_reader(memfile)
+  except ValueError:
+    return None
+  return memfile.tell(), tuple(shape), fortran_order, dtype
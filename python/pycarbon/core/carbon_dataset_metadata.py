@@ -16,6 +16,7 @@
 
 import json
 import logging
+import posixpath
 from contextlib import contextmanager
 
 from six.moves import cPickle as pickle
@@ -28,12 +29,17 @@ from petastorm.unischema import _numpy_and_codec_from_arrow_type
 from petastorm.unischema import UnischemaField
 from petastorm.etl.dataset_metadata import _init_spark, _cleanup_spark
 
-from pycarbon.core.carbon import CarbonDataset
+from pycarbon.core.carbon import CarbonDataset, open_carbon_dataset
 from pycarbon.core import carbon_utils
+from pycarbon.core.carbon_jvm import configure_jvm, get_jvm_config
+from pycarbon.core.carbon_split_plan import write_split_plan
+from pycarbon.sdk.CarbonSchemaReader import CarbonSchemaReader
+from pycarbon.sdk.Configuration import Configuration
 
 logger = logging.getLogger(__name__)
 
 BLOCKLETS_PER_FILE_KEY = b'dataset-toolkit.num_blocklets_per_file.v1'
+BLOCKLET_STATS_PER_FILE_KEY = b'dataset-toolkit.blocklet_stats_per_file.v1'
 UNISCHEMA_KEY = b'dataset-toolkit.unischema.v1'
 
 
@@ -45,7 +51,7 @@ class PycarbonMetadataError(Exception):
 
 @contextmanager
 def materialize_dataset_carbon(spark, dataset_url, schema, blocklet_size_mb=None, use_summary_metadata=False,
-                               pyarrow_filesystem=None):
+                               pyarrow_filesystem=None, persist_split_plan=False):
   """
   A Context Manager which handles all the initialization and finalization necessary
   to generate metadata for a pycarbon dataset. This should be used around your
@@ -82,6 +88,9 @@ def materialize_dataset_carbon(spark, dataset_url, schema, blocklet_size_mb=None
     indexing method. The custom indexing method is more scalable for very large datasets.
   :param pyarrow_filesystem: A pyarrow filesystem object to be used when saving Pycarbon specific metadata to the
     Carbon store.
+  :param persist_split_plan: Whether to write the split plan of the dataset next to its ``_common_metadata`` file,
+    so that the readers load the splits of the dataset from it instead of reading all its carbonindex files (see
+    :mod:`pycarbon.core.carbon_split_plan`).
 
   """
 
@@ -103,6 +112,8 @@ def materialize_dataset_carbon(spark, dataset_url, schema, blocklet_size_mb=None
   _generate_unischema_metadata_carbon(carbon_dataset, schema)
   if not use_summary_metadata:
     _generate_num_blocklets_per_file_carbon(carbon_dataset, spark.sparkContext)
+  if persist_split_plan:
+    write_split_plan(carbon_dataset)
 
   _cleanup_spark(spark, spark_config, blocklet_size_mb)
 
@@ -122,33 +133,73 @@ def _generate_unischema_metadata_carbon(carbon_schema, schema):
 
 def _generate_num_blocklets_per_file_carbon(carbon_dataset, spark_context):
   """
-  Generates the metadata file containing the number of blocklets in each file
-  for the carbon dataset located at the dataset_url. It does this in spark by
-  opening all carbon files in the dataset on the executors and collecting the
-  number of blocklets in each file back on the driver.
+  Generates the metadata of the blocklets of each carbondata file of the carbon dataset: the number of blocklets
+  of each file, and the row count and the size in bytes of each blocklet. It does this in spark by reading the
+  footers of all carbondata files in the dataset on the executors and collecting the statistics of their blocklets
+  back on the driver.
   :param dataset: CarbonDataset
-  :param spark_context: spark context to use for retrieving the number of blocklets
-  in each carbon file in parallel
-  :return: None, upon successful completion the metadata file will exist.
+  :param spark_context: spark context to use for reading the footers of the carbondata files in parallel
+  :return: None, upon successful completion the metadata will be in the _common_metadata file of the dataset.
   """
-  # if not isinstance(dataset.paths, str):
-  #     raise ValueError('Expected dataset.paths to be a single path, not a list of paths')
-  pieces = carbon_dataset.pieces
-  # Get the common prefix of all the base path in order to retrieve a relative path
-  paths = [piece.path for piece in pieces]
+  # The carbondata files of the blocklet splits, the dataset object is not serializable
+  file_paths = sorted(set(piece.split_key.rsplit(':', 1)[0] for piece in carbon_dataset.pieces))
+  if not file_paths:
+    return
+  # The executors start their JVM like the one of the driver, and read the files with the same hadoop configuration
+  jvm_config = get_jvm_config()
+  hadoop_conf = carbon_dataset._hadoop_conf  # pylint: disable=protected-access
+
+  def get_carbon_blocklet_info(file_path):
+    configure_jvm(jvm_config)
+    configuration = Configuration()
+    for key, value in hadoop_conf:
+      configuration.set(key, value)
+    return file_path, CarbonSchemaReader().getBlockletStatistics(file_path, configuration.conf)
+
+  blocklet_statistics = spark_context.parallelize(file_paths, len(file_paths)) \
+    .map(get_carbon_blocklet_info) \
+    .collect()
 
-  # Needed pieces from the dataset must be extracted for spark because the dataset object is not serializable
+  number_of_blocklets = dict()
+  blocklet_stats = dict()
+  for file_path, statistics in blocklet_statistics:
+    relative_path = _relative_file_path(carbon_dataset.path, file_path)
+    number_of_blocklets[relative_path] = len(statistics)
+    blocklet_stats[relative_path] = {'num_rows': [num_rows for num_rows, _ in statistics],
+                                     'size_bytes': [size_bytes for _, size_bytes in statistics]}
 
-  # TODO add number of blocklets for each carbonfile
-  def get_carbon_blocklet_info(path):
-    return path, 1
+  # Add the dicts of the blocklets of each file to the carbon file metadata footer
+  carbon_utils.add_to_dataset_metadata_carbon(carbon_dataset, BLOCKLETS_PER_FILE_KEY, json.dumps(number_of_blocklets))
+  carbon_utils.add_to_dataset_metadata_carbon(carbon_dataset, BLOCKLET_STATS_PER_FILE_KEY, json.dumps(blocklet_stats))
+
+
+def get_blocklet_sizes_carbon(carbon_dataset):
+  """Retrieves the sizes of the blocklets stored as part of dataset metadata.
+
+  :param carbon_dataset: CarbonDataset
+  :return: a dictionary of the size in bytes of each blocklet by :attr:`.CarbonDatasetPiece.split_key`, or ``None``
+      if the dataset metadata doesn't hold the size of every blocklet of the dataset (e.g. files were added to the
+      dataset after it was materialized)
+  """
+  dataset_metadata_dict = carbon_dataset.common_metadata_dict
+  if not dataset_metadata_dict or BLOCKLET_STATS_PER_FILE_KEY not in dataset_metadata_dict:
+    return None
+  blocklet_stats = json.loads(dataset_metadata_dict[BLOCKLET_STATS_PER_FILE_KEY].decode('utf-8'))
+
+  blocklet_sizes = dict()
+  for piece in carbon_dataset.pieces:
+    file_path, blocklet_id = piece.split_key.rsplit(':', 1)
+    file_stats = blocklet_stats.get(_relative_file_path(carbon_dataset.path, file_path))
+    if file_stats is None or int(blocklet_id) >= len(file_stats['size_bytes']):
+      logger.debug('No size of the blocklet %s in the metadata of %s', piece.split_key, carbon_dataset.path)
+      return None
+    blocklet_sizes[piece.split_key] = file_stats['size_bytes'][int(blocklet_id)]
+  return blocklet_sizes
 
-  number_of_blocklets = spark_context.parallelize(paths, len(paths)) \
-    .map(get_carbon_blocklet_info) \
-    .collect()
-  number_of_blocklets_str = json.dumps(dict(number_of_blocklets))
-  # Add the dict for the number of blocklets in each file to the carbon file metadata footer
-  carbon_utils.add_to_dataset_metadata_carbon(carbon_dataset, BLOCKLETS_PER_FILE_KEY, number_of_blocklets_str)
+
+def _relative_file_path(dataset_path, file_path):
+  """The path of a file of a dataset relative to the dataset directory, whatever the scheme of both urls"""
+  return posixpath.relpath(urlparse(file_path).path, urlparse(dataset_path).path)
 
 
 def get_schema_carbon(carbon_dataset):
@@ -157,14 +208,14 @@ def get_schema_carbon(carbon_dataset):
   :param dataset: CarbonDataset
   :return: A :class:`petastorm.unischema.Unischema` object
   """
-  if not carbon_dataset.common_metadata:
+  if not carbon_dataset.common_metadata_dict:
     raise PycarbonMetadataError(
       'Could not find _common_metadata file. Use materialize_dataset(..) in'
       ' pycarbon.etl.carbon_dataset_metadata.py to generate this file in your ETL code.'
       ' You can generate it on an existing dataset using pycarbon-generate-metadata.py')
   # TODO add pycarbon-generate-metadata.py
 
-  dataset_metadata_dict = carbon_dataset.common_metadata.metadata
+  dataset_metadata_dict = carbon_dataset.common_metadata_dict
 
   # Read schema
   if UNISCHEMA_KEY not in dataset_metadata_dict:
@@ -190,7 +241,8 @@ def get_schema_from_dataset_url_carbon(dataset_url,
                                        endpoint=None,
                                        proxy=None,
                                        proxy_port=None,
-                                       filesystem=None):
+                                       filesystem=None,
+                                       metadata_cache_location=None):
   """Returns a :class:`petastorm.unischema.Unischema` object loaded from a dataset specified by a url.
 
   :param dataset_url: A dataset URL
@@ -200,24 +252,33 @@ def get_schema_from_dataset_url_carbon(dataset_url,
   :param proxy: proxy
   :param proxy_port:  proxy_port
   :param filesystem: filesystem
+  :param metadata_cache_location: a local directory the opened dataset is persisted in, see
+      :func:`~pycarbon.core.carbon.open_carbon_dataset`
   :return: A :class:`petastorm.unischema.Unischema` object
   """
 
   # Get a unischema stored in the dataset metadata.
-  stored_schema = get_schema_carbon(CarbonDataset(dataset_url,
-                                                  key=key,
-                                                  secret=secret,
-                                                  endpoint=endpoint,
-                                                  proxy=proxy,
-                                                  proxy_port=proxy_port,
-                                                  filesystem=filesystem))
+  stored_schema = get_schema_carbon(open_carbon_dataset(dataset_url,
+                                                        key=key,
+                                                        secret=secret,
+                                                        endpoint=endpoint,
+                                                        proxy=proxy,
+                                                        proxy_port=proxy_port,
+                                                        filesystem=filesystem,
+                                                        metadata_cache_location=metadata_cache_location))
 
   return stored_schema
 
 
 def infer_or_load_unischema_carbon(carbon_dataset):
   """Try to recover Unischema object stored by ``materialize_dataset`` function. If it can be loaded, infer
-      Unischema from native Carbon schema"""
+      Unischema from native Carbon schema. The Unischema is kept by the dataset, and only loaded once."""
+  if carbon_dataset.unischema is None:
+    carbon_dataset.unischema = _infer_or_load_unischema_carbon(carbon_dataset)
+  return carbon_dataset.unischema
+
+
+def _infer_or_load_unischema_carbon(carbon_dataset):
   try:
     return get_schema_carbon(carbon_dataset)
   except PycarbonMetadataError:
@@ -0,0 +1,76 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from pycarbon.core.carbon_columnar_codecs import decode_column
+
+
+class CarbonDecodePool(object):
+  """Decodes the binary columns of a reader worker on a pool of native threads.
+
+  ``cv2.imdecode`` and the numpy copies of the ndarray blobs release the GIL, so the images and the ndarrays of a
+  table are decoded in parallel, while the worker thread only dispatches them. The decoded arrays are returned to
+  the worker without any copy or serialization, since the threads share its memory.
+
+  The pool is owned by a single worker: the decode concurrency is ``workers_count * decode_workers``, independent
+  of the number of blocklets read at the same time.
+  """
+
+  def __init__(self, decode_workers):
+    """
+    :param decode_workers: number of threads decoding the columns
+    """
+    if not isinstance(decode_workers, int) or decode_workers < 1:
+      raise ValueError('decode_workers must be a positive integer, got {}'.format(decode_workers))
+    self._decode_workers = decode_workers
+    self._executor = ThreadPoolExecutor(max_workers=decode_workers)
+
+  def submit(self, field, values, null_count=None):
+    """Starts decoding the values of a column, split into a chunk per decode thread.
+
+    :param field: :class:`~petastorm.unischema.UnischemaField` of the column
+    :param values: numpy array of the encoded values, ``None`` where there is no value
+    :param null_count: number of ``None`` values, counted when not given
+    :return: a :class:`DecodedColumnFuture` of the list of decoded values
+    """
+    chunk_count = min(self._decode_workers, len(values))
+    if chunk_count <= 1:
+      return DecodedColumnFuture([self._executor.submit(decode_column, field, values, null_count)])
+    return DecodedColumnFuture([self._executor.submit(decode_column, field, chunk)
+                                for chunk in np.array_split(values, chunk_count)])
+
+  def shutdown(self):
+    self._executor.shutdown(wait=True)
+
+
+class DecodedColumnFuture(object):
+  """The pending decode of the chunks of a column"""
+
+  def __init__(self, chunk_futures):
+    self._chunk_futures = chunk_futures
+
+  def result(self):
+    """Waits for all the chunks to be decoded.
+
+    :return: list of the decoded values of the column, in row order
+    """
+    decoded_values = []
+    for chunk_future in self._chunk_futures:
+      decoded_values.extend(chunk_future.result())
+    return decoded_values
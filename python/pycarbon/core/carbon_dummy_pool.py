@@ -0,0 +1,154 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import random
+
+from petastorm.workers_pool import EmptyResultError
+from petastorm.workers_pool.ventilator import Ventilator
+
+
+class SynchronousVentilator(Ventilator):
+  """Ventilates the items one at a time, on the thread of the pool asking for the next one.
+
+  Takes the same items as :class:`~petastorm.workers_pool.ventilator.ConcurrentVentilator`, without the ventilation
+  thread and the ventilation queue bound: an item is ventilated only when :func:`ventilate_next` is called.
+  """
+
+  def __init__(self, ventilate_fn, items_to_ventilate, iterations=1, randomize_item_order=False):
+    super(SynchronousVentilator, self).__init__(ventilate_fn)
+
+    if iterations is not None and (not isinstance(iterations, int) or iterations < 1):
+      raise ValueError('iterations must be positive integer or None')
+
+    if not isinstance(items_to_ventilate, list) or any(not isinstance(item, dict) for item in items_to_ventilate):
+      raise ValueError('items_to_ventilate must be a list of dicts')
+
+    self._items_to_ventilate = items_to_ventilate
+    self._iterations = iterations
+    self._iterations_remaining = iterations
+    self._randomize_item_order = randomize_item_order
+
+    self._current_item_to_ventilate = 0
+    self._stop_requested = False
+
+  def start(self):
+    # Nothing is ventilated ahead of time
+    pass
+
+  def ventilate_next(self):
+    """Ventilates the next item.
+
+    :return: ``False`` if there was no item left to ventilate, ``True`` otherwise
+    """
+    if self.completed():
+      return False
+
+    # If we are ventilating the first item, we check if we would like to randomize the item order
+    if self._current_item_to_ventilate == 0 and self._randomize_item_order:
+      random.shuffle(self._items_to_ventilate)
+
+    item_to_ventilate = self._items_to_ventilate[self._current_item_to_ventilate]
+    self._ventilate_fn(**item_to_ventilate)
+    self._current_item_to_ventilate += 1
+
+    if self._current_item_to_ventilate >= len(self._items_to_ventilate):
+      self._current_item_to_ventilate = 0
+      # If iterations was set to None, that means we will iterate until stop is called
+      if self._iterations_remaining is not None:
+        self._iterations_remaining -= 1
+    return True
+
+  def processed_item(self):
+    pass
+
+  def completed(self):
+    assert self._iterations_remaining is None or self._iterations_remaining >= 0
+    return self._stop_requested or self._iterations_remaining == 0 or not self._items_to_ventilate
+
+  def reset(self):
+    """Restarts the ventilation from the beginning, once all the items were ventilated"""
+    if not self.completed():
+      raise NotImplementedError('Reseting ventilator while ventilating is not supported.')
+
+    self._iterations_remaining = self._iterations
+
+  def stop(self):
+    self._stop_requested = True
+
+
+class CarbonDummyPool(object):
+  """A pool running a single worker on the thread calling :func:`get_results`.
+
+  There is no worker thread, no ventilation thread and no results queue bound: a blocklet is ventilated and processed
+  only when a result is asked for and none is left. This is the cheapest pool when the consumer is already
+  parallel (e.g. a reader per pytorch data loader worker), and keeps the worker code observable by a profiler.
+
+  Must be started with a :class:`SynchronousVentilator`.
+  """
+
+  def __init__(self):
+    self._ventilator_queue = collections.deque()
+    self._results_queue = collections.deque()
+    self._worker = None
+    self._ventilator = None
+    self.workers_count = 1
+
+  def start(self, worker_class, worker_args=None, ventilator=None):
+    self._worker = worker_class(0, self._results_queue.append, worker_args)
+
+    if ventilator:
+      self._ventilator = ventilator
+      self._ventilator.start()
+
+  def ventilate(self, *args, **kargs):
+    """Queues a work item, processed by the next :func:`get_results` call that finds no result."""
+    self._ventilator_queue.append((args, kargs))
+
+  def get_results(self):
+    """Returns the next result, processing the next ventilated items on the caller thread if there is none.
+
+    :return: arguments passed to ``publish_func(...)`` by the worker. If no more results are anticipated,
+             :class:`.EmptyResultError` is raised.
+    """
+    while not self._results_queue:
+      if not self._ventilator_queue:
+        if not self._ventilator or not self._ventilator.ventilate_next():
+          raise EmptyResultError()
+        continue
+
+      args, kargs = self._ventilator_queue.popleft()
+      self._worker.process(*args, **kargs)
+      if self._ventilator:
+        self._ventilator.processed_item()
+
+    return self._results_queue.popleft()
+
+  def stop(self):
+    if self._ventilator:
+      self._ventilator.stop()
+    if self._worker:
+      self._worker.shutdown()
+
+  def join(self):
+    pass
+
+  def results_qsize(self):
+    return len(self._results_queue)
+
+  @property
+  def diagnostics(self):
+    return {'output_queue_size': self.results_qsize()}
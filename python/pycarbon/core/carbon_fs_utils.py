@@ -14,6 +14,8 @@
 # limitations under the License.
 
 
+import os
+
 import pyarrow
 import six
 from six.moves.urllib.parse import urlparse
@@ -163,3 +165,67 @@ class CarbonFilesystemResolver(object):
     :return: The pyarrow filesystem object
     """
     return self._filesystem
+
+
+def get_filesystem_path(dataset_url):
+  """Returns the path of a dataset url in its pyarrow filesystem.
+
+  s3fs expects paths of the form ``bucket/path``, the other filesystems the path of the url.
+
+  :param dataset_url: the url of the dataset
+  :return: the path of the dataset in its filesystem
+  """
+  parsed_dataset_url = urlparse(dataset_url)
+  if parsed_dataset_url.scheme in ('s3', 's3a'):
+    return parsed_dataset_url.netloc + parsed_dataset_url.path
+  return parsed_dataset_url.path
+
+
+def list_files_with_status(fs, fs_path):
+  """Lists the files under a directory, recursively, with their sizes and modification times.
+
+  The sizes and the modification times come with the listing of each directory, so that a remote filesystem
+  is sent a request per directory rather than one per file.
+
+  :param fs: the pyarrow filesystem of the directory
+  :param fs_path: the path of the directory in the filesystem
+  :return: a list of ``(path, size, modification time)`` tuples, the paths being paths of the filesystem and the
+      modification time ``None`` if the filesystem doesn't report it
+  """
+  if isinstance(fs, pyarrow.filesystem.LocalFileSystem):
+    files = []
+    for directory, _, file_names in os.walk(fs_path):
+      for file_name in file_names:
+        file_path = os.path.join(directory, file_name)
+        stat = os.stat(file_path)
+        files.append((file_path, stat.st_size, stat.st_mtime))
+    return files
+
+  # e.g. the S3FSWrapper of s3fs lists the details of the files with the s3fs filesystem it wraps
+  list_directory = fs.fs.ls if isinstance(fs, pyarrow.filesystem.DaskFileSystem) else fs.ls
+  files = []
+  directories = [fs_path]
+  while directories:
+    directory = directories.pop()
+    for entry in list_directory(directory, detail=True):
+      name = entry.get('name', entry.get('Key'))
+      # hdfs lists the files by url
+      path = urlparse(name).path if '://' in name else name
+      if entry.get('kind', entry.get('type', entry.get('StorageClass'))) in ('directory', 'DIRECTORY'):
+        directories.append(path)
+      else:
+        files.append((path, entry.get('size', entry.get('Size')),
+                      entry.get('last_modified', entry.get('LastModified', entry.get('mtime')))))
+  return files
+
+
+def add_obs_arguments(parser):
+  """Adds the options of the credentials of an obs dataset (``s3a://`` urls) to a command line parser.
+
+  :param parser: an ``argparse.ArgumentParser``
+  """
+  parser.add_argument('--key', type=str, default=None, help='access key of obs')
+  parser.add_argument('--secret', type=str, default=None, help='secret key of obs')
+  parser.add_argument('--endpoint', type=str, default=None, help='endpoint of obs')
+  parser.add_argument('--proxy', type=str, default=None, help='proxy host')
+  parser.add_argument('--proxy-port', type=str, default=None, help='proxy port')
@@ -0,0 +1,42 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Helpers to start the JVM of the worker processes like the JVM of the process creating the reader"""
+
+import jnius_config
+
+
+def get_jvm_config():
+  """Returns the classpath and the options of the JVM of this process.
+
+  :return: a picklable ``(classpath, options)`` tuple, to be passed to :func:`configure_jvm` in another process
+  """
+  return list(jnius_config.get_classpath()), list(jnius_config.get_options())
+
+
+def configure_jvm(jvm_config):
+  """Configures the JVM of this process, unless it is already running.
+
+  Must be called before anything imports ``jnius``, as the JVM is started on that import.
+
+  :param jvm_config: a tuple returned by :func:`get_jvm_config`, or ``None`` to keep the default configuration
+  """
+  if jvm_config is None or jnius_config.vm_running:
+    return
+  classpath, options = jvm_config
+  jnius_config.set_classpath(*classpath)
+  if options:
+    jnius_config.set_options(*options)
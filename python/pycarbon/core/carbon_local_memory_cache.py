@@ -16,31 +16,165 @@
 
 from __future__ import division
 
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pyarrow as pa
+import six
+
 from petastorm.cache import CacheBase
 
 
 class LocalMemoryCache(CacheBase):
   def __init__(self, size_limit_bytes):
-    """LocalMemoryCache is an adapter to a diskcache implementation.
+    """LocalMemoryCache keeps the values in the memory of the process, evicting the least recently used ones.
 
     LocalMemoryCache can be used by a pycarbon Reader class to temporarily keep parts of the dataset in local memory.
+    The size of a value is the size of the arrow buffers of a ``pyarrow`` table or record batch, and an estimate of
+    the size of the numpy arrays, strings and other python objects of a list of rows.
+
+    The cache is shared by the threads of a thread pool: a value missing from the cache is loaded once, while the
+    other threads getting the same key wait for it. Each process of a process pool has a cache of its own.
 
-    :param size_limit_bytes: Maximal size of the memory to be used by cache. The size of the cache may actually
-                             grow somewhat above the size_limit_bytes, so the limit is not very strict.
+    :param size_limit_bytes: Maximal size of the memory to be used by cache. A value larger than the limit is returned
+                             without being cached. ``None`` doesn't limit the size of the cache.
     """
+    if size_limit_bytes is not None and size_limit_bytes < 0:
+      raise ValueError('size_limit_bytes must be a non negative number, got {}'.format(size_limit_bytes))
+    self._size_limit_bytes = size_limit_bytes
+    self._init_state()
 
-    self._cache = dict()
+  def _init_state(self):
+    self._lock = threading.Lock()
+    # key -> (value, size in bytes), from the least to the most recently used
+    self._cache = OrderedDict()
+    self._size_bytes = 0
+    # key -> _PendingLoad of the values being loaded
+    self._loading = dict()
+    self._hits = 0
+    self._misses = 0
+    self._evictions = 0
+
+  def __getstate__(self):
+    # Neither the values nor the lock are sent to the worker processes
+    return {'size_limit_bytes': self._size_limit_bytes}
+
+  def __setstate__(self, state):
+    self._size_limit_bytes = state['size_limit_bytes']
+    self._init_state()
 
   def get(self, key, fill_cache_func):
-    value = self._cache.get(key)
-    if value is None:
+    with self._lock:
+      entry = self._cache.pop(key, None)
+      if entry is not None:
+        # Reinserted as the most recently used value
+        self._cache[key] = entry
+        self._hits += 1
+        return entry[0]
+
+      pending_load = self._loading.get(key)
+      if pending_load is not None:
+        # Loaded by another thread
+        self._hits += 1
+      else:
+        self._misses += 1
+        self._loading[key] = _PendingLoad()
+
+    if pending_load is not None:
+      return pending_load.wait()
+
+    try:
       value = fill_cache_func()
-      self._cache[key] = value
+    except Exception:  # pylint: disable=broad-except
+      exc_info = sys.exc_info()
+      with self._lock:
+        self._loading.pop(key).fail(exc_info)
+      six.reraise(*exc_info)
 
+    with self._lock:
+      self._put(key, value)
+      self._loading.pop(key).set(value)
     return value
 
+  def _put(self, key, value):
+    value_size = estimate_size_bytes(value)
+    if self._size_limit_bytes is not None:
+      if value_size > self._size_limit_bytes:
+        return
+      while self._cache and self._size_bytes + value_size > self._size_limit_bytes:
+        _, (_, evicted_size) = self._cache.popitem(last=False)
+        self._size_bytes -= evicted_size
+        self._evictions += 1
+    self._cache[key] = (value, value_size)
+    self._size_bytes += value_size
+
   def cleanup(self):
-    self._cache.clear()
+    with self._lock:
+      self._cache.clear()
+      self._size_bytes = 0
 
   def size(self):
     return len(self._cache)
+
+  def size_bytes(self):
+    return self._size_bytes
+
+  @property
+  def diagnostics(self):
+    """Counters of the cache: hits, misses, evictions and the number and the size of the cached values"""
+    with self._lock:
+      return {
+        'cache_hits': self._hits,
+        'cache_misses': self._misses,
+        'cache_evictions': self._evictions,
+        'cache_entries': len(self._cache),
+        'cache_size_bytes': self._size_bytes,
+      }
+
+
+class _PendingLoad(object):
+  """A value being loaded by a thread, waited for by the others"""
+
+  def __init__(self):
+    self._loaded = threading.Event()
+    self._value = None
+    self._exc_info = None
+
+  def set(self, value):
+    self._value = value
+    self._loaded.set()
+
+  def fail(self, exc_info):
+    self._exc_info = exc_info
+    self._loaded.set()
+
+  def wait(self):
+    self._loaded.wait()
+    if self._exc_info is not None:
+      six.reraise(*self._exc_info)
+    return self._value
+
+
+def estimate_size_bytes(value):
+  """Estimates the memory held by a cached value.
+
+  :param value: a ``pyarrow.Table``, a ``pyarrow.RecordBatch``, or a list of rows read by a worker
+  :return: the size in bytes
+  """
+  if isinstance(value, pa.Table):
+    return sum(_arrow_array_size_bytes(chunk) for column in value.columns for chunk in column.data.chunks)
+  if isinstance(value, pa.RecordBatch):
+    return sum(_arrow_array_size_bytes(value.column(i)) for i in range(value.num_columns))
+  if isinstance(value, np.ndarray):
+    return value.nbytes
+  if isinstance(value, dict):
+    return sys.getsizeof(value) + sum(estimate_size_bytes(field_value) for field_value in value.values())
+  if isinstance(value, (list, tuple)):
+    return sys.getsizeof(value) + sum(estimate_size_bytes(item) for item in value)
+  return sys.getsizeof(value)
+
+
+def _arrow_array_size_bytes(array):
+  return sum(buf.size for buf in array.buffers() if buf is not None)
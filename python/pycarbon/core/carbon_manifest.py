@@ -0,0 +1,130 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Resolves the carbon sources of a ``.manifest`` dataset, and lists their splits folder by folder."""
+
+import collections
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from modelarts import manifest
+from modelarts.field_name import CARBON
+
+from pycarbon.core.carbon_predicates import build_carbon_expression
+from pycarbon.sdk.ArrowCarbonReader import ArrowCarbonReader
+from pycarbon.sdk.CarbonSchemaReader import CarbonSchemaReader
+from pycarbon.sdk.Configuration import Configuration
+from pycarbon.sdk.JavaClassRegistry import java_class
+
+logger = logging.getLogger(__name__)
+
+# Number of source folders whose splits are listed at the same time
+DEFAULT_MANIFEST_WORKERS = 10
+
+
+class CarbonManifestResolver(object):
+  def __init__(self, manifest_path, hadoop_conf=(), key=None, secret=None, endpoint=None,
+               workers=DEFAULT_MANIFEST_WORKERS):
+    """Parses a manifest once, and lists the splits of its carbon sources.
+
+    The sources of a manifest may be spread over many folders. The folders have a schema and an index of their
+    own: their splits are listed separately, ``workers`` folders at the same time.
+
+    :param manifest_path: path of the manifest file, without the ``file://`` prefix of local files
+    :param hadoop_conf: list of the ``(key, value)`` hadoop configuration the sources are read with
+    :param key: access key of obs, the manifest is read from obs when given
+    :param secret: secret key of obs
+    :param endpoint: endpoint of obs
+    :param workers: number of folders whose splits are listed at the same time
+    """
+    if not isinstance(workers, int) or workers < 1:
+      raise ValueError('workers must be a positive integer, got {}'.format(workers))
+    self.manifest_path = manifest_path
+    self._hadoop_conf = list(hadoop_conf)
+    self._key = key
+    self._secret = secret
+    self._endpoint = endpoint
+    self._workers = workers
+    self._sources = None
+
+  def get_sources(self):
+    """Returns the carbon sources of the manifest, parsing it on the first call only"""
+    if self._sources is None:
+      if self._key is not None:
+        from obs import ObsClient
+        obs_client = ObsClient(access_key_id=self._key, secret_access_key=self._secret,
+                               server=str(self._endpoint).replace('http://', ''),
+                               long_conn_mode=True)
+        sources = manifest.getSources(self.manifest_path, CARBON, obs_client)
+      else:
+        sources = manifest.getSources(self.manifest_path, CARBON)
+      if not sources:
+        raise ValueError("Manifest source can't be None!")
+      self._sources = list(sources)
+    return self._sources
+
+  def get_source_folders(self):
+    """Returns the sources of the manifest grouped by folder, in the order of the manifest"""
+    return group_sources_by_folder(self.get_sources())
+
+  def list_splits(self, carbon_filter=None):
+    """Lists the blocklet splits of the sources of the manifest, folder by folder.
+
+    :param carbon_filter: a carbon filter (see :func:`~pycarbon.core.carbon_predicates.to_carbon_filter`) the
+        blocklets are pruned with, ``None`` to list all the blocklets
+    :return: a list of ``(folder, carbon_schema, splits)`` tuples, in the order of the manifest
+    """
+    source_folders = self.get_source_folders()
+    workers = min(self._workers, len(source_folders))
+    logger.debug('Listing the splits of %d folders of %s with %d workers', len(source_folders),
+                 self.manifest_path, workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      return list(executor.map(lambda folder: self._list_folder_splits(folder, source_folders[folder],
+                                                                       carbon_filter),
+                               source_folders.keys()))
+
+  def _list_folder_splits(self, folder, sources, carbon_filter):
+    if self._hadoop_conf:
+      configuration = Configuration()
+      for conf_key, conf_value in self._hadoop_conf:
+        configuration.set(conf_key, conf_value)
+      carbon_schema = CarbonSchemaReader().readSchema(sources[0], conf=configuration.conf)
+    else:
+      carbon_schema = CarbonSchemaReader().readSchema(sources[0])
+
+    java_list = java_class('java.util.ArrayList')()
+    for source in sources:
+      java_list.add(source)
+    carbon_splits_builder = ArrowCarbonReader().builder(folder)
+    for conf_key, conf_value in self._hadoop_conf:
+      carbon_splits_builder = carbon_splits_builder.withHadoopConf(conf_key, conf_value)
+    carbon_splits_builder = carbon_splits_builder.withFileLists(java_list)
+    if carbon_filter is not None:
+      carbon_splits_builder = carbon_splits_builder.filter(build_carbon_expression(carbon_filter, carbon_schema))
+    return folder, carbon_schema, carbon_splits_builder.getSplits(True)
+
+
+def group_sources_by_folder(sources):
+  """Groups the source files of a manifest by the folder they are in.
+
+  :param sources: list of the paths of the source files
+  :return: an ordered dictionary of the list of the sources of each folder, by folder, in the order of the sources
+  """
+  source_folders = collections.OrderedDict()
+  for source in sources:
+    source = str(source)
+    source_folders.setdefault(source[0:source.rindex('/')], []).append(source)
+  return source_folders
@@ -0,0 +1,366 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Predicates that can be pushed down into the carbon reader, and their translation into carbon filters.
+
+A carbon filter is a plain (hashable, picklable) tuple tree, translated from a petastorm predicate where it is
+possible. It is turned into a java ``Expression`` only when a reader is built, and lets the carbon reader skip
+the blocklets and the pages whose min/max can not match, before any data crosses JNI.
+
+The carbon filter may select more rows than the predicate (e.g. a part of a conjunction is not translatable), but
+never less: the predicate is still evaluated on the rows the reader returns.
+
+The batch reader evaluates the predicates on the arrow record batches themselves (see :func:`predicate_mask`),
+without building pandas objects, whenever the predicate is an :class:`ArrowPredicateBase` or is made of predicates
+whose semantics are known.
+"""
+
+import abc
+import math
+
+import numpy as np
+import pyarrow as pa
+import six
+
+from petastorm.predicates import PredicateBase, in_set, in_negate, in_reduce
+
+from pycarbon.core.carbon_arrow_utils import columns_to_pandas
+from pycarbon.sdk.JavaClassRegistry import java_class
+
+_INT_RANGES = {
+  'SHORT': (-2 ** 15, 2 ** 15 - 1),
+  'INT': (-2 ** 31, 2 ** 31 - 1),
+  'LONG': (-2 ** 63, 2 ** 63 - 1),
+}
+
+# FLOAT is left out on purpose: the predicate compares float32 values to python floats, which carbon can't mirror
+_SUPPORTED_TYPES = set(_INT_RANGES.keys()) | {'DOUBLE', 'BOOLEAN', 'STRING', 'VARCHAR'}
+
+_NEGATED_COMPARISONS = {'<': '>=', '<=': '>', '>': '<=', '>=': '<'}
+
+
+@six.add_metaclass(abc.ABCMeta)
+class ArrowPredicateBase(PredicateBase):
+  """ Base class for predicates that can be evaluated on all the rows of an arrow record batch at once """
+
+  @abc.abstractmethod
+  def do_include_batch(self, batch):
+    """ Evaluates the predicate on every row of a record batch
+
+    :param batch: ``pyarrow.RecordBatch`` with (at least) the columns returned by :func:`get_fields`
+    :return: a boolean ``pyarrow.Array``, one value per row
+    """
+    pass
+
+
+class in_range(ArrowPredicateBase):
+  """ Test if predicate_field value is within a range. A bound that is None is not checked.
+      example: in_range('id', 10, 20) selects 10 <= id < 20
+  """
+
+  def __init__(self, predicate_field, lower=None, upper=None, include_lower=True, include_upper=False):
+    if lower is None and upper is None:
+      raise ValueError('At least one of lower and upper bounds should be set')
+    self._predicate_field = predicate_field
+    self._lower = lower
+    self._upper = upper
+    self._include_lower = include_lower
+    self._include_upper = include_upper
+
+  def get_fields(self):
+    return {self._predicate_field}
+
+  def do_include(self, values):
+    value = values[self._predicate_field]
+    if value is None:
+      return False
+    # '&' keeps working when the values are columns of a data frame
+    include = True
+    if self._lower is not None:
+      include = include & ((value >= self._lower) if self._include_lower else (value > self._lower))
+    if self._upper is not None:
+      include = include & ((value <= self._upper) if self._include_upper else (value < self._upper))
+    return include
+
+  def do_include_batch(self, batch):
+    values, valid = _column_values(batch, self._predicate_field)
+    include = valid.copy()
+    valid_values = values[valid]
+    if self._lower is not None:
+      include[valid] &= (valid_values >= self._lower) if self._include_lower else (valid_values > self._lower)
+    if self._upper is not None:
+      include[valid] &= (valid_values <= self._upper) if self._include_upper else (valid_values < self._upper)
+    return pa.array(include, type=pa.bool_())
+
+
+def predicate_mask(predicate, table):
+  """Evaluates a predicate on all the rows of an arrow table or record batch.
+
+  :class:`ArrowPredicateBase` predicates, ``in_set`` and their ``in_negate`` and ``in_reduce`` (with ``all`` or
+  ``any``) combinations are evaluated on the arrow columns. Any other predicate is given a pandas data frame of the
+  columns it needs, like the batch reader of petastorm does.
+
+  :param predicate: instance of :class:`.PredicateBase`
+  :param table: ``pyarrow.Table`` or ``pyarrow.RecordBatch``
+  :return: a boolean ``pyarrow.Array``, one value per row
+  """
+  batches = [table] if isinstance(table, pa.RecordBatch) else table.to_batches()
+  masks = [_batch_mask(predicate, batch) for batch in batches]
+  if not masks:
+    return pa.array([], type=pa.bool_())
+  return pa.array(np.concatenate(masks), type=pa.bool_())
+
+
+def _batch_mask(predicate, batch):
+  """Returns the boolean numpy mask of a predicate on a record batch"""
+  if isinstance(predicate, ArrowPredicateBase):
+    return np.asarray(predicate.do_include_batch(batch).to_pandas(), dtype=np.bool_)
+
+  if isinstance(predicate, in_negate):
+    return ~_batch_mask(predicate._predicate, batch)
+
+  if isinstance(predicate, in_reduce) and predicate._reduce_func in (all, any):
+    reduce_func = np.logical_and if predicate._reduce_func is all else np.logical_or
+    masks = [_batch_mask(child, batch) for child in predicate._predicate_list]
+    if not masks:
+      return np.full(batch.num_rows, predicate._reduce_func([]), dtype=np.bool_)
+    return reduce_func.reduce(masks)
+
+  if isinstance(predicate, in_set):
+    values, valid = _column_values(batch, predicate._predicate_field)
+    inclusion_values = predicate._inclusion_values
+    include = np.zeros(batch.num_rows, dtype=np.bool_)
+    include[~valid] = None in inclusion_values
+    include[valid] = [value in inclusion_values for value in values[valid]]
+    return include
+
+  data_frame = columns_to_pandas(batch, predicate.get_fields())
+  return np.asarray(predicate.do_include(data_frame), dtype=np.bool_)
+
+
+def _column_values(batch, field_name):
+  """Returns the numpy values of a column of a record batch, and the mask of its non null values"""
+  column = batch.column(batch.schema.get_field_index(field_name))
+  values = np.asarray(column.to_pandas())
+  if not column.null_count:
+    return values, np.ones(len(values), dtype=np.bool_)
+  # nulls come out as nan in float arrays (ints with nulls are converted to floats), as NaT in datetime arrays
+  # and as None in object arrays
+  if values.dtype.kind == 'f':
+    valid = ~np.isnan(values)
+  elif values.dtype.kind in 'mM':
+    valid = ~np.isnat(values)
+  else:
+    valid = np.not_equal(values, None)
+  return values, valid
+
+
+def carbon_field_types(carbon_schema):
+  """Returns the carbon type names of the fields of a carbon schema, by lower cased field name"""
+  return dict((field.getFieldName().lower(), field.getDataType().getName()) for field in carbon_schema.getFields())
+
+
+def to_carbon_filter(predicate, field_types):
+  """Translates a predicate into a carbon filter.
+
+  :param predicate: instance of :class:`.PredicateBase`
+  :param field_types: carbon type names of the fields, as returned by :func:`carbon_field_types`
+  :return: the carbon filter, or ``None`` if no part of the predicate can be pushed down
+  """
+  return _translate(predicate, field_types, False)
+
+
+def build_carbon_expression(carbon_filter, carbon_schema):
+  """Builds the java ``Expression`` of a carbon filter.
+
+  :param carbon_filter: a carbon filter returned by :func:`to_carbon_filter`
+  :param carbon_schema: the carbon schema of the dataset
+  :return: ``org.apache.carbondata.core.scan.expression.Expression``
+  """
+  fields = dict((field.getFieldName().lower(), field) for field in carbon_schema.getFields())
+  return _JavaExpressionBuilder(java_class, fields).build(carbon_filter)
+
+
+def _translate(predicate, field_types, negate):
+  if isinstance(predicate, in_negate):
+    return _translate(predicate._predicate, field_types, not negate)
+
+  if isinstance(predicate, in_reduce):
+    if predicate._reduce_func is all:
+      operator = 'or' if negate else 'and'
+    elif predicate._reduce_func is any:
+      operator = 'and' if negate else 'or'
+    else:
+      return None
+    children = [_translate(p, field_types, negate) for p in predicate._predicate_list]
+    if operator == 'and':
+      # dropping a part of a conjunction only selects more rows
+      children = [child for child in children if child is not None]
+      if not children:
+        return None
+    elif any(child is None for child in children):
+      return None
+    return children[0] if len(children) == 1 else (operator,) + tuple(children)
+
+  if isinstance(predicate, in_set):
+    return _translate_set(predicate._predicate_field, predicate._inclusion_values, field_types, negate)
+
+  if isinstance(predicate, in_range):
+    return _translate_range(predicate, field_types, negate)
+
+  # in_intersection works on lists, in_lambda can't be inspected
+  return None
+
+
+def _translate_set(field_name, values, field_types, negate):
+  field_name = field_name.lower()
+  type_name = field_types.get(field_name)
+  if type_name not in _SUPPORTED_TYPES:
+    return None
+
+  has_null = None in values
+  literals = [_to_literal(value, type_name) for value in values if value is not None]
+  if any(literal is None for literal in literals):
+    return None
+  literals = tuple(sorted(set(literals)))
+
+  if not negate:
+    if not literals:
+      return ('is_null', field_name) if has_null else None
+    in_filter = ('in', field_name, literals)
+    return ('or', in_filter, ('is_null', field_name)) if has_null else in_filter
+
+  if not literals:
+    return None
+  # carbon never selects nulls with 'not in', while the negated predicate does if null is not in the set
+  not_in_filter = ('not_in', field_name, literals)
+  return not_in_filter if has_null else ('or', not_in_filter, ('is_null', field_name))
+
+
+def _translate_range(predicate, field_types, negate):
+  field_name = predicate._predicate_field.lower()
+  type_name = field_types.get(field_name)
+  if type_name not in _SUPPORTED_TYPES:
+    return None
+
+  comparisons = []
+  if predicate._lower is not None:
+    comparisons.append(('>=' if predicate._include_lower else '>', predicate._lower))
+  if predicate._upper is not None:
+    comparisons.append(('<=' if predicate._include_upper else '<', predicate._upper))
+
+  children = []
+  for operator, bound in comparisons:
+    literal = _to_literal(bound, type_name)
+    if literal is None:
+      return None
+    children.append(('compare', field_name, _NEGATED_COMPARISONS[operator] if negate else operator, literal))
+
+  if negate:
+    # a null value is out of the range, so the negated range selects it
+    return ('or',) + tuple(children) + (('is_null', field_name),)
+  return children[0] if len(children) == 1 else ('and',) + tuple(children)
+
+
+def _to_literal(value, type_name):
+  """Converts a value of the predicate into a literal of the carbon type, None if it can't be done exactly"""
+  try:
+    if type_name in _INT_RANGES:
+      if isinstance(value, six.string_types):
+        return None
+      literal = int(value)
+      low, high = _INT_RANGES[type_name]
+      return literal if literal == value and low <= literal <= high else None
+    if type_name == 'DOUBLE':
+      if isinstance(value, six.string_types):
+        return None
+      literal = float(value)
+      # nan never compares equal, not even to itself
+      return literal if literal == literal else None
+    if type_name == 'BOOLEAN':
+      return bool(value) if isinstance(value, (bool, np.bool_)) else None
+    return six.text_type(value) if isinstance(value, six.string_types) else None
+  except (TypeError, ValueError, OverflowError):
+    return None
+
+
+class _JavaExpressionBuilder(object):
+  _EXPRESSION_PACKAGE = 'org.apache.carbondata.core.scan.expression.'
+  _COMPARISON_CLASSES = {
+    '<': 'conditional.LessThanExpression',
+    '<=': 'conditional.LessThanEqualToExpression',
+    '>': 'conditional.GreaterThanExpression',
+    '>=': 'conditional.GreaterThanEqualToExpression',
+  }
+  _BOXED_CLASSES = {
+    'SHORT': 'java.lang.Short',
+    'INT': 'java.lang.Integer',
+    'LONG': 'java.lang.Long',
+    'DOUBLE': 'java.lang.Double',
+    'BOOLEAN': 'java.lang.Boolean',
+  }
+
+  def __init__(self, autoclass, fields):
+    self._autoclass = autoclass
+    self._fields = fields
+
+  def _expression_class(self, name):
+    return self._autoclass(self._EXPRESSION_PACKAGE + name)
+
+  def build(self, carbon_filter):
+    kind = carbon_filter[0]
+    if kind in ('and', 'or'):
+      logical_class = self._expression_class('logical.AndExpression' if kind == 'and' else 'logical.OrExpression')
+      expression = self.build(carbon_filter[1])
+      for child in carbon_filter[2:]:
+        expression = logical_class(expression, self.build(child))
+      return expression
+
+    field = self._fields[carbon_filter[1]]
+    column = self._expression_class('ColumnExpression')(field.getFieldName(), field.getDataType())
+    if kind == 'is_null':
+      null_literal = self._expression_class('LiteralExpression')(None, field.getDataType())
+      return self._expression_class('conditional.EqualToExpression')(column, null_literal, True)
+    if kind == 'compare':
+      comparison_class = self._expression_class(self._COMPARISON_CLASSES[carbon_filter[2]])
+      return comparison_class(column, self._literal(carbon_filter[3], field))
+
+    literals = self._autoclass('java.util.ArrayList')()
+    for value in carbon_filter[2]:
+      literals.add(self._literal(value, field))
+    list_expression = self._expression_class('conditional.ListExpression')(literals)
+    in_class = 'conditional.InExpression' if kind == 'in' else 'conditional.NotInExpression'
+    return self._expression_class(in_class)(column, list_expression)
+
+  def _literal(self, value, field):
+    data_type = field.getDataType()
+    boxed_class = self._BOXED_CLASSES.get(data_type.getName())
+    # box explicitly: the implicit conversion of python numbers to java objects does not follow the column type
+    if boxed_class:
+      java_value = self._autoclass(boxed_class).valueOf(_java_literal_text(value))
+    else:
+      java_value = value
+    return self._expression_class('LiteralExpression')(java_value, data_type)
+
+
+def _java_literal_text(value):
+  """Formats a literal the way ``valueOf`` of its java boxed class parses it"""
+  if isinstance(value, float):
+    # java spells the infinities out, repr gives 'inf'
+    if math.isinf(value):
+      return 'Infinity' if value > 0 else '-Infinity'
+    return repr(value)
+  return str(value)
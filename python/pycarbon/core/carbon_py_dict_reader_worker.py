@@ -16,15 +16,18 @@
 
 from __future__ import division
 
-import hashlib
-
-import numpy as np
-
-from petastorm import utils
 from petastorm.cache import NullCache
 from petastorm.workers_pool.worker_base import WorkerBase
 from petastorm.py_dict_reader_worker import PyDictReaderWorkerResultsQueueReader
-from petastorm.py_dict_reader_worker import _select_cols, _merge_two_dicts
+from petastorm.py_dict_reader_worker import _merge_two_dicts
+
+from pycarbon.core.carbon import CarbonSplitReaderPool
+from pycarbon.core.carbon_arrow_utils import filter_table
+from pycarbon.core.carbon_column_cache import CarbonColumnChunkReader
+from pycarbon.core.carbon_columnar_codecs import decode_rows
+from pycarbon.core.carbon_decode_pool import CarbonDecodePool
+from pycarbon.core.carbon_jvm import configure_jvm
+from pycarbon.core.carbon_predicates import carbon_field_types, to_carbon_filter
 
 
 class PyDictCarbonReaderWorker(WorkerBase):
@@ -38,15 +41,36 @@ class PyDictCarbonReaderWorker(WorkerBase):
     self._split_pieces = args[4]
     self._local_cache = args[5]
     self._transform_spec = args[6]
+    self._late_materialization = args[7]
+    # Images and ndarrays are decoded by a pool of threads of their own when decode_workers is set
+    self._decode_pool = CarbonDecodePool(args[9]) if args[9] else None
+
+    # A worker process starts its own JVM, configured like the one of the process creating the reader
+    configure_jvm(args[8])
 
     # We create datasets lazily in the first invocation of 'def process'. This speeds up startup time since
     # all Worker constructors are serialized
     self._dataset = None
 
+    # Readers of the pieces are reused across the reads of this worker, until the worker is shut down
+    self._split_reader_pool = CarbonSplitReaderPool()
+    self._carbon_field_types = None
+
+    # With a cache, the columns of the pieces are read through it
+    self._column_chunk_reader = None
+    if not isinstance(self._local_cache, NullCache):
+      self._column_chunk_reader = CarbonColumnChunkReader(self._local_cache, self._dataset_path,
+                                                          self._split_reader_pool)
+
   @staticmethod
   def new_results_queue_reader():
     return PyDictReaderWorkerResultsQueueReader()
 
+  def shutdown(self):
+    self._split_reader_pool.close()
+    if self._decode_pool:
+      self._decode_pool.shutdown()
+
   # pylint: disable=arguments-differ
   def process(self, piece_index, worker_predicate, shuffle_row_drop_partition):
     """Main worker function. Loads and returns all rows matching the predicate from a blocklet
@@ -63,27 +87,17 @@ class PyDictCarbonReaderWorker(WorkerBase):
     # start = time.time()
     piece = self._split_pieces[piece_index]
 
-    if not isinstance(self._local_cache, NullCache):
-      if worker_predicate:
-        raise RuntimeError('Local cache is not supported together with predicates, '
-                           'unless the dataset is partitioned by the column the predicate operates on.')
-      if shuffle_row_drop_partition[1] != 1:
-        raise RuntimeError('Local cache is not supported together with shuffle_row_drop_partitions > 1')
-
     if worker_predicate:
       all_cols = self._load_rows_with_predicate(piece, worker_predicate, shuffle_row_drop_partition)
+    elif self._column_chunk_reader is None and shuffle_row_drop_partition[1] == 1 and not self._ngram:
+      # Nothing needs the whole piece at once (ngrams are formed across the rows of the piece): publish the
+      # rows as they are read, so the memory held by the worker is bounded by the batch size
+      for batch_cols in self._iter_rows(piece):
+        if batch_cols:
+          self.publish_func(batch_cols)
+      return
     else:
-      # Using hash of the dataset path with the relative path in order to:
-      #  1. Make sure if a common cache serves multiple processes (e.g. redis), we don't have conflicts
-      #  2. Dataset path is hashed, to make sure we don't create too long keys, which maybe incompatible with
-      #     some cache implementations
-      #  3. Still leave relative path and the piece_index in plain text to make it easier to debug
-      cache_key = '{}:{}:{}'.format(hashlib.md5(self._dataset_path.encode('utf-8')).hexdigest(),
-                                    piece.path, piece_index)
-      # start1 = time.time()
-      all_cols = self._local_cache.get(cache_key,
-                                       lambda: self._load_rows(piece, shuffle_row_drop_partition))
-      # print("cache time is " + str(time.time() - start))
+      all_cols = self._load_rows(piece, shuffle_row_drop_partition)
 
     if self._ngram:
       all_cols = self._ngram.form_ngram(data=all_cols, schema=self._schema)
@@ -114,19 +128,25 @@ class PyDictCarbonReaderWorker(WorkerBase):
                        'are not valid schema names: ({})'.format(', '.join(invalid_column_names),
                                                                  ', '.join(all_schema_names)))
 
+    # Let the carbon reader skip the blocklets and the rows the predicate can't match
+    carbon_filter = self._carbon_filter(piece, worker_predicate)
+
     other_column_names = all_schema_names - predicate_column_names
     other_column_names_list = list(other_column_names)
 
+    if self._late_materialization:
+      return self._load_rows_with_predicate_single_pass(piece, worker_predicate, carbon_filter, predicate_column_names,
+                                                        other_column_names, shuffle_row_drop_partition)
+
     predicate_column_names_list = list(predicate_column_names)
     # Read columns needed for the predicate
-    predicate_rows = self._read_with_shuffle_row_drop(piece, predicate_column_names_list,
-                                                      shuffle_row_drop_partition)
+    predicate_table = self._read_with_shuffle_row_drop(piece, predicate_column_names_list,
+                                                       shuffle_row_drop_partition, carbon_filter)
 
     # Decode values
     transform_func = self._transform_spec.func if self._transform_spec else (lambda x: x)
-    decoded_predicate_rows = [
-      transform_func(utils.decode_row(_select_cols(row, predicate_column_names), self._schema))
-      for row in predicate_rows]
+    decoded_predicate_rows = [transform_func(row) for row in decode_rows(predicate_table, predicate_column_names_list,
+                                                                         self._schema, self._decode_pool)]
 
     # Use the predicate to filter
     match_predicate_mask = [worker_predicate.do_include(row) for row in decoded_predicate_rows]
@@ -141,14 +161,12 @@ class PyDictCarbonReaderWorker(WorkerBase):
 
     if other_column_names:
       # Read remaining columns
-      other_rows = self._read_with_shuffle_row_drop(piece, other_column_names_list,
-                                                    shuffle_row_drop_partition)
-
-      # Remove rows that were filtered out by the predicate
-      filtered_other_rows = [row for i, row in enumerate(other_rows) if match_predicate_mask[i]]
+      other_table = self._read_with_shuffle_row_drop(piece, other_column_names_list,
+                                                     shuffle_row_drop_partition, carbon_filter)
 
-      # Decode remaining columns
-      decoded_other_rows = [utils.decode_row(row, self._schema) for row in filtered_other_rows]
+      # Remove rows that were filtered out by the predicate, and decode the remaining columns of the others
+      decoded_other_rows = decode_rows(filter_table(other_table, match_predicate_mask), other_column_names_list,
+                                       self._schema, self._decode_pool)
 
       # Merge predicate needed columns with the remaining
       all_cols = [_merge_two_dicts(a, b) for a, b in zip(decoded_other_rows, filtered_decoded_predicate_rows)]
@@ -156,6 +174,45 @@ class PyDictCarbonReaderWorker(WorkerBase):
     else:
       return filtered_decoded_predicate_rows
 
+  def _load_rows_with_predicate_single_pass(self, piece, worker_predicate, carbon_filter, predicate_column_names,
+                                            other_column_names, shuffle_row_drop_partition):
+    """Loads all rows that match a predicate from a piece, reading the piece only once.
+
+    All the columns are read by a single reader. The predicate columns are decoded and evaluated first; the
+    other columns are decoded only for the rows selected by the predicate.
+    """
+    transform_func = self._transform_spec.func if self._transform_spec else (lambda x: x)
+    predicate_column_names = list(predicate_column_names)
+    other_column_names = list(other_column_names)
+    column_names = predicate_column_names + other_column_names
+
+    if shuffle_row_drop_partition[1] == 1 and self._column_chunk_reader is None:
+      tables = piece.iter_batches(column_names, split_reader_pool=self._split_reader_pool,
+                                  carbon_filter=carbon_filter)
+    else:
+      tables = [self._read_with_shuffle_row_drop(piece, column_names, shuffle_row_drop_partition, carbon_filter)]
+
+    all_cols = []
+    for table in tables:
+      decoded_predicate_rows = [transform_func(row) for row in
+                                decode_rows(table, predicate_column_names, self._schema, self._decode_pool)]
+      match_predicate_mask = [worker_predicate.do_include(row) for row in decoded_predicate_rows]
+      if not any(match_predicate_mask):
+        continue
+
+      filtered_decoded_predicate_rows = [row for i, row in enumerate(decoded_predicate_rows) if
+                                         match_predicate_mask[i]]
+      if other_column_names:
+        # Only the rows selected by the predicate are decoded out of the table
+        decoded_other_rows = decode_rows(filter_table(table, match_predicate_mask), other_column_names,
+                                         self._schema, self._decode_pool)
+        all_cols.extend(_merge_two_dicts(a, b) for a, b in zip(decoded_other_rows,
+                                                               filtered_decoded_predicate_rows))
+      else:
+        all_cols.extend(filtered_decoded_predicate_rows)
+
+    return all_cols
+
   def _load_rows(self, piece, shuffle_row_drop_range):
     """Loads all rows from a piece"""
 
@@ -163,33 +220,41 @@ class PyDictCarbonReaderWorker(WorkerBase):
     # the `columns` argument.
     column_names = list(field.name for field in self._schema.fields.values())
 
-    all_rows = self._read_with_shuffle_row_drop(piece, column_names, shuffle_row_drop_range)
+    table = self._read_with_shuffle_row_drop(piece, column_names, shuffle_row_drop_range)
 
     transform_func = self._transform_spec.func if self._transform_spec else (lambda x: x)
-    return [transform_func(utils.decode_row(row, self._schema)) for row in all_rows]
+    return [transform_func(row) for row in decode_rows(table, column_names, self._schema, self._decode_pool)]
 
-  def _read_with_shuffle_row_drop(self, piece, column_names, shuffle_row_drop_partition):
-    # start = time.time()
-    data_frame = piece.read_all(
+  def _iter_rows(self, piece):
+    """Loads all rows from a piece, one list of decoded rows per batch read"""
+    column_names = list(field.name for field in self._schema.fields.values())
+
+    transform_func = self._transform_spec.func if self._transform_spec else (lambda x: x)
+    for batch in piece.iter_batches(column_names, split_reader_pool=self._split_reader_pool):
+      yield [transform_func(row) for row in decode_rows(batch, column_names, self._schema, self._decode_pool)]
+
+  def _carbon_filter(self, piece, worker_predicate):
+    """Translates the predicate into a carbon filter, ``None`` if no part of it can be pushed down"""
+    if self._transform_spec is not None and self._transform_spec.func is not None:
+      # The predicate is evaluated on the transformed rows, the carbon filter would be applied to the stored values
+      return None
+    if self._carbon_field_types is None:
+      self._carbon_field_types = carbon_field_types(piece.carbon_schema)
+    return to_carbon_filter(worker_predicate, self._carbon_field_types)
+
+  def _read_with_shuffle_row_drop(self, piece, column_names, shuffle_row_drop_partition, carbon_filter=None):
+    """Reads the rows of the row drop partition of a piece, still encoded, as an arrow table"""
+    # If we have an ngram we need to take elements from the next partition to build the sequence
+    extra_rows = self._ngram.length - 1 if self._ngram else 0
+    if self._column_chunk_reader is not None:
+      # The cached column chunks hold all the rows of the piece: the rows the carbon filter would have skipped are
+      # dropped by the predicate evaluated on them
+      return self._column_chunk_reader.read_row_drop_partition(piece, column_names, shuffle_row_drop_partition,
+                                                               extra_rows)
+    return piece.read_row_drop_partition(
       columns=column_names,
+      shuffle_row_drop_partition=shuffle_row_drop_partition,
+      extra_rows=extra_rows,
+      split_reader_pool=self._split_reader_pool,
+      carbon_filter=carbon_filter,
     )
-    # print(" total piece time taken is " + str(time.time() - start))
-    # start = time.time()
-    data_frame = data_frame.to_pandas()
-    # print(" panda time is " + str(time.time() - start))
-
-    num_rows = len(data_frame)
-    num_partitions = shuffle_row_drop_partition[1]
-    this_partition = shuffle_row_drop_partition[0]
-
-    partition_indexes = np.floor(np.arange(num_rows) / (float(num_rows) / min(num_rows, num_partitions)))
-
-    if self._ngram:
-      # If we have an ngram we need to take elements from the next partition to build the sequence
-      next_partition_indexes = np.where(partition_indexes >= this_partition + 1)
-      if next_partition_indexes[0].size:
-        next_partition_to_add = next_partition_indexes[0][0:self._ngram.length - 1]
-        partition_indexes[next_partition_to_add] = this_partition
-
-    selected_dataframe = data_frame.loc[partition_indexes == this_partition]
-    return selected_dataframe.to_dict('records')
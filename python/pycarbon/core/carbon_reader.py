@@ -15,6 +15,7 @@
 
 
 import collections
+import heapq
 import logging
 import warnings
 
@@ -24,17 +25,27 @@ from petastorm.cache import NullCache
 from petastorm.local_disk_cache import LocalDiskCache
 from petastorm.ngram import NGram
 from petastorm.transform import transform_schema
+from petastorm.reader_impl.arrow_table_serializer import ArrowTableSerializer
+from petastorm.reader_impl.pickle_serializer import PickleSerializer
+from petastorm.reader_impl.pyarrow_serializer import PyArrowSerializer
+from petastorm.workers_pool.process_pool import ProcessPool
 from petastorm.workers_pool.thread_pool import ThreadPool
 from petastorm.workers_pool.ventilator import ConcurrentVentilator
 
 from pycarbon.core.carbon_arrow_reader_worker import ArrowCarbonReaderWorker
 from pycarbon.core.carbon_py_dict_reader_worker import PyDictCarbonReaderWorker
-from pycarbon.core.carbon import CarbonDataset
+from pycarbon.core.carbon import open_carbon_dataset
+from pycarbon.core.carbon_blocklet_selectors import CarbonBlockletSelectorBase, MinMaxBlockletSelector
+from pycarbon.core.carbon_dummy_pool import CarbonDummyPool, SynchronousVentilator
 from pycarbon.core import carbon_dataset_metadata
-from pycarbon.core.carbon_dataset_metadata import infer_or_load_unischema_carbon
+from pycarbon.core.carbon_dataset_metadata import get_blocklet_sizes_carbon, infer_or_load_unischema_carbon
 from pycarbon.core.carbon_dataset_metadata import PycarbonMetadataError
 from pycarbon.core.carbon_local_memory_cache import LocalMemoryCache
+from pycarbon.core.carbon_arrow_mmap_cache import ArrowMmapCache
+from pycarbon.core.carbon_shared_memory_cache import SharedMemoryCache
 from pycarbon.core.carbon_fs_utils import CarbonFilesystemResolver
+from pycarbon.core.carbon_jvm import get_jvm_config
+from pycarbon.core.carbon_transform import ArrowTransformSpec, check_table_transform_spec
 
 logger = logging.getLogger(__name__)
 
@@ -51,7 +62,7 @@ def make_carbon_reader(dataset_url,
                        proxy=None,
                        proxy_port=None,
                        schema_fields=None,
-                       reader_pool_type='thread', workers_count=10, results_queue_size=100,
+                       reader_pool_type='thread', workers_count=10, pyarrow_serialize=True, results_queue_size=100,
                        shuffle_blocklets=True, shuffle_row_drop_partitions=1,
                        predicate=None,
                        blocklet_selector=None,
@@ -61,7 +72,10 @@ def make_carbon_reader(dataset_url,
                        cache_row_size_estimate=None, cache_extra_settings=None,
                        hdfs_driver='libhdfs3',
                        reader_engine='reader_v1', reader_engine_params=None,
-                       transform_spec=None):
+                       transform_spec=None,
+                       late_materialization=False,
+                       decode_workers=None,
+                       metadata_cache_location=None):
   """
   Creates an instance of Reader for reading Pycarbon datasets. A Pycarbon dataset is a dataset generated using
   :func:`~pycarbon.etl.carbon_dataset_metadata.materialize_dataset_carbon` context manager as explained
@@ -80,10 +94,14 @@ def make_carbon_reader(dataset_url,
   :param schema_fields: Can be: a list of unischema fields and/or regex pattern strings; ``None`` to read all fields;
           an NGram object, then it will return an NGram of the specified fields.
   :param reader_pool_type: A string denoting the reader pool type. Should be one of ['thread', 'process', 'dummy']
-      denoting a thread pool, process pool, or running everything in the master thread. Defaults to 'thread'
-    TODO: process support
+      denoting a thread pool, process pool, or running everything in the master thread. Defaults to 'thread'.
+      Each process of a process pool starts its own JVM, with the classpath and options of the current process.
+      The 'dummy' pool reads the blocklets on the thread iterating the reader, when it runs out of rows.
   :param workers_count: An int for the number of workers to use in the reader pool. This only is used for the
       thread or process pool. Defaults to 10
+  :param pyarrow_serialize: Whether to use pyarrow for serialization. Currently only applicable to process pool.
+      The rows are sent by the worker processes as arrow buffers instead of pickles, which is much faster for
+      numpy arrays, but does not support all data types (e.g. ``Decimal``). Defaults to True.
   :param results_queue_size: Size of the results queue to store prefetched rows. Currently only applicable to
       thread reader pool type.
   :param shuffle_blocklets: Whether to shuffle blocklets (the order in which full blocklets are read)
@@ -94,19 +112,23 @@ def make_carbon_reader(dataset_url,
       group size in order to not waste reads which drop all rows.
   :param predicate: instance of :class:`.PredicateBase` object to filter rows to be returned by reader. The predicate
       will be passed a single row and must return a boolean value indicating whether to include it in the results.
-  :param blocklet_selector: instance of blocklet selector object to select blocklet to be read
-    TODO: blocklet_selector
+  :param blocklet_selector: instance of :class:`.CarbonBlockletSelectorBase` object to select blocklets to be read.
+      The blocklets that can't match the ``predicate`` by their min/max statistics are not read in any case.
   :param num_epochs: An epoch is a single pass over all rows in the dataset. Setting ``num_epochs`` to
       ``None`` will result in an infinite number of epochs.
   :param cur_shard: An int denoting the current shard number. Each node reading a shard should
       pass in a unique shard number in the range [0, shard_count). shard_count must be supplied as well.
       Defaults to None
-  :param shard_count: An int denoting the number of shards to break this dataset into. Defaults to None
-    TODO: cur_shard & shard_count
-  :param cache_type: A string denoting the cache type, if desired. Options are [None, 'null', 'local-disk'] to
-      either have a null/noop cache or a cache implemented using diskcache. Caching is useful when communication
-      to the main data store is either slow or expensive and the local machine has large enough storage
-      to store entire dataset (or a partition of a dataset if shard_count is used). By default will be a null cache.
+  :param shard_count: An int denoting the number of shards to break this dataset into. Defaults to None.
+      The blocklets are assigned to the shards so that the shards have about the same size, in bytes when the
+      dataset metadata holds the sizes of the blocklets (see ``materialize_dataset_carbon``), in rows otherwise.
+  :param cache_type: A string denoting the cache type, if desired. Options are [None, 'null', 'local-disk',
+      'memory-cache', 'arrow-mmap', 'shared-memory'] to either have a null/noop cache, a cache implemented using
+      diskcache, a least recently used cache in the memory of the workers, a cache of memory mapped arrow files in
+      ``cache_location`` or a cache of arrow files in shared memory, mapped by all the readers of the host.
+      Caching is useful when communication to the main data store is either slow or expensive and the local machine
+      has large enough storage to store entire dataset (or a partition of a dataset if shard_count is used).
+      By default will be a null cache.
   :param cache_location: A string denoting the location or path of the cache.
   :param cache_size_limit: An int specifying the size limit of the cache in bytes
   :param cache_row_size_estimate: An int specifying the estimated size of a row in the dataset
@@ -121,13 +143,29 @@ def make_carbon_reader(dataset_url,
       fine-tuning of a reader.
   :param transform_spec: An instance of :class:`~petastorm.transform.TransformSpec` object defining how a record
       is transformed after it is loaded and decoded. The transformation occurs on a worker thread/process (depends
-      on the ``reader_pool_type`` value).
+      on the ``reader_pool_type`` value). :class:`~pycarbon.core.carbon_transform.ArrowTransformSpec` is only
+      supported by :func:`make_batch_carbon_reader`.
+  :param late_materialization: When a ``predicate`` is set, read each blocklet only once: the predicate is
+      evaluated on the predicate columns of every batch and only the selected rows of the other columns are kept.
+      By default the predicate columns and the other columns are read by two separate reads of the blocklet.
+  :param decode_workers: An int for the number of threads of each worker decoding the image and the ndarray fields
+      of the rows, independently of ``workers_count`` which sets how many blocklets are read at the same time.
+      By default the fields are decoded by the worker itself.
+  :param metadata_cache_location: A local directory the metadata of the opened dataset (schemas, splits) is
+      persisted in, so that other readers of the dataset don't open it again. By default the opened dataset is
+      only shared by the readers of this process.
   :return: A :class:`Reader` object
   """
 
   if dataset_url is None or not isinstance(dataset_url, six.string_types):
     raise ValueError("""dataset_url must be a string""")
 
+  if isinstance(transform_spec, ArrowTransformSpec):
+    raise ValueError('ArrowTransformSpec transforms arrow tables, it is only supported by make_batch_carbon_reader')
+
+  if decode_workers is not None and (not isinstance(decode_workers, int) or decode_workers < 1):
+    raise ValueError('decode_workers must be a positive integer or None, got {}'.format(decode_workers))
+
   dataset_url = dataset_url[:-1] if dataset_url[-1] == '/' else dataset_url
   logger.debug('dataset_url: %s', dataset_url)
 
@@ -140,14 +178,7 @@ def make_carbon_reader(dataset_url,
                                       hdfs_driver=hdfs_driver)
   filesystem = resolver.filesystem()
 
-  if cache_type is None or cache_type == 'null':
-    cache = NullCache()
-  elif cache_type == 'local-disk':
-    cache = LocalDiskCache(cache_location, cache_size_limit, cache_row_size_estimate, **cache_extra_settings or {})
-  elif cache_type == 'memory-cache':
-    cache = LocalMemoryCache(cache_size_limit)
-  else:
-    raise ValueError('Unknown cache_type: {}'.format(cache_type))
+  cache = make_cache(cache_type, cache_location, cache_size_limit, cache_row_size_estimate, cache_extra_settings)
 
   # Fail if this is a non-pycarbon dataset. Typically, a Carbon store will have hundred thousands rows in a single
   # blocklet. Using PyDictCarbonReaderWorker or ReaderV2 implementation is very inefficient as it processes data on a
@@ -159,7 +190,8 @@ def make_carbon_reader(dataset_url,
                                                                endpoint=endpoint,
                                                                proxy=proxy,
                                                                proxy_port=proxy_port,
-                                                               filesystem=filesystem)
+                                                               filesystem=filesystem,
+                                                               metadata_cache_location=metadata_cache_location)
   except PycarbonMetadataError:
     raise RuntimeError('Currently make_carbon_reader supports reading only Pycarbon datasets(has unischema). '
                        'To read from a non-Pycarbon Carbon store use make_batch_carbon_reader')
@@ -168,9 +200,13 @@ def make_carbon_reader(dataset_url,
     if reader_pool_type == 'thread':
       reader_pool = ThreadPool(workers_count, results_queue_size)
     elif reader_pool_type == 'process':
-      raise NotImplementedError('not support process reader_pool_type now.')
+      if pyarrow_serialize:
+        serializer = PyArrowSerializer()
+      else:
+        serializer = PickleSerializer()
+      reader_pool = ProcessPool(workers_count, serializer)
     elif reader_pool_type == 'dummy':
-      raise NotImplementedError('not support dummy reader_pool_type now.')
+      reader_pool = CarbonDummyPool()
     else:
       raise ValueError('Unknown reader_pool_type: {}'.format(reader_pool_type))
 
@@ -192,6 +228,9 @@ def make_carbon_reader(dataset_url,
       'shard_count': shard_count,
       'cache': cache,
       'transform_spec': transform_spec,
+      'late_materialization': late_materialization,
+      'decode_workers': decode_workers,
+      'metadata_cache_location': metadata_cache_location,
     }
 
     if reader_engine_params:
@@ -232,7 +271,9 @@ def make_batch_carbon_reader(dataset_url,
                              cache_type='null', cache_location=None, cache_size_limit=None,
                              cache_row_size_estimate=None, cache_extra_settings=None,
                              hdfs_driver='libhdfs3',
-                             transform_spec=None):
+                             transform_spec=None,
+                             late_materialization=False,
+                             metadata_cache_location=None):
   """
   Creates an instance of Reader for reading batches out of a non-Pycarbon Carbon store.
 
@@ -253,7 +294,9 @@ def make_batch_carbon_reader(dataset_url,
   :param schema_fields: A list of regex pattern strings. Only columns matching at least one of the
       patterns in the list will be loaded.
   :param reader_pool_type: A string denoting the reader pool type. Should be one of ['thread', 'process', 'dummy']
-      denoting a thread pool, process pool, or running everything in the master thread. Defaults to 'thread'
+      denoting a thread pool, process pool, or running everything in the master thread. Defaults to 'thread'.
+      The worker processes of a process pool send the batches as arrow IPC streams. The 'dummy' pool reads the
+      blocklets on the thread iterating the reader, when it runs out of batches.
   :param workers_count: An int for the number of workers to use in the reader pool. This only is used for the
       thread or process pool. Defaults to 10
   :param results_queue_size: Size of the results queue to store prefetched rows. Currently only applicable to
@@ -267,32 +310,48 @@ def make_batch_carbon_reader(dataset_url,
   :param predicate: instance of :class:`.PredicateBase` object to filter rows to be returned by reader. The predicate
       will be passed a pandas DataFrame object and must return a pandas Series with boolean values of matching
       dimensions.
-  :param blocklet_selector: instance of blocklet selector object to select blocklets to be read
+  :param blocklet_selector: instance of :class:`.CarbonBlockletSelectorBase` object to select blocklets to be read.
+      The blocklets that can't match the ``predicate`` by their min/max statistics are not read in any case.
   :param num_epochs: An epoch is a single pass over all rows in the dataset. Setting ``num_epochs`` to
       ``None`` will result in an infinite number of epochs.
   :param cur_shard: An int denoting the current shard number. Each node reading a shard should
       pass in a unique shard number in the range [0, shard_count). shard_count must be supplied as well.
       Defaults to None
-  :param shard_count: An int denoting the number of shards to break this dataset into. Defaults to None
-  :param cache_type: A string denoting the cache type, if desired. Options are [None, 'null', 'local-disk'] to
-      either have a null/noop cache or a cache implemented using diskcache. Caching is useful when communication
-      to the main data store is either slow or expensive and the local machine has large enough storage
-      to store entire dataset (or a partition of a dataset if shard_count is used). By default will be a null cache.
+  :param shard_count: An int denoting the number of shards to break this dataset into. Defaults to None.
+      The blocklets are assigned to the shards so that the shards have about the same size, in bytes when the
+      dataset metadata holds the sizes of the blocklets (see ``materialize_dataset_carbon``), in rows otherwise.
+  :param cache_type: A string denoting the cache type, if desired. Options are [None, 'null', 'local-disk',
+      'memory-cache', 'arrow-mmap', 'shared-memory'] to either have a null/noop cache, a cache implemented using
+      diskcache, a least recently used cache in the memory of the workers, a cache of memory mapped arrow files in
+      ``cache_location`` or a cache of arrow files in shared memory, mapped by all the readers of the host.
+      Caching is useful when communication to the main data store is either slow or expensive and the local machine
+      has large enough storage to store entire dataset (or a partition of a dataset if shard_count is used).
+      By default will be a null cache.
   :param cache_location: A string denoting the location or path of the cache.
   :param cache_size_limit: An int specifying the size limit of the cache in bytes
   :param cache_row_size_estimate: An int specifying the estimated size of a row in the dataset
   :param cache_extra_settings: A dictionary of extra settings to pass to the cache implementation,
   :param hdfs_driver: A string denoting the hdfs driver to use (if using a dataset on hdfs). Current choices are
       libhdfs (java through JNI) or libhdfs3 (C++)
-  :param transform_spec: An instance of :class:`~petastorm.transform.TransformSpec` object defining how a record
-      is transformed after it is loaded and decoded. The transformation occurs on a worker thread/process (depends
-      on the ``reader_pool_type`` value).
+  :param transform_spec: An instance of :class:`~petastorm.transform.TransformSpec` object defining how a batch
+      of rows is transformed after it is loaded. The transformation occurs on a worker thread/process (depends
+      on the ``reader_pool_type`` value). The ``func`` of a :class:`~pycarbon.core.carbon_transform.ArrowTransformSpec`
+      is given the ``pyarrow.Table`` of the rows, the one of a ``TransformSpec`` a pandas data frame. A spec without
+      ``func`` only removes the ``removed_fields`` columns, which are then not even read.
+  :param late_materialization: When a ``predicate`` is set, read each blocklet only once: the predicate is
+      evaluated on the predicate columns of every batch and only the selected rows of the other columns are kept.
+      By default the predicate columns and the other columns are read by two separate reads of the blocklet.
+  :param metadata_cache_location: A local directory the metadata of the opened dataset (schemas, splits) is
+      persisted in, so that other readers of the dataset don't open it again. By default the opened dataset is
+      only shared by the readers of this process.
   :return: A :class:`Reader` object
   """
 
   if dataset_url is None or not isinstance(dataset_url, six.string_types):
     raise ValueError("""dataset_url must be a string""")
 
+  check_table_transform_spec(transform_spec)
+
   dataset_url = dataset_url[:-1] if dataset_url[-1] == '/' else dataset_url
   logger.debug('dataset_url: %s', dataset_url)
 
@@ -312,28 +371,22 @@ def make_batch_carbon_reader(dataset_url,
                                                                endpoint=endpoint,
                                                                proxy=proxy,
                                                                proxy_port=proxy_port,
-                                                               filesystem=filesystem)
+                                                               filesystem=filesystem,
+                                                               metadata_cache_location=metadata_cache_location)
     warnings.warn('Please use make_carbon_reader (instead of \'make_batch_carbon_reader\' function '
                   'to read this dataset as it contains unischema file.')
   except PycarbonMetadataError:
     pass
 
-  if cache_type is None or cache_type == 'null':
-    cache = NullCache()
-  elif cache_type == 'local-disk':
-    cache = LocalDiskCache(cache_location, cache_size_limit, cache_row_size_estimate,
-                           **cache_extra_settings or {})
-  elif cache_type == 'memory-cache':
-    cache = LocalMemoryCache(cache_size_limit)
-  else:
-    raise ValueError('Unknown cache_type: {}'.format(cache_type))
+  cache = make_cache(cache_type, cache_location, cache_size_limit, cache_row_size_estimate, cache_extra_settings)
 
   if reader_pool_type == 'thread':
     reader_pool = ThreadPool(workers_count, results_queue_size)
   elif reader_pool_type == 'process':
-    raise NotImplementedError('not support process reader_pool_type now.')
+    serializer = ArrowTableSerializer()
+    reader_pool = ProcessPool(workers_count, serializer)
   elif reader_pool_type == 'dummy':
-    raise NotImplementedError('not support dummy reader_pool_type now.')
+    reader_pool = CarbonDummyPool()
   else:
     raise ValueError('Unknown reader_pool_type: {}'.format(reader_pool_type))
 
@@ -351,7 +404,41 @@ def make_batch_carbon_reader(dataset_url,
                           cur_shard=cur_shard,
                           shard_count=shard_count,
                           cache=cache,
-                          transform_spec=transform_spec)
+                          transform_spec=transform_spec,
+                          late_materialization=late_materialization,
+                          metadata_cache_location=metadata_cache_location)
+
+
+def make_cache(cache_type, cache_location=None, cache_size_limit=None, cache_row_size_estimate=None,
+               cache_extra_settings=None):
+  """Creates the cache of a reader.
+
+  :param cache_type: A string denoting the cache type, one of [None, 'null', 'local-disk', 'memory-cache',
+      'arrow-mmap', 'shared-memory']. See :func:`make_carbon_reader`.
+  :param cache_location: A string denoting the location or path of the cache.
+  :param cache_size_limit: An int specifying the size limit of the cache in bytes
+  :param cache_row_size_estimate: An int specifying the estimated size of a row in the dataset
+  :param cache_extra_settings: A dictionary of extra settings to pass to the cache implementation
+  :return: An object conforming to :class:`.CacheBase` interface
+  """
+  if cache_type is None or cache_type == 'null':
+    return NullCache()
+  elif cache_type == 'local-disk':
+    return LocalDiskCache(cache_location, cache_size_limit, cache_row_size_estimate, **cache_extra_settings or {})
+  elif cache_type == 'memory-cache':
+    return LocalMemoryCache(cache_size_limit)
+  elif cache_type == 'arrow-mmap':
+    return ArrowMmapCache(cache_location, cache_size_limit, **cache_extra_settings or {})
+  elif cache_type == 'shared-memory':
+    return SharedMemoryCache(cache_location, cache_size_limit, **cache_extra_settings or {})
+  else:
+    raise ValueError('Unknown cache_type: {}'.format(cache_type))
+
+
+def _predicate_sees_transformed_rows(worker_class, transform_spec):
+  """Whether the workers evaluate the predicate on the rows transformed by the ``func`` of a transform spec"""
+  return issubclass(worker_class, PyDictCarbonReaderWorker) and transform_spec is not None \
+      and transform_spec.func is not None
 
 
 class CarbonDataReader(object):
@@ -367,7 +454,7 @@ class CarbonDataReader(object):
                shuffle_blocklets=True, shuffle_row_drop_partitions=1,
                predicate=None, blocklet_selector=None, reader_pool=None, num_epochs=1,
                cur_shard=None, shard_count=None, cache=None, worker_class=None,
-               transform_spec=None):
+               transform_spec=None, late_materialization=False, decode_workers=None, metadata_cache_location=None):
     """Initializes a reader object.
 
     :param pyarrow_filesystem: An instance of ``pyarrow.FileSystem`` that will be used. If not specified,
@@ -391,7 +478,7 @@ class CarbonDataReader(object):
         read the remaining rows in separate reads. It is recommended to keep this number below the regular row
         group size in order to not waste reads which drop all rows.
     :param predicate: instance of predicate object to filter rows to be returned by reader.
-    :param blocklet_selector: instance of blocklet selector object to select blocklets to be read
+    :param blocklet_selector: instance of :class:`.CarbonBlockletSelectorBase` object to select blocklets to be read
     :param reader_pool: parallelization pool. ``ThreadPool(10)`` (10 threads) is used by default.
         This pool is a custom implementation used to parallelize reading data from the dataset.
         Any object from workers_pool package can be used
@@ -405,11 +492,17 @@ class CarbonDataReader(object):
     :param cache: An object conforming to :class:`.CacheBase` interface. Before loading blocklets from a carbon
         file the Reader will attempt to load these values from cache. Caching is useful when communication
         to the main data store is either slow or expensive and the local machine has large enough storage
-        to store entire dataset (or a partition of a dataset if shards are used).
+        to store entire dataset (or a partition of a dataset if shards are used). A cache entry is a column of
+        a blocklet, cached before the predicate and the row drop partitions are applied to its rows.
         By default, use the :class:`.NullCache` implementation.
 
     :param worker_class: This is the class that will be instantiated on a different thread/process. It's
         responsibility is to load and filter the data.
+    :param late_materialization: Whether the workers evaluate the predicate and read the other columns from
+        a single read of each blocklet.
+    :param decode_workers: Number of threads of each worker decoding the non scalar fields, ``None`` to decode
+        them on the worker thread. Only used by :class:`PyDictCarbonReaderWorker`.
+    :param metadata_cache_location: A local directory the metadata of the opened dataset is persisted in.
     """
 
     # 1. Open the carbon storage (dataset) & Get a list of all blocklets
@@ -435,13 +528,14 @@ class CarbonDataReader(object):
 
     self._workers_pool = reader_pool or ThreadPool(10)
     # 1. Resolve dataset path (hdfs://, file://) and open the carbon storage (dataset)
-    self.carbon_dataset = CarbonDataset(dataset_path,
-                                        key=key,
-                                        secret=secret,
-                                        endpoint=endpoint,
-                                        proxy=proxy,
-                                        proxy_port=proxy_port,
-                                        filesystem=pyarrow_filesystem)
+    self.carbon_dataset = open_carbon_dataset(dataset_path,
+                                              key=key,
+                                              secret=secret,
+                                              endpoint=endpoint,
+                                              proxy=proxy,
+                                              proxy_port=proxy_port,
+                                              filesystem=pyarrow_filesystem,
+                                              metadata_cache_location=metadata_cache_location)
     stored_schema = infer_or_load_unischema_carbon(self.carbon_dataset)
 
     # Make a schema view (a view is a Unischema containing only a subset of fields
@@ -454,7 +548,11 @@ class CarbonDataReader(object):
       self.schema = storage_schema
 
     # 2. Filter blocklets
-    filtered_blocklet_indexes = list(range(len(self.carbon_dataset.pieces)))
+    # The py-dict workers evaluate the predicate on the transformed rows: the min/max statistics of the stored
+    # values can't tell which blocklets it drops then
+    min_max_predicate = None if _predicate_sees_transformed_rows(worker_class, transform_spec) else predicate
+    filtered_blocklet_indexes = self._filter_blocklets(self.carbon_dataset, min_max_predicate, blocklet_selector,
+                                                       cur_shard, shard_count)
     worker_predicate = predicate
 
     # 3. Create a blocklet ventilator object
@@ -466,7 +564,8 @@ class CarbonDataReader(object):
 
     # 4. Start workers pool
     self._workers_pool.start(worker_class, (pyarrow_filesystem, dataset_path, storage_schema, self.ngram,
-                                            self.carbon_dataset.pieces, cache, transform_spec),
+                                            self.carbon_dataset.pieces, cache, transform_spec,
+                                            late_materialization, get_jvm_config(), decode_workers),
                              ventilator=self.ventilator)
     logger.debug('Workers pool started')
 
@@ -497,6 +596,88 @@ class CarbonDataReader(object):
   def batched_output(self):
     return self._results_queue_reader.batched_output
 
+  @staticmethod
+  def _filter_blocklets(dataset, predicate, blocklet_selector, cur_shard=None, shard_count=None):
+    """Calculates which blocklets will be read.
+
+    The following filters are applied:
+    - the blocklet selector;
+    - the min/max statistics of the blocklets, against the predicate;
+    - the shard.
+
+    :param dataset: CarbonDataset instance
+    :param predicate: instance of predicate object to filter rows to be returned by reader, evaluated on the stored
+        values. ``None`` doesn't prune any blocklet by its min/max statistics.
+    :param blocklet_selector: instance of blocklet selector object to select blocklets to be read
+    :param cur_shard: An int denoting the current shard number used.
+    :param shard_count: An int denoting the number of shard partitions there are.
+    :return: a list of indexes into the pieces of the dataset
+    """
+    selectors = []
+    if blocklet_selector:
+      if not isinstance(blocklet_selector, CarbonBlockletSelectorBase):
+        raise ValueError('blocklet_selector parameter is expected to be derived from CarbonBlockletSelectorBase')
+      selectors.append(blocklet_selector)
+    if predicate:
+      selectors.append(MinMaxBlockletSelector(predicate))
+
+    filtered_blocklet_indexes = set(range(len(dataset.pieces)))
+    for selector in selectors:
+      filtered_blocklet_indexes &= set(selector.select_blocklets(dataset))
+
+    filtered_blocklet_indexes = sorted(filtered_blocklet_indexes)
+
+    if cur_shard is not None or shard_count is not None:
+      if not isinstance(cur_shard, int) or not isinstance(shard_count, int) \
+          or shard_count < 1 or not 0 <= cur_shard < shard_count:
+        raise ValueError('cur_shard and shard_count must be ints and both specified to use sharding, '
+                         'with 0 <= cur_shard < shard_count')
+      if len(filtered_blocklet_indexes) < shard_count:
+        logger.warning('Only %d blocklets to be read by %d shards: some shards will be empty',
+                       len(filtered_blocklet_indexes), shard_count)
+      shards = CarbonDataReader._assign_blocklets_to_shards(dataset, filtered_blocklet_indexes, shard_count,
+                                                            get_blocklet_sizes_carbon(dataset))
+      filtered_blocklet_indexes = shards[cur_shard]
+
+    logger.debug('%d of %d blocklets selected', len(filtered_blocklet_indexes), len(dataset.pieces))
+    return filtered_blocklet_indexes
+
+  @staticmethod
+  def _assign_blocklets_to_shards(dataset, blocklet_indexes, shard_count, blocklet_sizes=None):
+    """Assigns each blocklet to exactly one shard, balancing the sizes of the shards.
+
+    The assignment only depends on the sizes and the split keys of the blocklets, not on the order the splits
+    were listed in, so that all the readers of a job agree on it.
+
+    :param dataset: CarbonDataset instance
+    :param blocklet_indexes: indexes of the pieces of the dataset to assign
+    :param shard_count: An int denoting the number of shard partitions there are.
+    :param blocklet_sizes: a dictionary of the size in bytes of each blocklet by split key, as returned by
+        :func:`~pycarbon.core.carbon_dataset_metadata.get_blocklet_sizes_carbon`. The number of rows of the
+        blocklets is balanced when ``None``.
+    :return: a list with the sorted list of blocklet indexes of each shard
+    """
+    pieces = dataset.pieces
+    if blocklet_sizes is None:
+      sizes = dict((index, pieces[index].num_rows) for index in blocklet_indexes)
+    else:
+      sizes = dict((index, blocklet_sizes[pieces[index].split_key]) for index in blocklet_indexes)
+    # The largest blocklets first, each to the smallest shard so far (lowest shard number on ties)
+    ordered_indexes = sorted(blocklet_indexes, key=lambda index: (-sizes[index], pieces[index].split_key, index))
+    shards = [list() for _ in range(shard_count)]
+    shard_sizes = [(0, shard) for shard in range(shard_count)]
+    for index in ordered_indexes:
+      size, shard = heapq.heappop(shard_sizes)
+      shards[shard].append(index)
+      heapq.heappush(shard_sizes, (size + sizes[index], shard))
+
+    assigned_indexes = sorted(index for shard in shards for index in shard)
+    if assigned_indexes != sorted(blocklet_indexes):
+      raise RuntimeError('Blocklets were not assigned to exactly one shard each: {} assigned, {} expected'
+                         .format(len(assigned_indexes), len(blocklet_indexes)))
+
+    return [sorted(shard) for shard in shards]
+
   @staticmethod
   def _normalize_shuffle_options(shuffle_row_drop_partitions, carbonSplit):
     """Checks that shuffle_options doesnt ask for more patitions than rows in a blocklet.
@@ -519,6 +700,13 @@ class CarbonDataReader(object):
            'shuffle_row_drop_partition': (shuffle_row_drop_partition,
                                           shuffle_row_drop_partitions)})
 
+    if isinstance(self._workers_pool, CarbonDummyPool):
+      # The dummy pool processes the items on the thread asking for the results, there is nothing to ventilate ahead
+      return SynchronousVentilator(self._workers_pool.ventilate,
+                                   items_to_ventilate,
+                                   iterations=num_epochs,
+                                   randomize_item_order=shuffle_blocklets)
+
     return ConcurrentVentilator(self._workers_pool.ventilate,
                                 items_to_ventilate,
                                 iterations=num_epochs,
@@ -544,7 +732,16 @@ class CarbonDataReader(object):
 
   @property
   def diagnostics(self):
-    return self._workers_pool.diagnostics
+    """Diagnostics of the workers pool, along with the counters of the cache of a thread or dummy pool.
+
+    The workers of a process pool read through copies of the cache, made in their own processes: the counters of
+    the cache of this process never move, so they are left out of the diagnostics of a process pool.
+    """
+    diagnostics = dict(self._workers_pool.diagnostics)
+    if not isinstance(self._workers_pool, ProcessPool):
+      # Caches exposing counters (e.g. LocalMemoryCache) add them to the diagnostics of the workers pool
+      diagnostics.update(getattr(self.cache, 'diagnostics', {}))
+    return diagnostics
 
   def __iter__(self):
     return self
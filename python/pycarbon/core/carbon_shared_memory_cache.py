@@ -0,0 +1,138 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import errno
+import fcntl
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+
+from pycarbon.core.carbon_arrow_mmap_cache import ArrowMmapCache
+
+DEFAULT_SHARED_MEMORY_CACHE_PATH = '/dev/shm/pycarbon-cache'
+
+_LOCKS_DIRECTORY = 'locks'
+_REFERENCES_DIRECTORY = 'references'
+_DIRECTORY_LOCK = 'directory.lock'
+
+
+class SharedMemoryCache(ArrowMmapCache):
+  def __init__(self, path=None, size_limit_bytes=None, cleanup=True):
+    """SharedMemoryCache keeps the arrow tables read by the workers in shared memory, for all the processes of a host.
+
+    The tables are arrow IPC files of a ``tmpfs`` directory (``/dev/shm`` by default), memory mapped read-only by
+    every process reading them: the training processes of a host reading the same dataset share a single copy of
+    each cached table.
+
+    A table missing from the cache is loaded by a single process: the others wait on a file lock of its key, then
+    map the file it wrote. The size limit applies to all the files of the directory, whatever process wrote them.
+
+    Each cache created by a reader holds a reference to the directory, released by :meth:`cleanup`. The directory is
+    removed when the last reference is released, unless ``cleanup`` is ``False``.
+
+    :param path: Path of the shared memory directory the arrow files are stored in.
+    :param size_limit_bytes: Maximal size of the shared memory to be used by the cache, on the whole host.
+                             ``None`` doesn't limit the size of the cache.
+    :param cleanup: If set to True, the directory is removed when the last cache using it is cleaned up.
+    """
+    super(SharedMemoryCache, self).__init__(path or DEFAULT_SHARED_MEMORY_CACHE_PATH, size_limit_bytes, cleanup)
+    self._reference = os.path.join(self._path, _REFERENCES_DIRECTORY, '{}.{}'.format(os.getpid(), uuid.uuid4().hex))
+    with self._directory_lock():
+      open(self._reference, 'w').close()
+
+  def _init_state(self):
+    super(SharedMemoryCache, self)._init_state()
+    for directory in [_LOCKS_DIRECTORY, _REFERENCES_DIRECTORY]:
+      try:
+        os.makedirs(os.path.join(self._path, directory))
+      except OSError:
+        # Created by another process
+        if not os.path.isdir(os.path.join(self._path, directory)):
+          raise
+
+  def __setstate__(self, state):
+    super(SharedMemoryCache, self).__setstate__(state)
+    # Only the cache of the reader holds a reference, the copies of its worker processes don't
+    self._reference = None
+
+  def _read(self, name):
+    table = super(SharedMemoryCache, self)._read(name)
+    if table is not None:
+      # The modification times order the files of all the processes from the least to the most recently used
+      try:
+        os.utime(os.path.join(self._path, name), None)
+      except OSError:
+        # Evicted by another process, the table stays mapped
+        pass
+    return table
+
+  def _fill(self, name, fill_cache_func):
+    with _file_lock(os.path.join(self._path, _LOCKS_DIRECTORY, name + '.lock')):
+      # Loaded by another process while this one was waiting for the lock
+      table = self._read(name)
+      if table is not None:
+        return table
+      return super(SharedMemoryCache, self)._fill(name, fill_cache_func)
+
+  def _write(self, name, table):
+    with self._directory_lock():
+      # Evicts from the files of all the processes
+      with self._lock:
+        self._scan_files()
+      super(SharedMemoryCache, self)._write(name, table)
+
+  def cleanup(self):
+    if self._reference is None:
+      return
+    with self._directory_lock():
+      os.remove(self._reference)
+      self._reference = None
+      if self._cleanup and not self._has_references():
+        shutil.rmtree(self._path, ignore_errors=True)
+
+  def _has_references(self):
+    """Whether a live process holds a reference to the directory, the references of dead processes are removed"""
+    references_path = os.path.join(self._path, _REFERENCES_DIRECTORY)
+    has_references = False
+    for reference in os.listdir(references_path):
+      if _is_process_alive(int(reference.split('.')[0])):
+        has_references = True
+      else:
+        os.remove(os.path.join(references_path, reference))
+    return has_references
+
+  def _directory_lock(self):
+    return _file_lock(os.path.join(self._path, _DIRECTORY_LOCK))
+
+
+@contextmanager
+def _file_lock(path):
+  """Holds an exclusive lock of a file, across the threads and the processes of the host"""
+  with open(path, 'a') as lock_file:
+    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+    try:
+      yield
+    finally:
+      fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _is_process_alive(pid):
+  try:
+    os.kill(pid, 0)
+  except OSError as e:
+    return e.errno != errno.ESRCH
+  return True
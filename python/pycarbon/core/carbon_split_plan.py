@@ -0,0 +1,166 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Persists the splits of a dataset next to its ``_common_metadata`` file, so that readers don't list them.
+
+Listing the blocklet splits of a dataset reads all its carbonindex files, which takes a request per file on an
+object store. The split plan holds the serialized splits, the names and sizes of the carbon files and a
+fingerprint of the schema of the dataset: a reader loads it with a single read, and checks it against the listing
+of the dataset directories, one request per directory. The splits are listed again when the carbon files or the
+schema of the dataset changed since the plan was written. The worker processes of a reader don't list the files
+again, the reader opening the dataset checked them.
+
+Can be run from the command line::
+
+    pycarbon-write-split-plan hdfs:///path/to/dataset
+    pycarbon-write-split-plan s3a://bucket/dataset --key AK --secret SK --endpoint http://obs.example.com
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+
+import jnius_config
+
+from pycarbon.core.carbon_arrow_utils import serialize_arrow_schema
+from pycarbon.core.carbon_fs_utils import CarbonFilesystemResolver, add_obs_arguments, get_filesystem_path, \
+  list_files_with_status
+from pycarbon.sdk.ArrowCarbonReader import ArrowCarbonReader
+
+logger = logging.getLogger(__name__)
+
+SPLIT_PLAN_FILE_NAME = '_carbon_split_plan'
+
+# Version of the content of the split plan file, a plan of another version is ignored
+SPLIT_PLAN_VERSION = 2
+
+_CARBON_FILE_EXTENSIONS = ('.carbondata', '.carbonindex', '.carbonindexmerge')
+
+
+def write_split_plan(carbon_dataset):
+  """Writes the split plan of a dataset next to its ``_common_metadata`` file.
+
+  :param carbon_dataset: :class:`~pycarbon.core.carbon.CarbonDataset` opened from a directory, not from a manifest
+  :return: the path of the split plan file
+  """
+  if str(carbon_dataset.path).endswith('.manifest'):
+    raise ValueError('The split plan of a dataset opened from a manifest can\'t be persisted')
+
+  fs_path = get_filesystem_path(carbon_dataset.path)
+  input_splits = [piece.input_split for piece in carbon_dataset.pieces]
+
+  split_plan = {
+    'version': SPLIT_PLAN_VERSION,
+    'schema_fingerprint': schema_fingerprint(carbon_dataset.schema),
+    'files': list_carbon_files(carbon_dataset.fs, fs_path),
+    'splits': base64.b64encode(ArrowCarbonReader().serializeSplits(input_splits)).decode('ascii'),
+  }
+
+  split_plan_path = _split_plan_path(fs_path)
+  with carbon_dataset.fs.open(split_plan_path, 'wb') as f:
+    f.write(json.dumps(split_plan).encode('utf-8'))
+  return split_plan_path
+
+
+def load_split_plan(fs, path, schema, check_files=True):
+  """Loads the serialized splits of a dataset from its split plan.
+
+  :param fs: the pyarrow filesystem of the dataset
+  :param path: url of the dataset directory
+  :param schema: the arrow schema of the dataset, as read from its carbon files
+  :param check_files: whether the carbon files of the dataset are listed to check the plan against them. Without
+      checking them, only a plan of another schema is known to be stale.
+  :return: the serialized splits, to be read by ``ArrowCarbonReader.readSplits``, or ``None`` if the dataset has no
+      split plan or if its split plan is stale
+  """
+  fs_path = get_filesystem_path(path)
+  try:
+    with fs.open(_split_plan_path(fs_path), 'rb') as f:
+      split_plan = json.loads(f.read().decode('utf-8'))
+  except (IOError, OSError):
+    # No split plan
+    return None
+  except ValueError as e:
+    logger.warning('Ignoring the unreadable split plan of %s: %s', path, e)
+    return None
+
+  if split_plan.get('version') != SPLIT_PLAN_VERSION:
+    logger.info('Ignoring the split plan of %s, written by another version of pycarbon', path)
+    return None
+  if split_plan['schema_fingerprint'] != schema_fingerprint(schema):
+    logger.info('Ignoring the split plan of %s, the schema of the dataset changed', path)
+    return None
+  if check_files and split_plan['files'] != list_carbon_files(fs, fs_path):
+    logger.info('Ignoring the split plan of %s, the carbon files of the dataset changed', path)
+    return None
+  return base64.b64decode(split_plan['splits'])
+
+
+def schema_fingerprint(schema):
+  """Hashes an arrow schema, metadata included"""
+  return hashlib.md5(serialize_arrow_schema(schema)).hexdigest()
+
+
+def list_carbon_files(fs, fs_path):
+  """Lists the carbondata and carbonindex files of a dataset directory, with their sizes.
+
+  A file rewritten under the same name with another size, e.g. an index file rewritten by a compaction, makes the
+  listing differ too.
+
+  The sizes come with the listing of each directory, no file is looked up on its own.
+
+  :param fs: the pyarrow filesystem of the dataset
+  :param fs_path: the path of the dataset directory in the filesystem
+  :return: a list of ``[relative path, size]`` lists, sorted by path
+  """
+  fs_path = fs_path.rstrip('/')
+  return sorted([file_path[len(fs_path):].replace(os.sep, '/').lstrip('/'), size]
+                for file_path, size, _ in list_files_with_status(fs, fs_path)
+                if file_path.endswith(_CARBON_FILE_EXTENSIONS))
+
+
+def _split_plan_path(fs_path):
+  return fs_path.rstrip('/') + '/' + SPLIT_PLAN_FILE_NAME
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Writes the split plan of a carbon dataset next to its '
+                                               '_common_metadata file')
+  parser.add_argument('dataset_url', type=str, help='url of the carbon dataset')
+  add_obs_arguments(parser)
+  parser.add_argument('-c', '--carbon-sdk-path', type=str, default=None, help='carbon sdk path')
+  args = parser.parse_args(argv)
+
+  if args.carbon_sdk_path:
+    jnius_config.set_classpath(args.carbon_sdk_path)
+
+  # The dataset module loads the split plans written by this one
+  from pycarbon.core.carbon import CarbonDataset
+
+  dataset_url = args.dataset_url.rstrip('/')
+  resolver = CarbonFilesystemResolver(dataset_url, key=args.key, secret=args.secret, endpoint=args.endpoint,
+                                      proxy=args.proxy, proxy_port=args.proxy_port)
+  carbon_dataset = CarbonDataset(dataset_url, key=args.key, secret=args.secret, endpoint=args.endpoint,
+                                 proxy=args.proxy, proxy_port=args.proxy_port, filesystem=resolver.filesystem())
+  print('Wrote the plan of {} splits to {}'.format(carbon_dataset.number_of_splits,
+                                                   write_split_plan(carbon_dataset)))
+
+
+if __name__ == '__main__':
+  main()
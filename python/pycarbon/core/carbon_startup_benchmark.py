@@ -0,0 +1,132 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+"""Measures the startup latency of a batch reader, from the import of pycarbon to the first batch read.
+
+Run it in a fresh interpreter, so that neither pycarbon nor the JVM are loaded yet::
+
+    python -m pycarbon.core.carbon_startup_benchmark file:///tmp/carbon_dataset -c carbondata-sdk.jar
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+from collections import OrderedDict
+
+import jnius_config
+
+DEFAULT_WRAPPER_COUNT = 1000
+
+_READER_CLASS_NAME = 'org.apache.carbondata.sdk.file.ArrowCarbonReader'
+
+
+def measure_startup(dataset_url, reader_pool_type='thread', workers_count=10, schema_fields=None):
+  """Measures the stages of the startup of a batch reader of a dataset.
+
+  The latency of each stage is measured from the end of the previous one: the import of the reader module, the start
+  of the JVM, the creation of the reader (listing of the splits included) and the read of the first batch.
+
+  :param dataset_url: url of the carbon dataset to read
+  :param reader_pool_type: pool type of the reader, see :func:`~pycarbon.core.carbon_reader.make_batch_carbon_reader`
+  :param workers_count: number of workers of the reader
+  :param schema_fields: columns to read, all of them if ``None``
+  :return: an ordered dict of stage name -> latency in seconds
+  """
+  latencies = OrderedDict()
+  start = time.time()
+
+  from pycarbon.core.carbon_reader import make_batch_carbon_reader
+  from pycarbon.sdk.JavaClassRegistry import is_jvm_started, java_class
+  latencies['import'] = time.time() - start
+  if is_jvm_started():
+    raise RuntimeError('The JVM was started by the import of pycarbon')
+
+  stage_start = time.time()
+  java_class(_READER_CLASS_NAME)
+  latencies['jvm_start'] = time.time() - stage_start
+
+  stage_start = time.time()
+  reader = make_batch_carbon_reader(dataset_url, reader_pool_type=reader_pool_type, workers_count=workers_count,
+                                    schema_fields=schema_fields, num_epochs=1)
+  latencies['reader_creation'] = time.time() - stage_start
+
+  try:
+    stage_start = time.time()
+    next(reader)
+    latencies['first_batch'] = time.time() - stage_start
+  finally:
+    reader.stop()
+    reader.join()
+
+  latencies['total'] = time.time() - start
+  return latencies
+
+
+def measure_wrapper_construction(wrapper_count=DEFAULT_WRAPPER_COUNT):
+  """Compares the construction of SDK wrappers with the classes of the registry to a lookup per construction.
+
+  A reader wraps one ``ArrowCarbonReader`` per split it reads, so the class lookup is paid once per split unless
+  the class is resolved once per process.
+
+  :param wrapper_count: number of wrappers to construct
+  :return: an ordered dict of construction kind -> mean latency of a construction in seconds
+  """
+  from jnius import autoclass
+  from pycarbon.sdk.ArrowCarbonReader import ArrowCarbonReader
+
+  # Both measures are taken with the JVM running and the class loaded by it
+  ArrowCarbonReader()
+
+  start = time.time()
+  for _ in range(wrapper_count):
+    autoclass(_READER_CLASS_NAME)
+  lookup_latency = (time.time() - start) / wrapper_count
+
+  start = time.time()
+  for _ in range(wrapper_count):
+    ArrowCarbonReader()
+  registry_latency = (time.time() - start) / wrapper_count
+
+  return OrderedDict([('lookup_per_construction', lookup_latency), ('registry', registry_latency)])
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Measures the latency from the import of pycarbon to the first batch '
+                                               'read from a carbon dataset')
+  parser.add_argument('dataset_url', type=str, help='url of the carbon dataset')
+  parser.add_argument('--reader-pool-type', type=str, default='thread', choices=['thread', 'process', 'dummy'],
+                      help='pool type of the reader')
+  parser.add_argument('--workers-count', type=int, default=10, help='number of workers of the reader')
+  parser.add_argument('--schema-fields', type=str, nargs='+', default=None, help='columns to read')
+  parser.add_argument('--wrapper-count', type=int, default=DEFAULT_WRAPPER_COUNT,
+                      help='number of SDK wrappers constructed to measure the class lookups')
+  parser.add_argument('-c', '--carbon-sdk-path', type=str, default=None, help='carbon sdk path')
+  args = parser.parse_args(argv)
+
+  if args.carbon_sdk_path:
+    jnius_config.set_classpath(args.carbon_sdk_path)
+
+  for stage, latency in measure_startup(args.dataset_url, args.reader_pool_type, args.workers_count,
+                                        args.schema_fields).items():
+    print('{:<24}{:10.3f} s'.format(stage, latency))
+  for kind, latency in measure_wrapper_construction(args.wrapper_count).items():
+    print('{:<24}{:10.1f} us per wrapper'.format(kind, latency * 1e6))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,66 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pyarrow as pa
+
+from petastorm.transform import TransformSpec
+
+
+class ArrowTransformSpec(TransformSpec):
+  """A :class:`~petastorm.transform.TransformSpec` whose ``func`` transforms arrow tables.
+
+  Used by the batch reader: ``func`` takes the ``pyarrow.Table`` of the rows read from a blocklet and returns a
+  ``pyarrow.Table`` (or a ``pyarrow.RecordBatch``) complying to the post-transform schema, so the rows never go
+  through pandas. A :class:`~petastorm.transform.TransformSpec` ``func`` is given a pandas data frame instead.
+  """
+
+
+def removed_column_names(transform_spec):
+  """Returns the names of the columns a transform spec removes without needing their values.
+
+  A spec without ``func`` only selects the columns of the rows: the columns it removes don't need to be read at all.
+
+  :param transform_spec: a :class:`~petastorm.transform.TransformSpec`, or ``None``
+  :return: a set of column names
+  """
+  if transform_spec is None or transform_spec.func is not None:
+    return set()
+  return set(transform_spec.removed_fields)
+
+
+def check_table_transform_spec(transform_spec):
+  """Raises a ValueError if a transform spec can't be applied to the arrow tables of the batch reader"""
+  if transform_spec is not None and transform_spec.func is None and transform_spec.edit_fields:
+    raise ValueError('A TransformSpec editing fields must have a func computing them')
+
+
+def transform_table(transform_spec, table):
+  """Applies a transform spec to an arrow table of the batch reader.
+
+  :param transform_spec: a :class:`~petastorm.transform.TransformSpec`
+  :param table: ``pyarrow.Table`` complying to the pre-transform schema
+  :return: ``pyarrow.Table`` complying to the post-transform schema
+  """
+  if transform_spec.func is None:
+    # Column selection only: the columns that are kept are passed over, no data is touched
+    removed_fields = set(transform_spec.removed_fields)
+    return pa.Table.from_arrays([column for column in table.columns if column.name not in removed_fields])
+
+  if isinstance(transform_spec, ArrowTransformSpec):
+    result = transform_spec.func(table)
+    return pa.Table.from_batches([result]) if isinstance(result, pa.RecordBatch) else result
+
+  return pa.Table.from_pandas(transform_spec.func(table.to_pandas()), preserve_index=False)
@@ -20,11 +20,26 @@ from modelarts import manifest
 from modelarts.field_name import CARBON
 
 from pycarbon.sdk.Constants import LOCAL_FILE_PREFIX
+from pycarbon.sdk.JavaClassRegistry import java_class
+
+
+class ArrowBatchMemory(object):
+  """
+  Owner of an off-heap arrow batch allocated by the java reader.
+  The memory is given back to java once the last arrow buffer referring to it is released.
+  """
+
+  def __init__(self, reader, address):
+    self.reader = reader
+    self.address = address
+
+  def __del__(self):
+    self.reader.freeArrowBatchMemory(self.address)
+
 
 class ArrowCarbonReader(object):
   def __init__(self):
-    from jnius import autoclass
-    self.readerClass = autoclass('org.apache.carbondata.sdk.file.ArrowCarbonReader')
+    self.readerClass = java_class('org.apache.carbondata.sdk.file.ArrowCarbonReader')
 
   def builder(self, input_split):
     self.input_split = input_split
@@ -35,6 +50,16 @@ class ArrowCarbonReader(object):
     self.ArrowCarbonReaderBuilder.projection(projection_list)
     return self
 
+  def filter(self, filter_expression):
+    """
+    Configure the filter expression of carbon reader
+
+    :param filter_expression: java ``Expression`` to filter the rows with
+    :return: updated ArrowCarbonReader
+    """
+    self.ArrowCarbonReaderBuilder.filter(filter_expression)
+    return self
+
   def withHadoopConf(self, key, value):
     if "fs.s3a.access.key" == key:
       self.ak = value
@@ -59,9 +84,7 @@ class ArrowCarbonReader(object):
     return self
 
   def getSplits(self, is_blocklet_split):
-    from jnius import autoclass
-
-    java_list_class = autoclass('java.util.ArrayList')
+    java_list_class = java_class('java.util.ArrayList')
 
     if str(self.input_split).endswith(".manifest"):
       if str(self.input_split).startswith(LOCAL_FILE_PREFIX):
@@ -85,13 +108,69 @@ class ArrowCarbonReader(object):
     else:
       return self.ArrowCarbonReaderBuilder.getSplits(is_blocklet_split)
 
+  def serializeSplits(self, splits):
+    """
+    Serialize the splits returned by getSplits, blocklet details included
+
+    :param splits: CarbonInputSplits of a table
+    :return: bytes of the serialized splits
+    """
+    builder_class = java_class('org.apache.carbondata.sdk.file.CarbonReaderBuilder')
+    return bytes(builder_class.serializeSplits(splits).tostring())
+
+  def readSplits(self, serialized_splits):
+    """
+    Read back the splits serialized by serializeSplits, without reading the carbonindex files of the table
+
+    :param serialized_splits: bytes of the serialized splits of the table of this builder
+    :return: CarbonInputSplits which can be read like the ones returned by getSplits
+    """
+    return self.ArrowCarbonReaderBuilder.readSplits(serialized_splits)
+
   def read(self, schema):
+    """
+    Read all the rows of the reader as an arrow table.
+    The table is backed by the off-heap memory filled by java, without copying it into python.
+
+    :param schema: CarbonData schema of the projected columns
+    :return: arrow table
+    """
     address = self.reader.readArrowBatchAddress(schema)
+    return self.wrapArrowBatch(address)
+
+  def readRange(self, schema, row_offset, row_count):
+    """
+    Read a range of the rows of the reader as an arrow table.
+    The rows after the range are not read, and the rows before it are skipped without being converted to arrow.
+
+    :param schema: CarbonData schema of the projected columns
+    :param row_offset: index of the first row to read
+    :param row_count: number of rows to read
+    :return: arrow table, with less than row_count rows if the reader runs out of rows
+    """
+    address = self.reader.readArrowBatchRangeAddress(schema, row_offset, row_count)
+    return self.wrapArrowBatch(address)
+
+  def readNextBatch(self, schema, max_rows):
+    """
+    Read the next rows of the reader as an arrow table, so that a split can be consumed batch by batch.
+
+    :param schema: CarbonData schema of the projected columns
+    :param max_rows: number of rows after which the batch is completed. A batch may hold up to
+      one carbon read batch more than max_rows.
+    :return: arrow table, None once all the rows are read
+    """
+    address = self.reader.readNextArrowBatchAddress(schema, max_rows)
+    if address == 0:
+      return None
+    return self.wrapArrowBatch(address)
+
+  def wrapArrowBatch(self, address):
     size = (ctypes.c_int32).from_address(address).value
-    arrowData = (ctypes.c_byte * size).from_address(address + 4)
-    rawData = bytes(arrowData)
-    self.reader.freeArrowBatchMemory(address)
-    reader = pa.RecordBatchFileReader(pa.BufferReader(rawData))
+    # the buffer keeps the memory owner alive, so java memory is freed only after
+    # the last arrow array sliced from it is garbage collected
+    buf = pa.foreign_buffer(address + 4, size, ArrowBatchMemory(self.reader, address))
+    reader = pa.RecordBatchFileReader(pa.BufferReader(buf))
     data = reader.read_all()
     return data
 
@@ -14,6 +14,8 @@
 # limitations under the License.
 
 
+from pycarbon.sdk.JavaClassRegistry import java_class
+
 class CarbonReader(object):
   """
   How to create CarbonReader:
@@ -24,8 +26,7 @@ class CarbonReader(object):
   """
 
   def __init__(self):
-    from jnius import autoclass
-    self.readerClass = autoclass('org.apache.carbondata.sdk.file.CarbonReader')
+    self.readerClass = java_class('org.apache.carbondata.sdk.file.CarbonReader')
 
   def builder(self):
     """
@@ -90,11 +91,10 @@ class CarbonReader(object):
     :param value: the value of column_name
     :return: updated CarbonReader
     """
-    from jnius import autoclass
-    equal_to_expression_class = autoclass('org.apache.carbondata.core.scan.expression.conditional.EqualToExpression')
-    data_types_class = autoclass('org.apache.carbondata.core.metadata.datatype.DataTypes')
-    column_expression_class = autoclass('org.apache.carbondata.core.scan.expression.ColumnExpression')
-    literal_expression_class = autoclass('org.apache.carbondata.core.scan.expression.LiteralExpression')
+    equal_to_expression_class = java_class('org.apache.carbondata.core.scan.expression.conditional.EqualToExpression')
+    data_types_class = java_class('org.apache.carbondata.core.metadata.datatype.DataTypes')
+    column_expression_class = java_class('org.apache.carbondata.core.scan.expression.ColumnExpression')
+    literal_expression_class = java_class('org.apache.carbondata.core.scan.expression.LiteralExpression')
 
     column_expression = column_expression_class(column_name, data_types_class.STRING)
     literal_expression = literal_expression_class(value, data_types_class.STRING)
@@ -14,6 +14,8 @@
 # limitations under the License.
 
 
+from pycarbon.sdk.JavaClassRegistry import java_class
+
 class CarbonSchemaReader(object):
   """
   How to use it:
@@ -22,9 +24,8 @@ class CarbonSchemaReader(object):
   path can be a folder, carbonindex file and carbondata file.
   """
   def __init__(self):
-    from jnius import autoclass
-    self.carbonSchemaReader = autoclass('org.apache.carbondata.sdk.file.CarbonSchemaReader')
-    self.Schema = autoclass('org.apache.carbondata.sdk.file.Schema')
+    self.carbonSchemaReader = java_class('org.apache.carbondata.sdk.file.CarbonSchemaReader')
+    self.Schema = java_class('org.apache.carbondata.sdk.file.Schema')
 
   def readSchema(self, path, getAsBuffer=False, validateSchema=False, conf=None):
     """
@@ -44,6 +45,18 @@ class CarbonSchemaReader(object):
     newSchema = schema.asOriginOrder()
     return newSchema
 
+  def getBlockletStatistics(self, data_file_path, conf=None):
+    """
+    Read the row count and the size in bytes of each blocklet of a carbondata file, from its footer only.
+    :param data_file_path: carbondata file path
+    :param conf: configuration for ak, sk, endpoint and so on.
+    :return: list of (row count, size in bytes) tuples, in blocklet order
+    """
+    if conf is None:
+      conf = java_class('org.apache.hadoop.conf.Configuration')()
+    statistics = list(self.carbonSchemaReader.getBlockletStatistics(data_file_path, conf))
+    return list(zip(statistics[0::2], statistics[1::2]))
+
   def reorderSchemaBasedOnProjection(self, columns, schema):
     fields = schema.getFields()
     updateFields = list()
@@ -14,6 +14,8 @@
 # limitations under the License.
 
 
+from pycarbon.sdk.JavaClassRegistry import java_class
+
 class CarbonWriter(object):
   """
   How to create CarbonWriter:
@@ -24,8 +26,7 @@ class CarbonWriter(object):
   5. call close() to write data to local/HDFS/S3
   """
   def __init__(self):
-    from jnius import autoclass
-    self.writerClass = autoclass('org.apache.carbondata.sdk.file.CarbonWriter')
+    self.writerClass = java_class('org.apache.carbondata.sdk.file.CarbonWriter')
 
   def builder(self):
     self.CarbonWriterBuilder = self.writerClass.builder()
@@ -13,10 +13,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+
+from pycarbon.sdk.JavaClassRegistry import java_class
+
+
 class Configuration(object):
   def __init__(self):
-    from jnius import autoclass
-    ConfigurationClass = autoclass('org.apache.hadoop.conf.Configuration')
+    ConfigurationClass = java_class('org.apache.hadoop.conf.Configuration')
     self.conf = ConfigurationClass()
 
   def set(self, key, value):
@@ -0,0 +1,52 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Registry of the java classes used by the SDK wrappers, resolved once per process.
+
+Importing pycarbon doesn't start the JVM: it is started by the first class lookup, so the classpath and the options
+of the JVM can be configured with ``jnius_config`` until then. Looking a class up by reflection is done once, the
+wrappers created for every split read only get the class from the registry.
+"""
+
+import threading
+
+import jnius_config
+
+_java_classes = dict()
+_java_classes_lock = threading.Lock()
+
+
+def java_class(class_name):
+  """Returns the python proxy of a java class, starting the JVM on the first call.
+
+  :param class_name: fully qualified name of the java class, e.g. ``'java.util.ArrayList'``
+  :return: the class returned by ``jnius.autoclass``
+  """
+  java_cls = _java_classes.get(class_name)
+  if java_cls is None:
+    with _java_classes_lock:
+      java_cls = _java_classes.get(class_name)
+      if java_cls is None:
+        # Starts the JVM on the first import of jnius
+        from jnius import autoclass
+        java_cls = autoclass(class_name)
+        _java_classes[class_name] = java_cls
+  return java_cls
+
+
+def is_jvm_started():
+  """Whether the JVM of this process is started"""
+  return jnius_config.vm_running
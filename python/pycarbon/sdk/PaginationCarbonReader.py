@@ -14,10 +14,11 @@
 # limitations under the License.
 
 
+from pycarbon.sdk.JavaClassRegistry import java_class
+
 class PaginationCarbonReader(object):
   def __init__(self):
-    from jnius import autoclass
-    self.readerClass = autoclass('org.apache.carbondata.sdk.file.PaginationCarbonReader')
+    self.readerClass = java_class('org.apache.carbondata.sdk.file.PaginationCarbonReader')
 
   def builder(self, path, table_name):
     self.PaginationCarbonReaderBuilder = self.readerClass.builder(path, table_name)
@@ -14,10 +14,11 @@
 # limitations under the License.
 
 
+from pycarbon.sdk.JavaClassRegistry import java_class
+
 class SDKUtil(object):
   def __init__(self):
-    from jnius import autoclass
-    self.SDKUtilClass = autoclass('org.apache.carbondata.sdk.file.utils.SDKUtil')
+    self.SDKUtilClass = java_class('org.apache.carbondata.sdk.file.utils.SDKUtil')
 
   def readBinary(self, path):
     return self.SDKUtilClass.readBinary(path)
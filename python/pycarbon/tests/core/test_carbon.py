@@ -14,11 +14,24 @@
 # limitations under the License.
 
 
+import json
+import pickle
+import shutil
+
 import pytest
 
 from pycarbon.core.Constants import LOCAL_FILE_PREFIX
+from pycarbon.core import carbon
 from pycarbon.core.carbon import CarbonDataset
 from pycarbon.core.carbon import CarbonDatasetPiece
+from pycarbon.core.carbon import CarbonSplitReaderPool
+from pycarbon.core.carbon import open_carbon_dataset
+from pycarbon.core.carbon import row_drop_partition_range
+from pycarbon.core import carbon_manifest
+from pycarbon.core.carbon_blocklet_selectors import MinMaxBlockletSelector
+from pycarbon.core.carbon_manifest import CarbonManifestResolver, group_sources_by_folder
+from pycarbon.core.carbon_predicates import in_range
+from pycarbon.core.carbon_split_plan import SPLIT_PLAN_FILE_NAME, load_split_plan, write_split_plan
 
 from pycarbon.sdk.ArrowCarbonReader import ArrowCarbonReader
 from pycarbon.sdk.Configuration import Configuration
@@ -85,6 +98,256 @@ def test_create_carbondataset_local(carbon_synthetic_dataset):
   assert len(carbondataset.pieces) == 2
 
 
+def test_carbondataset_row_counts(carbon_synthetic_dataset):
+  carbondataset = CarbonDataset(carbon_synthetic_dataset.url)
+  assert carbondataset.total_rows == len(carbon_synthetic_dataset.data)
+  for piece in carbondataset.pieces:
+    assert piece.num_rows == len(piece.read_all(columns=['id']))
+
+
+def test_carbondatasetpiece_iter_batches(carbon_synthetic_dataset):
+  carbondataset = CarbonDataset(carbon_synthetic_dataset.url)
+  for piece in carbondataset.pieces:
+    whole_piece = piece.read_all(columns=['id'])
+    batches = list(piece.iter_batches(columns=['id'], max_rows=10))
+
+    assert [row_id for batch in batches for row_id in batch.column(0).to_pylist()] == \
+        whole_piece.column(0).to_pylist()
+
+
+def test_row_drop_partition_range():
+  # The ranges of the partitions are contiguous and cover all the rows
+  for num_rows in [0, 1, 7, 10, 100]:
+    for num_partitions in [1, 2, 3, 7, 20]:
+      ranges = [row_drop_partition_range(num_rows, partition, num_partitions) for partition in range(num_partitions)]
+      assert sum(row_count for _, row_count in ranges) == num_rows
+      expected_offset = 0
+      for row_offset, row_count in ranges:
+        assert row_offset == expected_offset
+        expected_offset += row_count
+
+  assert row_drop_partition_range(10, 0, 3) == (0, 4)
+  assert row_drop_partition_range(10, 1, 3) == (4, 3)
+  assert row_drop_partition_range(10, 2, 3) == (7, 3)
+  assert row_drop_partition_range(10, 1, 3, extra_rows=2) == (4, 5)
+  assert row_drop_partition_range(10, 2, 3, extra_rows=2) == (7, 3)
+
+
+def test_carbondatasetpiece_read_row_drop_partition(carbon_synthetic_dataset):
+  carbondataset = CarbonDataset(carbon_synthetic_dataset.url)
+  for piece in carbondataset.pieces:
+    all_ids = piece.read_all(columns=['id']).column(0).to_pylist()
+    partition_ids = [piece.read_row_drop_partition(['id'], (partition, 3)).column(0).to_pylist()
+                     for partition in range(3)]
+    assert [row_id for ids in partition_ids for row_id in ids] == all_ids
+    assert all(ids for ids in partition_ids)
+
+
+def test_carbondatasetpiece_pickle(carbon_synthetic_dataset):
+  carbondataset = CarbonDataset(carbon_synthetic_dataset.url)
+  for piece in carbondataset.pieces:
+    unpickled_piece = pickle.loads(pickle.dumps(piece))
+    assert unpickled_piece.split_key == piece.split_key
+    assert unpickled_piece.num_rows == piece.num_rows
+    assert unpickled_piece.read_all(columns=['id']).equals(piece.read_all(columns=['id']))
+
+
+def test_open_carbon_dataset_once(carbon_synthetic_dataset, tmpdir):
+  dataset_path = tmpdir.join('dataset').strpath
+  shutil.copytree(carbon_synthetic_dataset.path, dataset_path)
+  url = 'file://' + dataset_path
+
+  carbondataset = open_carbon_dataset(url)
+  assert open_carbon_dataset(url) is carbondataset
+
+  # A change of the files of the dataset opens it again
+  open(os.path.join(dataset_path, 'new_file'), 'w').close()
+  reopened_dataset = open_carbon_dataset(url)
+  assert reopened_dataset is not carbondataset
+  assert open_carbon_dataset(url) is reopened_dataset
+
+  # So does a file rewritten under the same name
+  carbon_file_path = next(os.path.join(directory, file_name) for directory, _, file_names in os.walk(dataset_path)
+                          for file_name in file_names if file_name.endswith('.carbondata'))
+  with open(carbon_file_path, 'rb') as f:
+    content = f.read()
+  with open(carbon_file_path, 'wb') as f:
+    f.write(content)
+  modification_time = os.stat(carbon_file_path).st_mtime + 10
+  os.utime(carbon_file_path, (modification_time, modification_time))
+  assert open_carbon_dataset(url) is not reopened_dataset
+
+
+def test_open_persisted_carbon_dataset(carbon_synthetic_dataset, tmpdir):
+  metadata_cache_location = tmpdir.strpath
+  carbondataset = open_carbon_dataset(carbon_synthetic_dataset.url, metadata_cache_location=metadata_cache_location)
+  assert len(os.listdir(metadata_cache_location)) == 1
+
+  # The metadata is persisted as plain json
+  with open(os.path.join(metadata_cache_location, os.listdir(metadata_cache_location)[0])) as f:
+    persisted_state = json.load(f)
+  assert persisted_state['path'] == carbon_synthetic_dataset.url
+  assert len(persisted_state['pieces']) == len(carbondataset.pieces)
+
+  # Another process only loads the persisted dataset
+  carbon._opened_datasets.clear()
+  persisted_dataset = open_carbon_dataset(carbon_synthetic_dataset.url,
+                                          metadata_cache_location=metadata_cache_location)
+  assert persisted_dataset is not carbondataset
+  assert persisted_dataset.schema.equals(carbondataset.schema)
+  assert persisted_dataset.common_metadata_dict == carbondataset.common_metadata_dict
+  assert [piece.split_key for piece in persisted_dataset.pieces] == \
+      [piece.split_key for piece in carbondataset.pieces]
+  for persisted_piece, piece in zip(persisted_dataset.pieces, carbondataset.pieces):
+    assert persisted_piece.num_rows == piece.num_rows
+    assert persisted_piece.read_all(columns=['id']).equals(piece.read_all(columns=['id']))
+
+  # The file is named after the dataset, not after the credentials it is opened with
+  carbon._opened_datasets.clear()
+  open_carbon_dataset(carbon_synthetic_dataset.url, key='the_key', secret='the_secret',
+                      metadata_cache_location=metadata_cache_location)
+  assert len(os.listdir(metadata_cache_location)) == 1
+
+
+def test_persisted_carbon_dataset_holds_no_credentials(carbon_synthetic_dataset):
+  carbondataset = CarbonDataset(carbon_synthetic_dataset.url)
+  persisted_state = json.loads(json.dumps(carbondataset._persisted_state()))
+
+  # The credentials are given back by the caller
+  persisted_dataset = CarbonDataset._from_persisted_state(
+    dict(persisted_state, path='s3a://bucket/dataset'), key='the_key', secret='the_secret',
+    endpoint='http://obs', filesystem=carbondataset.fs)
+  assert persisted_dataset._hadoop_conf == [('fs.s3a.access.key', 'the_key'),
+                                            ('fs.s3a.secret.key', 'the_secret'),
+                                            ('fs.s3a.endpoint', 'http://obs')]
+  assert all(piece.key == 'the_key' and piece.secret == 'the_secret' for piece in persisted_dataset.pieces)
+  assert 'the_secret' not in json.dumps(persisted_dataset._persisted_state())
+
+  with pytest.raises(ValueError):
+    CarbonDataset._from_persisted_state(dict(persisted_state, version=0), filesystem=carbondataset.fs)
+
+
+def test_split_plan(carbon_synthetic_dataset, tmpdir, monkeypatch):
+  dataset_path = tmpdir.join('dataset').strpath
+  shutil.copytree(carbon_synthetic_dataset.path, dataset_path)
+  url = 'file://' + dataset_path
+
+  carbondataset = CarbonDataset(url)
+  split_plan_path = write_split_plan(carbondataset)
+  assert os.path.basename(split_plan_path) == SPLIT_PLAN_FILE_NAME
+
+  # The splits are loaded from the split plan, the carbonindex files are not read
+  def get_splits(self, is_blocklet_split):
+    raise AssertionError('The splits should not be listed')
+  monkeypatch.setattr(ArrowCarbonReader, 'getSplits', get_splits)
+  planned_dataset = CarbonDataset(url)
+  assert planned_dataset.total_rows == carbondataset.total_rows
+  assert [piece.split_key for piece in planned_dataset.pieces] == \
+      [piece.split_key for piece in carbondataset.pieces]
+  for planned_piece, piece in zip(planned_dataset.pieces, carbondataset.pieces):
+    assert planned_piece.num_rows == piece.num_rows
+    assert planned_piece.read_all(columns=['id']).equals(piece.read_all(columns=['id']))
+
+  # So are the splits looked up by the pieces unpickled in another process
+  carbon._listed_splits.clear()
+  for piece in carbondataset.pieces:
+    unpickled_piece = pickle.loads(pickle.dumps(piece))
+    assert unpickled_piece.read_all(columns=['id']).equals(piece.read_all(columns=['id']))
+  monkeypatch.undo()
+
+  # A split plan of another schema is stale
+  with open(split_plan_path) as f:
+    split_plan = json.load(f)
+  with open(split_plan_path, 'w') as f:
+    json.dump(dict(split_plan, schema_fingerprint='0'), f)
+  assert load_split_plan(carbondataset.fs, url, carbondataset.schema) is None
+  assert CarbonDataset(url).total_rows == carbondataset.total_rows
+
+  # So is a split plan of other carbon files
+  with open(split_plan_path, 'w') as f:
+    json.dump(split_plan, f)
+  assert load_split_plan(carbondataset.fs, url, carbondataset.schema) is not None
+  open(os.path.join(dataset_path, 'new_file.carbondata'), 'w').close()
+  assert load_split_plan(carbondataset.fs, url, carbondataset.schema) is None
+  # unless the files are not checked, as by the worker processes
+  assert load_split_plan(carbondataset.fs, url, carbondataset.schema, check_files=False) is not None
+
+
+def test_group_manifest_sources_by_folder():
+  source_folders = group_sources_by_folder(['s3a://bucket/b/part-0.carbondata', 's3a://bucket/a/part-0.carbondata',
+                                            's3a://bucket/b/part-1.carbondata'])
+  assert list(source_folders.items()) == [
+    ('s3a://bucket/b', ['s3a://bucket/b/part-0.carbondata', 's3a://bucket/b/part-1.carbondata']),
+    ('s3a://bucket/a', ['s3a://bucket/a/part-0.carbondata'])]
+
+
+def test_manifest_resolver(carbon_synthetic_dataset, tmpdir, monkeypatch):
+  folders = [tmpdir.join('folder_{}'.format(i)).strpath for i in range(3)]
+  sources = []
+  for folder in folders:
+    shutil.copytree(carbon_synthetic_dataset.path, folder)
+    sources.extend(os.path.join(folder, file_name) for file_name in sorted(os.listdir(folder))
+                   if file_name.endswith('.carbondata'))
+
+  manifest_paths = []
+
+  def get_sources(manifest_path, source_type, *args):
+    manifest_paths.append(manifest_path)
+    return sources
+  monkeypatch.setattr(carbon_manifest.manifest, 'getSources', get_sources)
+
+  resolver = CarbonManifestResolver(tmpdir.join('dataset.manifest').strpath, workers=2)
+  folder_splits = resolver.list_splits()
+  assert resolver.get_sources() == sources
+  # The manifest is parsed once
+  assert len(manifest_paths) == 1
+
+  carbondataset = CarbonDataset(carbon_synthetic_dataset.url)
+  assert [folder for folder, _, _ in folder_splits] == folders
+  for folder, carbon_schema, carbon_splits in folder_splits:
+    assert carbon_schema is not None
+    assert sum(split.getRowCount() for split in carbon_splits) == carbondataset.total_rows
+    assert all(folder in split.getFilePath() for split in carbon_splits)
+
+  with pytest.raises(ValueError):
+    CarbonManifestResolver('dataset.manifest', workers=0)
+
+
+def test_carbon_split_reader_pool(carbon_synthetic_dataset):
+  carbondataset = CarbonDataset(carbon_synthetic_dataset.url)
+  split_reader_pool = CarbonSplitReaderPool(max_entries=2)
+
+  piece = carbondataset.pieces[0]
+  expected = piece.read_all(columns=['id'])
+  # the same split and projection is read twice with the same pooled builder
+  for _ in range(2):
+    assert piece.read_all(columns=['id'], split_reader_pool=split_reader_pool).equals(expected)
+  assert split_reader_pool.size() == 1
+
+  piece.read_all(columns=['id', 'id2'], split_reader_pool=split_reader_pool)
+  carbondataset.pieces[1].read_all(columns=['id'], split_reader_pool=split_reader_pool)
+  assert split_reader_pool.size() == 2
+
+  split_reader_pool.close()
+  assert split_reader_pool.size() == 0
+
+
+def test_min_max_blocklet_selector(carbon_synthetic_dataset):
+  carbondataset = CarbonDataset(carbon_synthetic_dataset.url)
+  piece_ids = [piece.read_all(columns=['id']).column(0).to_pylist() for piece in carbondataset.pieces]
+  max_id = max(max(ids) for ids in piece_ids)
+
+  assert list(MinMaxBlockletSelector(in_range('id', 0, max_id + 1)).select_blocklets(carbondataset)) == \
+      list(range(len(carbondataset.pieces)))
+  assert not list(MinMaxBlockletSelector(in_range('id', max_id + 1)).select_blocklets(carbondataset))
+
+  # A blocklet holding a matching row is never pruned
+  selected = set(MinMaxBlockletSelector(in_range('id', 5, 10)).select_blocklets(carbondataset))
+  for index, ids in enumerate(piece_ids):
+    if any(5 <= row_id < 10 for row_id in ids):
+      assert index in selected
+
+
 def test_invalid_carbondatasetpiece_obs_parameters(carbon_obs_dataset):
   key = pytest.config.getoption("--access_key")
   secret = pytest.config.getoption("--secret_key")
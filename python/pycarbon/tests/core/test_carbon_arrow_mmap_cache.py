@@ -0,0 +1,111 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import pickle
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from pycarbon import make_batch_carbon_reader
+from pycarbon.core.carbon_arrow_mmap_cache import ArrowMmapCache
+
+import jnius_config
+
+jnius_config.set_classpath(pytest.config.getoption("--carbon-sdk-path"))
+
+if pytest.config.getoption("--pyspark-python") is not None and \
+    pytest.config.getoption("--pyspark-driver-python") is not None:
+  os.environ['PYSPARK_PYTHON'] = pytest.config.getoption("--pyspark-python")
+  os.environ['PYSPARK_DRIVER_PYTHON'] = pytest.config.getoption("--pyspark-driver-python")
+elif 'PYSPARK_PYTHON' in os.environ.keys() and 'PYSPARK_DRIVER_PYTHON' in os.environ.keys():
+  pass
+else:
+  raise ValueError("please set PYSPARK_PYTHON and PYSPARK_DRIVER_PYTHON variables, "
+                   "using cmd line "
+                   "--pyspark-python=PYSPARK_PYTHON_PATH --pyspark-driver-python=PYSPARK_DRIVER_PYTHON_PATH "
+                   "or set PYSPARK_PYTHON and PYSPARK_DRIVER_PYTHON in system env")
+
+
+def _table(num_rows=100):
+  return pa.Table.from_arrays([pa.array(np.arange(num_rows, dtype=np.int64))], ['id'])
+
+
+def test_cached_table_is_memory_mapped(tmpdir):
+  cache = ArrowMmapCache(tmpdir.strpath, None)
+  assert cache.get('key', _table).equals(_table())
+
+  cached = cache.get('key', lambda: pytest.fail('the table should be cached'))
+  assert cached.equals(_table())
+  assert cache.diagnostics['cache_hits'] == 1
+  assert cache.diagnostics['cache_misses'] == 1
+
+
+def test_least_recently_used_files_are_evicted(tmpdir):
+  file_size = os.path.getsize(_write_one_table(tmpdir.join('probe').strpath))
+  cache = ArrowMmapCache(tmpdir.join('cache').strpath, 2 * file_size)
+  cache.get('a', _table)
+  cache.get('b', _table)
+  cache.get('a', _table)
+  cache.get('c', _table)
+
+  assert cache.size() == 2
+  assert cache.size_bytes() == 2 * file_size
+  assert cache.diagnostics['cache_evictions'] == 1
+  assert cache.get('b', lambda: _table(1)).num_rows == 1
+
+
+def test_table_larger_than_the_limit_is_not_cached(tmpdir):
+  cache = ArrowMmapCache(tmpdir.strpath, 10)
+  assert cache.get('key', _table).num_rows == 100
+  assert cache.size() == 0
+  assert os.listdir(tmpdir.strpath) == []
+
+
+def test_files_of_a_previous_cache_are_reused(tmpdir):
+  ArrowMmapCache(tmpdir.strpath, None).get('key', _table)
+  cache = pickle.loads(pickle.dumps(ArrowMmapCache(tmpdir.strpath, None)))
+  assert cache.size() == 1
+  assert cache.get('key', lambda: _table(1)).num_rows == 100
+
+
+def test_only_tables_are_cached(tmpdir):
+  with pytest.raises(TypeError):
+    ArrowMmapCache(tmpdir.strpath, None).get('key', lambda: [{'id': 1}])
+
+
+def test_cleanup(tmpdir):
+  path = tmpdir.join('cache').strpath
+  cache = ArrowMmapCache(path, None, cleanup=True)
+  cache.get('key', _table)
+  cache.cleanup()
+  assert not os.path.exists(path)
+
+
+def test_batch_reader_with_arrow_mmap_cache(carbon_scalar_dataset, tmpdir):
+  with make_batch_carbon_reader(carbon_scalar_dataset.url, cache_type='arrow-mmap', cache_location=tmpdir.strpath,
+                                num_epochs=2) as reader:
+    ids = [row_id for batch in reader for row_id in batch.id]
+    assert reader.diagnostics['cache_hits'] > 0
+
+  assert sorted(ids) == sorted(2 * [row['id'] for row in carbon_scalar_dataset.data])
+
+
+def _write_one_table(path):
+  cache = ArrowMmapCache(path, None)
+  cache.get('probe', _table)
+  return os.path.join(path, os.listdir(path)[0])
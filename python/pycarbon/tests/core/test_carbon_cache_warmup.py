@@ -0,0 +1,116 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pytest
+
+from pycarbon import make_batch_carbon_reader
+from pycarbon.core import carbon_cache_warmup
+from pycarbon.core.carbon_cache_warmup import main, warm_cache
+from pycarbon.core.carbon_column_cache import CarbonColumnChunkReader
+from pycarbon.core.carbon_predicates import in_range
+
+import jnius_config
+
+jnius_config.set_classpath(pytest.config.getoption("--carbon-sdk-path"))
+
+if pytest.config.getoption("--pyspark-python") is not None and \
+    pytest.config.getoption("--pyspark-driver-python") is not None:
+  os.environ['PYSPARK_PYTHON'] = pytest.config.getoption("--pyspark-python")
+  os.environ['PYSPARK_DRIVER_PYTHON'] = pytest.config.getoption("--pyspark-driver-python")
+elif 'PYSPARK_PYTHON' in os.environ.keys() and 'PYSPARK_DRIVER_PYTHON' in os.environ.keys():
+  pass
+else:
+  raise ValueError("please set PYSPARK_PYTHON and PYSPARK_DRIVER_PYTHON variables, "
+                   "using cmd line "
+                   "--pyspark-python=PYSPARK_PYTHON_PATH --pyspark-driver-python=PYSPARK_DRIVER_PYTHON_PATH "
+                   "or set PYSPARK_PYTHON and PYSPARK_DRIVER_PYTHON in system env")
+
+
+def test_warmed_up_shard_is_read_from_the_cache(carbon_scalar_dataset, tmpdir):
+  updates = []
+  progress = warm_cache(carbon_scalar_dataset.url, 'arrow-mmap', tmpdir.strpath, cur_shard=1, shard_count=2,
+                        workers=3, progress_callback=updates.append)
+  assert progress.pieces == progress.total_pieces == len(updates)
+  assert progress.rows == progress.total_rows
+
+  with make_batch_carbon_reader(carbon_scalar_dataset.url, cache_type='arrow-mmap', cache_location=tmpdir.strpath,
+                                cur_shard=1, shard_count=2) as reader:
+    rows = sum(len(batch.id) for batch in reader)
+    assert reader.diagnostics['cache_misses'] == 0
+  assert rows == progress.rows
+
+
+def test_warmed_up_shard_of_a_predicate_is_read_from_the_cache(carbon_scalar_dataset, tmpdir):
+  predicate = in_range('id', 0, 50)
+  progress = warm_cache(carbon_scalar_dataset.url, 'arrow-mmap', tmpdir.strpath, cur_shard=1, shard_count=2,
+                        predicate=predicate)
+
+  with make_batch_carbon_reader(carbon_scalar_dataset.url, cache_type='arrow-mmap', cache_location=tmpdir.strpath,
+                                cur_shard=1, shard_count=2, predicate=predicate) as reader:
+    for _ in reader:
+      pass
+    assert reader.diagnostics['cache_misses'] == 0
+  assert progress.pieces == progress.total_pieces
+
+
+def test_warm_up_is_resumed(carbon_scalar_dataset, tmpdir, monkeypatch):
+  loaded_chunks = []
+  load_chunk = CarbonColumnChunkReader._load_chunk
+
+  def counting_load_chunk(self, piece, name, *args):
+    loaded_chunks.append((piece.split_key, name))
+    return load_chunk(self, piece, name, *args)
+  monkeypatch.setattr(CarbonColumnChunkReader, '_load_chunk', counting_load_chunk)
+
+  warm_cache(carbon_scalar_dataset.url, 'arrow-mmap', tmpdir.strpath, cur_shard=0, shard_count=2)
+  first_shard_chunks = set(loaded_chunks)
+  cached_files = set(os.listdir(tmpdir.strpath))
+  assert first_shard_chunks
+
+  # The blocklets of the first shard are already cached, only the ones of the other shard are loaded
+  del loaded_chunks[:]
+  main([carbon_scalar_dataset.url, '--cache-type', 'arrow-mmap', '--cache-location', tmpdir.strpath])
+  assert loaded_chunks
+  assert not first_shard_chunks & set(loaded_chunks)
+  assert cached_files < set(os.listdir(tmpdir.strpath))
+
+  # Nothing is left to load once the whole dataset is cached
+  del loaded_chunks[:]
+  main([carbon_scalar_dataset.url, '--cache-type', 'arrow-mmap', '--cache-location', tmpdir.strpath])
+  assert not loaded_chunks
+
+
+def test_main_forwards_the_obs_credentials(monkeypatch):
+  warm_cache_calls = []
+  monkeypatch.setattr(carbon_cache_warmup, 'warm_cache',
+                      lambda *args, **kwargs: warm_cache_calls.append((args, kwargs)))
+  main(['s3a://bucket/dataset', '--cache-type', 'arrow-mmap', '--cache-location', '/tmp/cache',
+        '--key', 'ak', '--secret', 'sk', '--endpoint', 'http://obs', '--proxy', 'proxy', '--proxy-port', '8080'])
+
+  (args, kwargs), = warm_cache_calls
+  assert args == ('s3a://bucket/dataset', 'arrow-mmap', '/tmp/cache')
+  assert (kwargs['key'], kwargs['secret'], kwargs['endpoint']) == ('ak', 'sk', 'http://obs')
+  assert (kwargs['proxy'], kwargs['proxy_port']) == ('proxy', '8080')
+
+
+def test_invalid_warm_up_parameters(carbon_scalar_dataset, tmpdir):
+  with pytest.raises(ValueError):
+    warm_cache(carbon_scalar_dataset.url, 'memory-cache', tmpdir.strpath)
+
+  with pytest.raises(ValueError):
+    warm_cache(carbon_scalar_dataset.url, 'arrow-mmap', tmpdir.strpath, workers=0)
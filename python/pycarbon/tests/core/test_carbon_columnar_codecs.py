@@ -0,0 +1,122 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from decimal import Decimal
+
+import numpy as np
+import pyarrow as pa
+import pytest
+from pyspark.sql.types import DecimalType, DoubleType, IntegerType, StringType
+
+from petastorm import utils
+from petastorm.codecs import NdarrayCodec, ScalarCodec
+from petastorm.unischema import Unischema, UnischemaField
+
+from pycarbon.core.carbon_columnar_codecs import decode_rows
+from pycarbon.core.carbon_decode_pool import CarbonDecodePool
+
+ColumnarSchema = Unischema('ColumnarSchema', [
+  UnischemaField('id', np.int32, (), ScalarCodec(IntegerType()), False),
+  UnischemaField('value', np.float64, (), ScalarCodec(DoubleType()), False),
+  UnischemaField('name', np.unicode_, (), ScalarCodec(StringType()), True),
+  UnischemaField('decimal', Decimal, (), ScalarCodec(DecimalType(10, 9)), False),
+  UnischemaField('matrix', np.float32, (2, 3), NdarrayCodec(), True),
+])
+
+
+def _encoded_table(rows):
+  arrays = []
+  for field in ColumnarSchema.fields.values():
+    encoded = [None if row[field.name] is None else field.codec.encode(field, row[field.name]) for row in rows]
+    if isinstance(field.codec, NdarrayCodec):
+      encoded = [None if value is None else bytes(value) for value in encoded]
+    elif field.numpy_dtype is Decimal:
+      encoded = [str(value) for value in encoded]
+    arrays.append(pa.array(encoded))
+  return pa.Table.from_arrays(arrays, list(ColumnarSchema.fields.keys()))
+
+
+def _assert_rows_equal(actual_rows, expected_rows):
+  assert len(actual_rows) == len(expected_rows)
+  for actual, expected in zip(actual_rows, expected_rows):
+    assert set(actual.keys()) == set(expected.keys())
+    for name in expected:
+      if isinstance(expected[name], np.ndarray):
+        np.testing.assert_array_equal(actual[name], expected[name])
+        assert actual[name].dtype == expected[name].dtype
+      else:
+        assert actual[name] == expected[name]
+        assert type(actual[name]) == type(expected[name])
+
+
+@pytest.mark.parametrize('with_nulls', [False, True])
+def test_decode_rows_like_decode_row(with_nulls):
+  rows = [{'id': np.int32(i),
+           'value': i / 3.0,
+           'name': None if with_nulls and i % 2 else u'name_{}'.format(i),
+           'decimal': Decimal('0.{}'.format(i)),
+           'matrix': None if with_nulls and i % 3 else np.random.rand(2, 3).astype(np.float32)}
+          for i in range(10)]
+  table = _encoded_table(rows)
+  column_names = list(ColumnarSchema.fields.keys())
+
+  expected_rows = [utils.decode_row(row, ColumnarSchema) for row in table.to_pandas().to_dict('records')]
+  _assert_rows_equal(decode_rows(table, column_names, ColumnarSchema), expected_rows)
+
+  for batch in table.to_batches():
+    _assert_rows_equal(decode_rows(batch, ['id', 'matrix'], ColumnarSchema),
+                       [dict((name, row[name]) for name in ['id', 'matrix']) for row in expected_rows])
+
+
+@pytest.mark.parametrize('decode_workers', [1, 3, 20])
+def test_decode_rows_with_a_decode_pool(decode_workers):
+  rows = [{'id': np.int32(i), 'value': i / 3.0, 'name': u'name_{}'.format(i), 'decimal': Decimal('0.{}'.format(i)),
+           'matrix': np.random.rand(2, 3).astype(np.float32)}
+          for i in range(10)]
+  table = _encoded_table(rows)
+  column_names = list(ColumnarSchema.fields.keys())
+
+  decode_pool = CarbonDecodePool(decode_workers)
+  try:
+    _assert_rows_equal(decode_rows(table, column_names, ColumnarSchema, decode_pool),
+                       decode_rows(table, column_names, ColumnarSchema))
+  finally:
+    decode_pool.shutdown()
+
+
+def test_invalid_decode_workers():
+  for decode_workers in [0, -1, 1.5]:
+    with pytest.raises(ValueError):
+      CarbonDecodePool(decode_workers)
+
+
+def test_decode_rows_of_an_empty_table():
+  table = _encoded_table([])
+  assert decode_rows(table, list(ColumnarSchema.fields.keys()), ColumnarSchema) == []
+
+
+def test_decoded_ndarrays_are_writable():
+  table = _encoded_table([{'id': np.int32(0), 'value': 0.0, 'name': u'name', 'decimal': Decimal('0.1'),
+                           'matrix': np.zeros((2, 3), dtype=np.float32)}])
+  matrix = decode_rows(table, ['matrix'], ColumnarSchema)[0]['matrix']
+  matrix[0, 0] = 1
+  assert matrix[0, 0] == 1
+
+
+def test_decode_error_names_the_field():
+  table = pa.Table.from_arrays([pa.array([b'not an npy blob'])], ['matrix'])
+  with pytest.raises(utils.DecodeFieldError, match='matrix'):
+    decode_rows(table, ['matrix'], ColumnarSchema)
@@ -14,9 +14,13 @@
 # limitations under the License.
 
 
-import mock
+import os
+import shutil
+import tempfile
 import unittest
 
+import mock
+
 from pyarrow.filesystem import LocalFileSystem, S3FSWrapper
 from pyarrow.lib import ArrowIOError
 from six.moves.urllib.parse import urlparse
@@ -24,7 +28,7 @@ from six.moves.urllib.parse import urlparse
 from petastorm.hdfs.tests.test_hdfs_namenode import HC, MockHadoopConfiguration, \
   MockHdfs, MockHdfsConnector
 
-from pycarbon.core.carbon_fs_utils import CarbonFilesystemResolver
+from pycarbon.core.carbon_fs_utils import CarbonFilesystemResolver, list_files_with_status
 from pycarbon.tests import access_key, secret_key, endpoint
 
 ABS_PATH = '/abs/path'
@@ -160,5 +164,46 @@ class FilesystemResolverTest(unittest.TestCase):
     self.assertEqual('bucket' + ABS_PATH, suj.get_dataset_path())
 
 
+
+class _ListingFilesystem(object):
+  """A filesystem listing the details of the files of each directory, like the hdfs one"""
+
+  def __init__(self, entries):
+    self._entries = entries
+    self.listed_directories = []
+
+  def ls(self, path, detail=False):
+    assert detail
+    self.listed_directories.append(path)
+    return self._entries[path]
+
+
+class ListFilesWithStatusTest(unittest.TestCase):
+
+  def test_local_files(self):
+    directory = tempfile.mkdtemp()
+    try:
+      os.mkdir(os.path.join(directory, 'sub'))
+      with open(os.path.join(directory, 'sub', 'file'), 'wb') as f:
+        f.write(b'abc')
+      (path, size, modification_time), = list_files_with_status(LocalFileSystem(), directory)
+      self.assertEqual(os.path.join(directory, 'sub', 'file'), path)
+      self.assertEqual(3, size)
+      self.assertEqual(os.stat(path).st_mtime, modification_time)
+    finally:
+      shutil.rmtree(directory)
+
+  def test_one_listing_per_directory(self):
+    fs = _ListingFilesystem({
+      '/dataset': [{'name': 'hdfs://nn/dataset/a.carbondata', 'kind': 'file', 'size': 10, 'last_modified': 1},
+                   {'name': 'hdfs://nn/dataset/sub', 'kind': 'directory', 'size': 0, 'last_modified': 2}],
+      '/dataset/sub': [{'name': 'hdfs://nn/dataset/sub/b.carbonindex', 'kind': 'file', 'size': 5,
+                        'last_modified': 3}],
+    })
+    self.assertEqual([('/dataset/a.carbondata', 10, 1), ('/dataset/sub/b.carbonindex', 5, 3)],
+                     sorted(list_files_with_status(fs, '/dataset')))
+    self.assertEqual(['/dataset', '/dataset/sub'], fs.listed_directories)
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -14,10 +14,18 @@
 # limitations under the License.
 
 
+import pickle
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
 import pytest
+from petastorm.predicates import in_lambda
 
 from pycarbon import make_carbon_reader, make_batch_carbon_reader
-from pycarbon.core.carbon_local_memory_cache import LocalMemoryCache
+from pycarbon.core.carbon_column_cache import CarbonColumnChunkReader
+from pycarbon.core.carbon_local_memory_cache import LocalMemoryCache, estimate_size_bytes
 
 import os
 import jnius_config
@@ -37,18 +45,51 @@ else:
                    "or set PYSPARK_PYTHON and PYSPARK_DRIVER_PYTHON in system env")
 
 
-def test_invalid_cache_parameter(carbon_synthetic_dataset, carbon_scalar_dataset):
-  with make_carbon_reader(carbon_synthetic_dataset.url,
-                          cache_type='memory-cache',
-                          shuffle_row_drop_partitions=5) as reader:
-    with pytest.raises(RuntimeError):
-      next(reader)
+class _CountingPiece(object):
+  split_key = 'file:0'
+
+  def __init__(self):
+    self.reads = []
+
+  def read_all(self, columns, split_reader_pool=None):
+    self.reads.append(columns)
+    return pa.Table.from_arrays([pa.array(np.arange(10) * (i + 1)) for i in range(len(columns))], columns)
+
+
+def test_column_chunk_reader():
+  piece = _CountingPiece()
+  chunk_reader = CarbonColumnChunkReader(LocalMemoryCache(None), '/dataset')
+
+  assert chunk_reader.read_all(piece, ['a', 'b']).to_pydict() == {'a': list(range(10)),
+                                                                  'b': list(range(0, 20, 2))}
+  assert piece.reads == [['a', 'b']]
+
+  # Only the missing column is read, the partitions are sliced out of the cached chunks
+  partition = chunk_reader.read_row_drop_partition(piece, ['b', 'c'], (1, 2))
+  assert partition.schema.names == ['b', 'c']
+  assert partition.num_rows == 5
+  assert piece.reads == [['a', 'b'], ['c']]
+
+  assert chunk_reader.read_row_drop_partition(piece, ['a'], (0, 3), extra_rows=1).column(0).to_pylist() == \
+      [0, 1, 2, 3, 4]
+  assert len(piece.reads) == 2
+
 
-  with make_batch_carbon_reader(carbon_scalar_dataset.url,
-                                cache_type='memory-cache',
-                                shuffle_row_drop_partitions=5) as reader:
-    with pytest.raises(RuntimeError):
-      next(reader)
+def test_cache_with_predicates_and_row_drop_partitions(carbon_synthetic_dataset, carbon_scalar_dataset):
+  predicate = in_lambda(['id'], lambda id: id % 2 == 0)
+  expected_ids = set(row['id'] for row in carbon_synthetic_dataset.data if row['id'] % 2 == 0)
+  with make_carbon_reader(carbon_synthetic_dataset.url, cache_type='memory-cache', shuffle_row_drop_partitions=5,
+                          predicate=predicate, num_epochs=2) as reader:
+    ids = [row.id for row in reader]
+  assert len(ids) == 2 * len(expected_ids)
+  assert set(ids) == expected_ids
+
+  expected_ids = set(row['id'] for row in carbon_scalar_dataset.data if row['id'] % 2 == 0)
+  with make_batch_carbon_reader(carbon_scalar_dataset.url, cache_type='memory-cache', shuffle_row_drop_partitions=5,
+                                predicate=predicate, num_epochs=2) as reader:
+    ids = [row_id for batch in reader for row_id in batch.id]
+  assert len(ids) == 2 * len(expected_ids)
+  assert set(ids) == expected_ids
 
 
 def test_simple_scalar_cache():
@@ -64,3 +105,96 @@ def test_cache_cleanup():
   cache.cleanup()
 
   assert 0 == cache.size()
+
+
+def test_least_recently_used_values_are_evicted():
+  cache = LocalMemoryCache(250)
+  for key in ['a', 'b']:
+    cache.get(key, lambda: np.zeros(100, dtype=np.uint8))
+  # 'a' becomes the most recently used value
+  cache.get('a', lambda: None)
+  cache.get('c', lambda: np.zeros(100, dtype=np.uint8))
+
+  assert cache.size() == 2
+  assert cache.size_bytes() == 200
+  assert cache.get('b', lambda: 'reloaded') == 'reloaded'
+  assert cache.diagnostics['cache_evictions'] == 2
+  assert cache.diagnostics['cache_hits'] == 1
+  assert cache.diagnostics['cache_misses'] == 4
+
+
+def test_value_larger_than_the_limit_is_not_cached():
+  cache = LocalMemoryCache(10)
+  value = cache.get('key', lambda: np.zeros(100, dtype=np.uint8))
+  assert value.shape == (100,)
+  assert cache.size() == 0
+
+
+def test_estimate_size_bytes():
+  table = pa.Table.from_arrays([pa.array(np.arange(10, dtype=np.int64))], ['id'])
+  assert estimate_size_bytes(table) == 80
+  assert estimate_size_bytes(table.to_batches()[0]) == 80
+  assert estimate_size_bytes([{'image': np.zeros((10, 10), dtype=np.uint8)}]) > 100
+
+
+def test_concurrent_misses_load_once():
+  cache = LocalMemoryCache(None)
+  loads = []
+
+  def load():
+    loads.append(1)
+    time.sleep(0.1)
+    return 42
+
+  results = []
+  threads = [threading.Thread(target=lambda: results.append(cache.get('key', load))) for _ in range(5)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  assert results == [42] * 5
+  assert len(loads) == 1
+  assert cache.diagnostics['cache_misses'] == 1
+  assert cache.diagnostics['cache_hits'] == 4
+
+
+def test_failed_load_is_not_cached():
+  cache = LocalMemoryCache(100)
+
+  def fail():
+    raise IOError('read failed')
+
+  with pytest.raises(IOError):
+    cache.get('key', fail)
+  assert cache.get('key', lambda: 42) == 42
+
+
+def test_pickled_cache_is_empty():
+  cache = LocalMemoryCache(100)
+  cache.get('key', lambda: 42)
+  unpickled = pickle.loads(pickle.dumps(cache))
+  assert unpickled.size() == 0
+  assert unpickled.get('key', lambda: 43) == 43
+
+
+def test_reader_diagnostics_include_cache_counters(carbon_scalar_dataset):
+  with make_batch_carbon_reader(carbon_scalar_dataset.url, cache_type='memory-cache', cache_size_limit=10 ** 9,
+                                num_epochs=2) as reader:
+    for _ in reader:
+      pass
+    diagnostics = reader.diagnostics
+
+  assert diagnostics['cache_misses'] > 0
+  assert diagnostics['cache_hits'] == diagnostics['cache_misses']
+
+
+def test_reader_diagnostics_leave_out_cache_counters_of_process_pool(carbon_scalar_dataset):
+  with make_batch_carbon_reader(carbon_scalar_dataset.url, reader_pool_type='process', workers_count=2,
+                                cache_type='memory-cache', cache_size_limit=10 ** 9, num_epochs=2) as reader:
+    for _ in reader:
+      pass
+    diagnostics = reader.diagnostics
+
+  assert 'cache_misses' not in diagnostics
+  assert 'cache_hits' not in diagnostics
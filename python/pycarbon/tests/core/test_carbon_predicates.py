@@ -17,15 +17,21 @@
 import pytest
 
 import numpy as np
+import pyarrow as pa
 from pyspark.sql import SparkSession
 from pyspark.sql.types import IntegerType
 
+from petastorm.cache import NullCache
 from petastorm.codecs import ScalarCodec
-from petastorm.predicates import in_lambda
+from petastorm.predicates import in_lambda, in_negate, in_reduce, in_set
+from petastorm.transform import TransformSpec
 from petastorm.unischema import dict_to_spark_row, Unischema, UnischemaField
 
+from pycarbon.core.carbon import CarbonDataset
+from pycarbon.core.carbon_py_dict_reader_worker import PyDictCarbonReaderWorker
 from pycarbon.core.carbon_reader import make_carbon_reader, make_batch_carbon_reader
 from pycarbon.core.carbon_dataset_metadata import materialize_dataset_carbon
+from pycarbon.core.carbon_predicates import ArrowPredicateBase, in_range, predicate_mask, to_carbon_filter
 from pycarbon.tests.core.test_carbon_common import TestSchema
 
 import os
@@ -47,12 +53,6 @@ else:
 
 
 def test_invalid_carbon_reader_predicate_parameters(carbon_synthetic_dataset):
-  with make_carbon_reader(carbon_synthetic_dataset.url,
-                          cache_type="memory-cache",
-                          predicate=in_lambda(['id2'], lambda id2: True)) as reader:
-    with pytest.raises(RuntimeError):
-      next(reader)
-
   with make_carbon_reader(carbon_synthetic_dataset.url,
                           predicate=in_lambda([], lambda x: False)) as reader:
     with pytest.raises(ValueError):
@@ -65,12 +65,6 @@ def test_invalid_carbon_reader_predicate_parameters(carbon_synthetic_dataset):
 
 
 def test_invalid_batch_carbon_reader_predicate_parameters(carbon_scalar_dataset):
-  with make_batch_carbon_reader(carbon_scalar_dataset.url,
-                                cache_type="memory-cache",
-                                predicate=in_lambda(['id2'], lambda id2: True)) as reader:
-    with pytest.raises(RuntimeError):
-      next(reader)
-
   with make_batch_carbon_reader(carbon_scalar_dataset.url,
                                 predicate=in_lambda([], lambda x: False)) as reader:
     with pytest.raises(ValueError):
@@ -128,3 +122,160 @@ def test_predicate_on_dataset(tmpdir):
     with pytest.raises(StopIteration):
       # Predicate should have selected none, so a StopIteration should be raised.
       next(reader)
+
+
+def test_predicate_with_late_materialization(carbon_synthetic_dataset):
+  predicate = in_lambda(['id'], lambda id: id % 3 == 0)
+  with make_carbon_reader(carbon_synthetic_dataset.url, predicate=predicate,
+                          shuffle_blocklets=False) as reader:
+    expected = sorted(row.id for row in reader)
+  with make_carbon_reader(carbon_synthetic_dataset.url, predicate=predicate,
+                          shuffle_blocklets=False, late_materialization=True) as reader:
+    actual = [row for row in reader]
+
+  assert expected == sorted(row.id for row in actual)
+  expected_rows = dict((row['id'], row) for row in carbon_synthetic_dataset.data)
+  for row in actual:
+    assert row.id2 == expected_rows[row.id]['id2']
+
+
+def test_batch_predicate_with_late_materialization(carbon_scalar_dataset):
+  predicate = in_lambda(['id'], lambda id: id % 3 == 0)
+  with make_batch_carbon_reader(carbon_scalar_dataset.url, predicate=predicate,
+                                late_materialization=True) as reader:
+    actual_ids = sorted(np.concatenate([batch.id for batch in reader]))
+
+  expected_ids = sorted(row['id'] for row in carbon_scalar_dataset.data if row['id'] % 3 == 0)
+  assert actual_ids == expected_ids
+
+
+def test_in_range_predicate():
+  predicate = in_range('id', 3, 5)
+  assert predicate.get_fields() == {'id'}
+  assert [predicate.do_include({'id': i}) for i in range(7)] == [False, False, False, True, True, False, False]
+  assert not predicate.do_include({'id': None})
+  assert in_range('id', upper=5, include_upper=True).do_include({'id': 5})
+  assert not in_range('id', lower=3, include_lower=False).do_include({'id': 3})
+
+  with pytest.raises(ValueError):
+    in_range('id')
+
+
+def test_to_carbon_filter():
+  field_types = {'id': 'LONG', 'id2': 'SHORT', 'id_float': 'DOUBLE', 'partition_key': 'STRING', 'matrix': 'ARRAY'}
+
+  assert to_carbon_filter(in_set([3, 1], 'id'), field_types) == ('in', 'id', (1, 3))
+  assert to_carbon_filter(in_set(['p_1'], 'partition_key'), field_types) == ('in', 'partition_key', ('p_1',))
+  assert to_carbon_filter(in_negate(in_set([1], 'id')), field_types) == \
+      ('or', ('not_in', 'id', (1,)), ('is_null', 'id'))
+  assert to_carbon_filter(in_range('id', 3, 5), field_types) == \
+      ('and', ('compare', 'id', '>=', 3), ('compare', 'id', '<', 5))
+  assert to_carbon_filter(in_negate(in_range('id_float', upper=0.5)), field_types) == \
+      ('or', ('compare', 'id_float', '>=', 0.5), ('is_null', 'id_float'))
+  assert to_carbon_filter(in_range('id_float', -np.inf, 0.5), field_types) == \
+      ('and', ('compare', 'id_float', '>=', -np.inf), ('compare', 'id_float', '<', 0.5))
+
+  # Values that the column can't hold exactly are not pushed down
+  assert to_carbon_filter(in_set(['3'], 'id'), field_types) is None
+  assert to_carbon_filter(in_range('id2', upper=2 ** 20), field_types) is None
+  assert to_carbon_filter(in_range('id', upper=3.5), field_types) is None
+  assert to_carbon_filter(in_set([1], 'matrix'), field_types) is None
+  assert to_carbon_filter(in_lambda(['id'], lambda id: id > 1), field_types) is None
+
+  # A conjunction keeps the translatable parts, a disjunction needs all of them
+  lambda_predicate = in_lambda(['id2'], lambda id2: id2 > 1)
+  assert to_carbon_filter(in_reduce([in_set([1], 'id'), lambda_predicate], all), field_types) == ('in', 'id', (1,))
+  assert to_carbon_filter(in_reduce([in_set([1], 'id'), lambda_predicate], any), field_types) is None
+  assert to_carbon_filter(in_negate(in_reduce([in_set([1], 'id'), in_set([2], 'id2')], any)), field_types) == \
+      ('and', ('or', ('not_in', 'id', (1,)), ('is_null', 'id')), ('or', ('not_in', 'id2', (2,)), ('is_null', 'id2')))
+
+
+def test_predicate_pushed_down_to_carbon(carbon_synthetic_dataset):
+  with make_carbon_reader(carbon_synthetic_dataset.url, predicate=in_range('id', 10, 20)) as reader:
+    actual_ids = sorted(row.id for row in reader)
+  assert actual_ids == list(range(10, 20))
+
+  predicate = in_reduce([in_set([1, 3, 5, 71], 'id'), in_lambda(['id2'], lambda id2: True)], all)
+  with make_carbon_reader(carbon_synthetic_dataset.url, predicate=predicate) as reader:
+    actual_ids = sorted(row.id for row in reader)
+  assert actual_ids == [i for i in [1, 3, 5, 71] if i < len(carbon_synthetic_dataset.data)]
+
+  # The infinite bounds of a double column are pushed down too
+  with make_carbon_reader(carbon_synthetic_dataset.url, predicate=in_range('id_float', -np.inf, 20.0)) as reader:
+    actual_ids = sorted(row.id for row in reader)
+  assert actual_ids == list(range(20))
+  with make_carbon_reader(carbon_synthetic_dataset.url, predicate=in_range('id_float', 10.0, np.inf)) as reader:
+    actual_ids = sorted(row.id for row in reader)
+  assert actual_ids == list(range(10, len(carbon_synthetic_dataset.data)))
+
+
+def test_predicate_on_transformed_field_is_not_pushed_down(carbon_synthetic_dataset):
+  dataset = CarbonDataset(carbon_synthetic_dataset.url)
+  predicate = in_range('id', 1010, 1020)
+
+  def make_worker(transform_spec):
+    return PyDictCarbonReaderWorker(0, None, (None, carbon_synthetic_dataset.url, TestSchema, None, dataset.pieces,
+                                              NullCache(), transform_spec, False, None, None))
+
+  # The py-dict worker evaluates the predicate on the transformed rows, not on the stored values
+  shifted_ids = TransformSpec(lambda row: dict(row, id=row['id'] + 1000))
+  assert make_worker(shifted_ids)._carbon_filter(dataset.pieces[0], predicate) is None
+  assert make_worker(TransformSpec(removed_fields=['matrix']))._carbon_filter(dataset.pieces[0], predicate) == \
+      ('and', ('compare', 'id', '>=', 1010), ('compare', 'id', '<', 1020))
+
+
+def test_predicate_on_transformed_field_does_not_prune_blocklets(carbon_synthetic_dataset):
+  # The stored ids are all below 1000: pruning the blocklets by their min/max statistics would drop them all
+  shifted_ids = TransformSpec(lambda row: dict(row, id=row['id'] + 1000))
+  with make_carbon_reader(carbon_synthetic_dataset.url, predicate=in_range('id', 1010, 1020),
+                          transform_spec=shifted_ids) as reader:
+    actual_ids = sorted(row.id for row in reader)
+  assert actual_ids == list(range(1010, 1020))
+
+
+class _EvenIds(ArrowPredicateBase):
+  def get_fields(self):
+    return {'id'}
+
+  def do_include(self, values):
+    return values['id'] % 2 == 0
+
+  def do_include_batch(self, batch):
+    return pa.array(np.asarray(batch.column(0).to_pandas()) % 2 == 0)
+
+
+def test_predicate_mask():
+  batch = pa.RecordBatch.from_arrays([pa.array([1, 2, None, 4, 5]), pa.array([u'a', None, u'c', u'd', u'e'])],
+                                     ['id', 'name'])
+
+  def mask(predicate):
+    return predicate_mask(predicate, batch).to_pylist()
+
+  # nulls are never in a range, like in do_include
+  assert mask(in_range('id', 2, 5)) == [False, True, False, True, False]
+  assert mask(in_range('name', u'b')) == [False, False, True, True, True]
+  assert mask(in_set([1, 5], 'id')) == [True, False, False, False, True]
+  assert mask(in_set([None, u'a'], 'name')) == [True, True, False, False, False]
+  assert mask(in_negate(in_set([1, 5], 'id'))) == [False, True, True, True, False]
+  assert mask(in_reduce([in_range('id', 2), in_set([u'a', u'd'], 'name')], all)) == [False, False, False, True, False]
+  assert mask(in_reduce([in_range('id', 5), in_set([u'a'], 'name')], any)) == [True, False, False, False, True]
+  assert mask(_EvenIds()) == [False, True, False, True, False]
+
+  # other predicates are given a data frame
+  assert mask(in_lambda(['name'], lambda name: name == u'c')) == [False, False, True, False, False]
+
+  # a table is evaluated batch by batch
+  table = pa.Table.from_batches([batch, batch])
+  assert predicate_mask(in_set([1, 5], 'id'), table).to_pylist() == [True, False, False, False, True] * 2
+
+
+def test_batch_reader_arrow_predicates(carbon_scalar_dataset):
+  predicate = in_reduce([in_range('id', 10), in_negate(in_set([11, 13], 'id'))], all)
+  for late_materialization in [False, True]:
+    with make_batch_carbon_reader(carbon_scalar_dataset.url, predicate=predicate,
+                                  late_materialization=late_materialization) as reader:
+      actual_ids = sorted(np.concatenate([batch.id for batch in reader]))
+
+    expected_ids = sorted(row['id'] for row in carbon_scalar_dataset.data if row['id'] >= 10 and
+                          row['id'] not in (11, 13))
+    assert actual_ids == expected_ids
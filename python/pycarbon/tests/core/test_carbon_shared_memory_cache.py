@@ -0,0 +1,112 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from pycarbon import make_batch_carbon_reader
+from pycarbon.core.carbon_shared_memory_cache import SharedMemoryCache
+
+import jnius_config
+
+jnius_config.set_classpath(pytest.config.getoption("--carbon-sdk-path"))
+
+if pytest.config.getoption("--pyspark-python") is not None and \
+    pytest.config.getoption("--pyspark-driver-python") is not None:
+  os.environ['PYSPARK_PYTHON'] = pytest.config.getoption("--pyspark-python")
+  os.environ['PYSPARK_DRIVER_PYTHON'] = pytest.config.getoption("--pyspark-driver-python")
+elif 'PYSPARK_PYTHON' in os.environ.keys() and 'PYSPARK_DRIVER_PYTHON' in os.environ.keys():
+  pass
+else:
+  raise ValueError("please set PYSPARK_PYTHON and PYSPARK_DRIVER_PYTHON variables, "
+                   "using cmd line "
+                   "--pyspark-python=PYSPARK_PYTHON_PATH --pyspark-driver-python=PYSPARK_DRIVER_PYTHON_PATH "
+                   "or set PYSPARK_PYTHON and PYSPARK_DRIVER_PYTHON in system env")
+
+
+def _table():
+  return pa.Table.from_arrays([pa.array(np.arange(100, dtype=np.int64))], ['id'])
+
+
+def test_table_is_loaded_once_by_all_the_caches(tmpdir):
+  path = tmpdir.join('shm').strpath
+  caches = [SharedMemoryCache(path) for _ in range(5)]
+  loads = []
+
+  def load():
+    loads.append(1)
+    time.sleep(0.1)
+    return _table()
+
+  results = []
+  threads = [threading.Thread(target=lambda cache=cache: results.append(cache.get('key', load))) for cache in caches]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  assert len(loads) == 1
+  assert all(table.equals(_table()) for table in results)
+  assert sum(cache.diagnostics['cache_hits'] for cache in caches) == 4
+
+
+def test_size_limit_applies_to_the_files_of_all_the_caches(tmpdir):
+  path = tmpdir.join('shm').strpath
+  first_cache = SharedMemoryCache(path)
+  first_cache.get('a', _table)
+  file_size = first_cache.size_bytes()
+
+  second_cache = SharedMemoryCache(path, 2 * file_size)
+  second_cache.get('b', _table)
+  second_cache.get('c', _table)
+  assert second_cache.diagnostics['cache_evictions'] == 1
+  assert len([name for name in os.listdir(path) if name.endswith('.arrow')]) == 2
+
+
+def test_directory_is_removed_with_the_last_reference(tmpdir):
+  path = tmpdir.join('shm').strpath
+  first_cache = SharedMemoryCache(path)
+  second_cache = SharedMemoryCache(path)
+  first_cache.get('key', _table)
+
+  first_cache.cleanup()
+  assert second_cache.get('key', lambda: pytest.fail('the table should be cached')).equals(_table())
+  second_cache.cleanup()
+  assert not os.path.exists(path)
+
+
+def test_references_of_dead_processes_are_ignored(tmpdir):
+  path = tmpdir.join('shm').strpath
+  cache = SharedMemoryCache(path)
+  # No process has this pid
+  open(os.path.join(path, 'references', '{}.stale'.format(2 ** 22 + 1)), 'w').close()
+  cache.cleanup()
+  assert not os.path.exists(path)
+
+
+def test_batch_reader_with_shared_memory_cache(carbon_scalar_dataset, tmpdir):
+  path = tmpdir.join('shm').strpath
+  with make_batch_carbon_reader(carbon_scalar_dataset.url, cache_type='shared-memory', cache_location=path,
+                                num_epochs=2) as reader:
+    ids = [row_id for batch in reader for row_id in batch.id]
+
+  assert sorted(ids) == sorted(2 * [row['id'] for row in carbon_scalar_dataset.data])
+  assert not os.path.exists(path)
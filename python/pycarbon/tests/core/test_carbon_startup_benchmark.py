@@ -0,0 +1,38 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import pytest
+
+from pycarbon.core.carbon_startup_benchmark import measure_wrapper_construction
+from pycarbon.sdk.JavaClassRegistry import is_jvm_started, java_class
+
+import jnius_config
+
+jnius_config.set_classpath(pytest.config.getoption("--carbon-sdk-path"))
+
+
+def test_java_class_is_resolved_once():
+  array_list_class = java_class('java.util.ArrayList')
+  assert is_jvm_started()
+  assert java_class('java.util.ArrayList') is array_list_class
+  assert array_list_class().size() == 0
+
+
+def test_measure_wrapper_construction():
+  latencies = measure_wrapper_construction(wrapper_count=10)
+  assert list(latencies.keys()) == ['lookup_per_construction', 'registry']
+  assert all(latency >= 0 for latency in latencies.values())
@@ -0,0 +1,104 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from petastorm.transform import TransformSpec
+
+from pycarbon.core.carbon_reader import make_carbon_reader, make_batch_carbon_reader
+from pycarbon.core.carbon_transform import ArrowTransformSpec, check_table_transform_spec, removed_column_names, \
+  transform_table
+
+import os
+import jnius_config
+
+jnius_config.set_classpath(pytest.config.getoption("--carbon-sdk-path"))
+
+if pytest.config.getoption("--pyspark-python") is not None and \
+    pytest.config.getoption("--pyspark-driver-python") is not None:
+  os.environ['PYSPARK_PYTHON'] = pytest.config.getoption("--pyspark-python")
+  os.environ['PYSPARK_DRIVER_PYTHON'] = pytest.config.getoption("--pyspark-driver-python")
+elif 'PYSPARK_PYTHON' in os.environ.keys() and 'PYSPARK_DRIVER_PYTHON' in os.environ.keys():
+  pass
+else:
+  raise ValueError("please set PYSPARK_PYTHON and PYSPARK_DRIVER_PYTHON variables, "
+                   "using cmd line "
+                   "--pyspark-python=PYSPARK_PYTHON_PATH --pyspark-driver-python=PYSPARK_DRIVER_PYTHON_PATH "
+                   "or set PYSPARK_PYTHON and PYSPARK_DRIVER_PYTHON in system env")
+
+
+def _table():
+  return pa.Table.from_arrays([pa.array([1, 2, 3]), pa.array([u'a', u'b', u'c'])], ['id', 'name'])
+
+
+def _double_ids(table):
+  ids = pa.array(np.asarray(table.column(0).to_pandas()) * 2)
+  return pa.RecordBatch.from_arrays([ids], ['id'])
+
+
+def test_transform_table():
+  table = _table()
+
+  removed = transform_table(TransformSpec(removed_fields=['name']), table)
+  assert removed.schema.names == ['id']
+  assert removed.column(0).to_pylist() == [1, 2, 3]
+
+  arrow_transformed = transform_table(ArrowTransformSpec(_double_ids, removed_fields=['name']), table)
+  assert isinstance(arrow_transformed, pa.Table)
+  assert arrow_transformed.to_pydict() == {'id': [2, 4, 6]}
+
+  def upper_names(df):
+    df['name'] = df['name'].str.upper()
+    return df
+
+  pandas_transformed = transform_table(TransformSpec(upper_names), table)
+  assert pandas_transformed.to_pydict() == {'id': [1, 2, 3], 'name': [u'A', u'B', u'C']}
+
+
+def test_removed_column_names():
+  assert removed_column_names(None) == set()
+  assert removed_column_names(TransformSpec(removed_fields=['name'])) == {'name'}
+  # a func may need the values of the columns it removes
+  assert removed_column_names(TransformSpec(lambda df: df, removed_fields=['name'])) == set()
+
+
+def test_invalid_table_transform_spec():
+  with pytest.raises(ValueError):
+    check_table_transform_spec(TransformSpec(edit_fields=[('id', np.int64, (), False)]))
+
+
+def test_batch_reader_skips_removed_columns(carbon_scalar_dataset):
+  for late_materialization in [False, True]:
+    with make_batch_carbon_reader(carbon_scalar_dataset.url, transform_spec=TransformSpec(removed_fields=['string2']),
+                                  late_materialization=late_materialization) as reader:
+      batch = next(reader)
+      assert 'string2' not in batch._fields
+      assert 'string' in batch._fields
+
+
+def test_batch_reader_arrow_transform_spec(carbon_scalar_dataset):
+  spec = ArrowTransformSpec(_double_ids, removed_fields=['float64', 'string', 'string2'])
+  with make_batch_carbon_reader(carbon_scalar_dataset.url, transform_spec=spec) as reader:
+    actual_ids = sorted(np.concatenate([batch.id for batch in reader]))
+
+  assert actual_ids == sorted(row['id'] * 2 for row in carbon_scalar_dataset.data)
+
+
+def test_arrow_transform_spec_is_not_supported_by_the_py_dict_reader(carbon_synthetic_dataset):
+  with pytest.raises(ValueError):
+    make_carbon_reader(carbon_synthetic_dataset.url, transform_spec=ArrowTransformSpec(_double_ids))
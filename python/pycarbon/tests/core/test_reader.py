@@ -14,13 +14,17 @@
 # limitations under the License.
 
 
+import collections
+import json
 from time import sleep
 
+import numpy as np
 import pytest
 
 from pycarbon.core.carbon_reader import make_carbon_reader, make_batch_carbon_reader
 from pycarbon.core.carbon_reader import CarbonDataReader
 from pycarbon.core.carbon import CarbonDataset
+from pycarbon.core.carbon_dataset_metadata import BLOCKLETS_PER_FILE_KEY, get_blocklet_sizes_carbon
 
 import os
 import jnius_config
@@ -73,8 +77,13 @@ def test_normalize_shuffle_partitions(carbon_synthetic_dataset):
   row_drop_partitions = CarbonDataReader._normalize_shuffle_options(1, dataset)
   assert row_drop_partitions == 1
 
+  # Capped by the number of rows of the largest blocklet
+  max_rows_in_blocklet = max(piece.num_rows for piece in dataset.pieces)
   row_drop_partitions = CarbonDataReader._normalize_shuffle_options(100, dataset)
-  assert row_drop_partitions == 100
+  assert row_drop_partitions == min(100, max_rows_in_blocklet)
+
+  row_drop_partitions = CarbonDataReader._normalize_shuffle_options(max_rows_in_blocklet + 1, dataset)
+  assert row_drop_partitions == max_rows_in_blocklet
 
 
 def test_bound_size_of_output_queue_size_reader(carbon_synthetic_dataset):
@@ -99,13 +108,34 @@ def test_invalid_reader_pool_type(carbon_synthetic_dataset, reader_factory):
     reader_factory(carbon_synthetic_dataset.url, reader_pool_type='bogus_pool_type')
 
 
-@pytest.mark.parametrize('reader_factory', READER_FACTORIES)
-def test_unsupported_reader_pool_type(carbon_synthetic_dataset, reader_factory):
-  with pytest.raises(NotImplementedError):
-    reader_factory(carbon_synthetic_dataset.url, reader_pool_type='process')
+def test_dummy_pool_reader(carbon_synthetic_dataset):
+  num_epochs = 2
+  with make_carbon_reader(carbon_synthetic_dataset.url, reader_pool_type='dummy', num_epochs=num_epochs) as reader:
+    actual_ids = sorted(row.id for row in reader)
+    assert actual_ids == sorted(num_epochs * [row['id'] for row in carbon_synthetic_dataset.data])
 
-  with pytest.raises(NotImplementedError):
-    reader_factory(carbon_synthetic_dataset.url, reader_pool_type='dummy')
+    # All the rows were consumed: the reader can be reset
+    reader.reset()
+    assert len(list(reader)) == num_epochs * len(carbon_synthetic_dataset.data)
+
+
+def test_dummy_pool_batch_reader(carbon_scalar_dataset):
+  with make_batch_carbon_reader(carbon_scalar_dataset.url, reader_pool_type='dummy') as reader:
+    assert reader.diagnostics['output_queue_size'] == 0
+    actual_ids = sorted(row_id for batch in reader for row_id in batch.id)
+  assert actual_ids == sorted(row['id'] for row in carbon_scalar_dataset.data)
+
+
+def test_process_pool_reader(carbon_synthetic_dataset):
+  with make_carbon_reader(carbon_synthetic_dataset.url, reader_pool_type='process', workers_count=2) as reader:
+    actual_ids = sorted(row.id for row in reader)
+  assert actual_ids == sorted(row['id'] for row in carbon_synthetic_dataset.data)
+
+
+def test_process_pool_batch_reader(carbon_scalar_dataset):
+  with make_batch_carbon_reader(carbon_scalar_dataset.url, reader_pool_type='process', workers_count=2) as reader:
+    actual_ids = sorted(row_id for batch in reader for row_id in batch.id)
+  assert actual_ids == sorted(row['id'] for row in carbon_scalar_dataset.data)
 
 
 def test_invalid_reader_engine(carbon_synthetic_dataset):
@@ -125,3 +155,70 @@ def test_invalid_obs_parameters(carbon_obs_dataset, reader_factory):
 
   with pytest.raises(ValueError):
     reader_factory(carbon_obs_dataset.wrong_url)
+
+
+def test_assign_blocklets_to_shards():
+  Piece = collections.namedtuple('Piece', ['num_rows', 'split_key'])
+  dataset = collections.namedtuple('Dataset', ['pieces'])(
+    [Piece(num_rows, 'part-{}:0'.format(i)) for i, num_rows in enumerate([100, 10, 10, 10, 10, 50, 50, 10])])
+
+  shards = CarbonDataReader._assign_blocklets_to_shards(dataset, list(range(len(dataset.pieces))), 2)
+  assert sorted(index for shard in shards for index in shard) == list(range(len(dataset.pieces)))
+  assert [sum(dataset.pieces[index].num_rows for index in shard) for shard in shards] == [130, 120]
+
+  # The assignment does not depend on the order the blocklets are listed in
+  assert CarbonDataReader._assign_blocklets_to_shards(dataset, list(reversed(range(len(dataset.pieces)))), 2) == \
+      shards
+
+
+def test_assign_blocklets_to_shards_by_size():
+  Piece = collections.namedtuple('Piece', ['num_rows', 'split_key'])
+  dataset = collections.namedtuple('Dataset', ['pieces'])(
+    [Piece(10, 'part-{}:0'.format(i)) for i in range(4)])
+  blocklet_sizes = dict(zip(['part-{}:0'.format(i) for i in range(4)], [300, 100, 100, 100]))
+
+  # The rows are balanced without sizes, the bytes with them
+  assert [len(shard) for shard in CarbonDataReader._assign_blocklets_to_shards(dataset, list(range(4)), 2)] == [2, 2]
+  assert CarbonDataReader._assign_blocklets_to_shards(dataset, list(range(4)), 2, blocklet_sizes) == \
+      [[0], [1, 2, 3]]
+
+
+def test_blocklet_metadata(carbon_synthetic_dataset):
+  dataset = CarbonDataset(carbon_synthetic_dataset.url)
+  number_of_blocklets = json.loads(dataset.common_metadata_dict[BLOCKLETS_PER_FILE_KEY].decode('utf-8'))
+  assert sum(number_of_blocklets.values()) == dataset.number_of_splits
+
+  blocklet_sizes = get_blocklet_sizes_carbon(dataset)
+  assert set(blocklet_sizes.keys()) == set(piece.split_key for piece in dataset.pieces)
+  assert all(size > 0 for size in blocklet_sizes.values())
+
+
+@pytest.mark.parametrize('reader_factory', READER_FACTORIES)
+def test_invalid_shard_parameters(carbon_synthetic_dataset, reader_factory):
+  for cur_shard, shard_count in [(0, None), (None, 2), (2, 2), (-1, 2), (0, 0)]:
+    with pytest.raises(ValueError):
+      reader_factory(carbon_synthetic_dataset.url, cur_shard=cur_shard, shard_count=shard_count)
+
+
+def test_sharded_readers_read_every_row_once(carbon_synthetic_dataset):
+  shard_count = 2
+  ids_per_shard = []
+  for cur_shard in range(shard_count):
+    with make_carbon_reader(carbon_synthetic_dataset.url, cur_shard=cur_shard, shard_count=shard_count) as reader:
+      ids_per_shard.append([row.id for row in reader])
+
+  all_ids = [row_id for ids in ids_per_shard for row_id in ids]
+  assert sorted(all_ids) == sorted(row['id'] for row in carbon_synthetic_dataset.data)
+
+
+def test_reader_with_decode_workers(carbon_synthetic_dataset):
+  with make_carbon_reader(carbon_synthetic_dataset.url, decode_workers=3, shuffle_blocklets=False) as reader:
+    rows = dict((row.id, row) for row in reader)
+
+  assert len(rows) == len(carbon_synthetic_dataset.data)
+  for expected in carbon_synthetic_dataset.data:
+    np.testing.assert_array_equal(rows[expected['id']].matrix, expected['matrix'])
+    np.testing.assert_array_equal(rows[expected['id']].image_png, expected['image_png'])
+
+  with pytest.raises(ValueError):
+    make_carbon_reader(carbon_synthetic_dataset.url, decode_workers=0)
@@ -15,6 +15,7 @@
 
 import pytest
 
+from pycarbon.sdk.ArrowCarbonReader import ArrowCarbonReader
 from pycarbon.sdk.CarbonReader import CarbonReader
 from pycarbon.sdk.PaginationCarbonReader import PaginationCarbonReader
 from pycarbon.sdk.CarbonSchemaReader import CarbonSchemaReader
@@ -513,5 +514,83 @@ def test_pagination_carbon_reader():
   # close the reader
   reader.close()
 
+
+def test_arrow_carbon_reader_outlives_reader():
+  jsonSchema = "[{stringField:string},{shortField:short},{intField:int}]"
+  path = "/tmp/data/writeCarbon" + str(time.time())
+
+  if os.path.exists(path):
+    shutil.rmtree(path)
+
+  writer = CarbonWriter() \
+    .builder() \
+    .outputPath(path) \
+    .withCsvInput(jsonSchema) \
+    .writtenBy("pycarbon") \
+    .build()
+  for i in range(0, 10):
+    from jnius import autoclass
+    arrayListClass = autoclass("java.util.ArrayList")
+    data_list = arrayListClass()
+    data_list.add("pycarbon")
+    data_list.add(str(i))
+    data_list.add(str(i * 10))
+    writer.write(data_list.toArray())
+  writer.close()
+
+  schema = CarbonSchemaReader().readSchema(path)
+  reader = ArrowCarbonReader().builder(path).build()
+  table = reader.read(schema)
+  reader.close()
+
+  # the table is backed by java off-heap memory, which must stay valid after the reader is closed
+  assert 10 == table.num_rows
+  assert sorted(table.column(2).to_pylist()) == [i * 10 for i in range(0, 10)]
+
+  shutil.rmtree(path)
+
+
+def test_arrow_carbon_reader_read_range():
+  jsonSchema = "[{stringField:string},{shortField:short},{intField:int}]"
+  path = "/tmp/data/writeCarbon" + str(time.time())
+
+  if os.path.exists(path):
+    shutil.rmtree(path)
+
+  writer = CarbonWriter() \
+    .builder() \
+    .outputPath(path) \
+    .withCsvInput(jsonSchema) \
+    .writtenBy("pycarbon") \
+    .build()
+  for i in range(0, 10):
+    from jnius import autoclass
+    arrayListClass = autoclass("java.util.ArrayList")
+    data_list = arrayListClass()
+    data_list.add("pycarbon")
+    data_list.add(str(i))
+    data_list.add(str(i * 10))
+    writer.write(data_list.toArray())
+  writer.close()
+
+  schema = CarbonSchemaReader().readSchema(path)
+  reader = ArrowCarbonReader().builder(path).build()
+  all_rows = reader.read(schema).column(2).to_pylist()
+  reader.close()
+
+  reader = ArrowCarbonReader().builder(path).build()
+  table = reader.readRange(schema, 3, 4)
+  reader.close()
+  assert table.column(2).to_pylist() == all_rows[3:7]
+
+  # a range past the last row is cut at the last row
+  reader = ArrowCarbonReader().builder(path).build()
+  table = reader.readRange(schema, 8, 5)
+  reader.close()
+  assert table.column(2).to_pylist() == all_rows[8:]
+
+  shutil.rmtree(path)
+
+
 if __name__ == '__main__':
     test_pagination_carbon_reader()
\ No newline at end of file
@@ -94,6 +94,11 @@ setup(
     license='Apache License, Version 2.0',
     extras_require=EXTRA_REQUIRE,
     entry_points={
+        'console_scripts': [
+            'pycarbon-warm-cache=pycarbon.core.carbon_cache_warmup:main',
+            'pycarbon-write-split-plan=pycarbon.core.carbon_split_plan:main',
+            'pycarbon-startup-benchmark=pycarbon.core.carbon_startup_benchmark:main',
+        ],
     },
     url='https://github.com/apache/carbondata',
     author='Apache CarbonData',
@@ -17,6 +17,7 @@
 
 package org.apache.carbondata.sdk.file;
 
+import java.util.Arrays;
 import java.util.List;
 
 import org.apache.carbondata.common.annotations.InterfaceAudience;
@@ -96,6 +97,65 @@ public class ArrowCarbonReader<T> extends CarbonReader<T> {
     return arrowConverter.copySerializeArrayToOffHeap();
   }
 
+  /**
+   * Carbon reader will fill the arrow vector with the next rows of the carbondata files,
+   * until at least maxRows rows are filled or all the rows are read.
+   * Like readArrowBatchAddress, the batch is copied to unsafe memory and its address is returned,
+   * so that a split can be consumed batch by batch instead of materializing it completely.
+   *
+   * @param carbonSchema org.apache.carbondata.sdk.file.Schema
+   * @param maxRows number of rows after which the current batch is completed
+   * @return address of the unsafe memory where arrow buffer is stored, 0 if no more rows to read
+   * @throws Exception
+   */
+  public long readNextArrowBatchAddress(Schema carbonSchema, int maxRows) throws Exception {
+    if (!hasNext()) {
+      return 0;
+    }
+    ArrowConverter arrowConverter = new ArrowConverter(carbonSchema, 0);
+    int rowCount = 0;
+    while (rowCount < maxRows && hasNext()) {
+      Object[] rows = readNextBatchRow();
+      arrowConverter.addToArrowBuffer(rows);
+      rowCount += rows.length;
+    }
+    return arrowConverter.copySerializeArrayToOffHeap();
+  }
+
+  /**
+   * Carbon reader will fill the arrow vector with the rows [rowOffset, rowOffset + rowCount) of the
+   * carbondata files only, so that a part of a blocklet can be read at the cost of that part.
+   * The rows before the range are skipped without being converted to arrow, and the rows after the
+   * range are never read. Like readArrowBatchAddress, the batch is copied to unsafe memory.
+   *
+   * @param carbonSchema org.apache.carbondata.sdk.file.Schema
+   * @param rowOffset index of the first row to fill, among the rows the reader returns
+   * @param rowCount number of rows to fill
+   * @return address of the unsafe memory where arrow buffer is stored
+   * @throws Exception
+   */
+  public long readArrowBatchRangeAddress(Schema carbonSchema, int rowOffset, int rowCount)
+      throws Exception {
+    ArrowConverter arrowConverter = new ArrowConverter(carbonSchema, 0);
+    long rowIndex = 0;
+    long rowEnd = (long) rowOffset + rowCount;
+    while (rowIndex < rowEnd && hasNext()) {
+      Object[] rows = readNextBatchRow();
+      if (rows == null) {
+        break;
+      }
+      int batchStart = (int) Math.max(rowOffset - rowIndex, 0);
+      int batchEnd = (int) Math.min(rowEnd - rowIndex, rows.length);
+      if (batchStart == 0 && batchEnd == rows.length) {
+        arrowConverter.addToArrowBuffer(rows);
+      } else if (batchStart < batchEnd) {
+        arrowConverter.addToArrowBuffer(Arrays.copyOfRange(rows, batchStart, batchEnd));
+      }
+      rowIndex += rows.length;
+    }
+    return arrowConverter.copySerializeArrayToOffHeap();
+  }
+
   /**
    * free the unsafe memory allocated , if unsafe arrow batch is used.
    *
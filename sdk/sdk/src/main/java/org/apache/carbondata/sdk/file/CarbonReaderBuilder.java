@@ -17,6 +17,10 @@
 
 package org.apache.carbondata.sdk.file;
 
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
 import java.io.IOException;
 import java.util.ArrayList;
 import java.util.List;
@@ -33,6 +37,8 @@ import org.apache.carbondata.core.datastore.impl.FileFactory;
 import org.apache.carbondata.core.index.IndexFilter;
 import org.apache.carbondata.core.index.IndexStoreManager;
 import org.apache.carbondata.core.metadata.schema.table.CarbonTable;
+import org.apache.carbondata.core.readcommitter.LatestFilesReadCommittedScope;
+import org.apache.carbondata.core.readcommitter.ReadCommittedScope;
 import org.apache.carbondata.core.scan.expression.Expression;
 import org.apache.carbondata.core.scan.model.ProjectionDimension;
 import org.apache.carbondata.core.scan.model.QueryModel;
@@ -549,4 +555,50 @@ public class CarbonReaderBuilder {
     }
     return splits.toArray(new InputSplit[splits.size()]);
   }
+
+  /**
+   * Serializes the splits listed by {@link #getSplits(boolean)}, blocklet details included,
+   * so that they can be persisted and read back by {@link #readSplits(byte[])}.
+   *
+   * @param splits CarbonInputSplits of a table
+   * @return serialized splits
+   * @throws IOException
+   */
+  public static byte[] serializeSplits(InputSplit[] splits) throws IOException {
+    ByteArrayOutputStream stream = new ByteArrayOutputStream();
+    DataOutputStream out = new DataOutputStream(stream);
+    out.writeInt(splits.length);
+    for (InputSplit split : splits) {
+      ((CarbonInputSplit) split).write(out);
+    }
+    out.close();
+    return stream.toByteArray();
+  }
+
+  /**
+   * Reads back the splits serialized by {@link #serializeSplits(InputSplit[])}.
+   * Unlike {@link #getSplits(boolean)}, the carbonindex files of the table are not read:
+   * the table path is only listed once, for the read committed scope of the splits.
+   *
+   * @param serializedSplits splits of the table of this builder, as serialized
+   * @return CarbonInputSplits which can be read like the ones returned by getSplits
+   * @throws IOException
+   */
+  public InputSplit[] readSplits(byte[] serializedSplits) throws IOException {
+    if (hadoopConf == null) {
+      hadoopConf = FileFactory.getConfiguration();
+    }
+    ReadCommittedScope readCommittedScope =
+        new LatestFilesReadCommittedScope(tablePath, hadoopConf);
+    DataInputStream in = new DataInputStream(new ByteArrayInputStream(serializedSplits));
+    InputSplit[] splits = new InputSplit[in.readInt()];
+    for (int i = 0; i < splits.length; i++) {
+      CarbonInputSplit split = new CarbonInputSplit();
+      split.readFields(in);
+      split.getSegment().setReadCommittedScope(readCommittedScope);
+      splits[i] = split;
+    }
+    in.close();
+    return splits;
+  }
 }
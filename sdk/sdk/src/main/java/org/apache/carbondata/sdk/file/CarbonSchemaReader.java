@@ -20,6 +20,7 @@ package org.apache.carbondata.sdk.file;
 import java.io.IOException;
 import java.nio.ByteBuffer;
 import java.util.ArrayList;
+import java.util.Collections;
 import java.util.List;
 import java.util.UUID;
 
@@ -40,8 +41,10 @@ import org.apache.carbondata.core.metadata.schema.table.column.CarbonDimension;
 import org.apache.carbondata.core.metadata.schema.table.column.ColumnSchema;
 import org.apache.carbondata.core.reader.CarbonFooterReaderV3;
 import org.apache.carbondata.core.reader.CarbonHeaderReader;
+import org.apache.carbondata.core.reader.ThriftReader;
 import org.apache.carbondata.core.util.CarbonUtil;
 import org.apache.carbondata.core.util.path.CarbonTablePath;
+import org.apache.carbondata.format.BlockletInfo3;
 import org.apache.carbondata.format.FileFooter3;
 import org.apache.carbondata.format.IndexHeader;
 import org.apache.carbondata.processing.loading.exception.CarbonDataLoadingException;
@@ -410,4 +413,43 @@ public class CarbonSchemaReader {
       return "Version Details are not found in carbondata file";
     }
   }
+
+  /**
+   * Read the row count and the size in bytes of each blocklet of a carbondata file,
+   * from the footer of the file only
+   *
+   * @param dataFilePath carbondata file path
+   * @param conf         hadoop configuration support, can set s3a AK,SK,
+   *                     end point and other conf with this
+   * @return the row count and the size in bytes of each blocklet, in blocklet order,
+   *         as consecutive pairs
+   * @throws IOException
+   */
+  public static long[] getBlockletStatistics(String dataFilePath, Configuration conf)
+      throws IOException {
+    long fileSize = FileFactory.getCarbonFile(dataFilePath, conf).getSize();
+    FileReader fileReader =
+        FileFactory.getFileHolder(FileFactory.getFileType(dataFilePath), conf);
+    ByteBuffer buffer =
+        fileReader.readByteBuffer(FileFactory.getUpdatedFilePath(dataFilePath), fileSize - 8, 8);
+    fileReader.finish();
+    long footerOffset = buffer.getLong();
+    ThriftReader thriftReader = new ThriftReader(dataFilePath, FileFooter3::new, conf);
+    thriftReader.open();
+    thriftReader.setReadOffset(footerOffset);
+    FileFooter3 footer = (FileFooter3) thriftReader.read();
+    thriftReader.close();
+
+    List<BlockletInfo3> blocklets = footer.getBlocklet_info_list3();
+    long[] statistics = new long[2 * blocklets.size()];
+    for (int i = 0; i < blocklets.size(); i++) {
+      // the blocklets are written one after the other, the footer follows the last one
+      long start = Collections.min(blocklets.get(i).getColumn_data_chunks_offsets());
+      long end = i + 1 < blocklets.size() ?
+          Collections.min(blocklets.get(i + 1).getColumn_data_chunks_offsets()) : footerOffset;
+      statistics[2 * i] = blocklets.get(i).getNum_rows();
+      statistics[2 * i + 1] = end - start;
+    }
+    return statistics;
+  }
 }
@@ -25,9 +25,11 @@ import java.util.List;
 import java.util.Map;
 import java.util.TimeZone;
 
+import org.apache.carbondata.core.constants.CarbonCommonConstants;
 import org.apache.carbondata.core.memory.CarbonUnsafe;
 import org.apache.carbondata.core.metadata.datatype.DataTypes;
 import org.apache.carbondata.core.metadata.datatype.Field;
+import org.apache.carbondata.core.util.CarbonProperties;
 import org.apache.carbondata.sdk.file.arrow.ArrowConverter;
 import org.apache.carbondata.sdk.file.arrow.ArrowUtils;
 
@@ -169,6 +171,71 @@ public class ArrowCarbonReaderTest extends TestCase {
       reader1.close();
 
 
+      // Read data batch by batch with address (unsafe memory)
+      ArrowCarbonReader reader3 =
+          CarbonReader.builder(path, "_temp").withBatch(4).withRowRecordReader()
+              .buildArrowReader();
+      int totalRows = 0;
+      int batches = 0;
+      long batchAddress = reader3.readNextArrowBatchAddress(carbonSchema, 4);
+      while (batchAddress != 0) {
+        int batchLength = CarbonUnsafe.getUnsafe().getInt(batchAddress);
+        byte[] batchData = new byte[batchLength];
+        CarbonUnsafe.getUnsafe().copyMemory(null, batchAddress + 4, batchData,
+            CarbonUnsafe.BYTE_ARRAY_OFFSET, batchLength);
+        bufferAllocator =
+            ArrowUtils.rootAllocator.newChildAllocator("toArrowBuffer", 0, Long.MAX_VALUE);
+        arrowRecordBatch = ArrowConverter.byteArrayToArrowBatch(batchData, bufferAllocator);
+        vectorSchemaRoot = VectorSchemaRoot
+            .create(ArrowUtils.toArrowSchema(carbonSchema, TimeZone.getDefault().getID()),
+                bufferAllocator);
+        vectorLoader = new VectorLoader(vectorSchemaRoot);
+        vectorLoader.load(arrowRecordBatch);
+        assertTrue(vectorSchemaRoot.getRowCount() <= 4);
+        totalRows += vectorSchemaRoot.getRowCount();
+        batches++;
+        arrowRecordBatch.close();
+        vectorSchemaRoot.close();
+        bufferAllocator.close();
+        reader3.freeArrowBatchMemory(batchAddress);
+        batchAddress = reader3.readNextArrowBatchAddress(carbonSchema, 4);
+      }
+      // 10 rows read in batches of 4 rows
+      assertEquals(totalRows, 10);
+      assertEquals(batches, 3);
+      reader3.close();
+
+      // Read a range of rows spanning several carbon read batches
+      ArrowCarbonReader reader4 =
+          CarbonReader.builder(path, "_temp").withBatch(4).withRowRecordReader()
+              .buildArrowReader();
+      long rangeAddress = reader4.readArrowBatchRangeAddress(carbonSchema, 3, 5);
+      int rangeLength = CarbonUnsafe.getUnsafe().getInt(rangeAddress);
+      byte[] rangeData = new byte[rangeLength];
+      CarbonUnsafe.getUnsafe().copyMemory(null, rangeAddress + 4, rangeData,
+          CarbonUnsafe.BYTE_ARRAY_OFFSET, rangeLength);
+      bufferAllocator =
+          ArrowUtils.rootAllocator.newChildAllocator("toArrowBuffer", 0, Long.MAX_VALUE);
+      arrowRecordBatch = ArrowConverter.byteArrayToArrowBatch(rangeData, bufferAllocator);
+      vectorSchemaRoot = VectorSchemaRoot
+          .create(ArrowUtils.toArrowSchema(carbonSchema, TimeZone.getDefault().getID()),
+              bufferAllocator);
+      vectorLoader = new VectorLoader(vectorSchemaRoot);
+      vectorLoader.load(arrowRecordBatch);
+      // rows 3 to 7 only
+      assertEquals(vectorSchemaRoot.getRowCount(), 5);
+      fieldVectors = vectorSchemaRoot.getFieldVectors();
+      for (int i = 0; i < vectorSchemaRoot.getRowCount(); i++) {
+        assertEquals(((SmallIntVector)fieldVectors.get(6)).get(i), i + 3);
+      }
+      arrowRecordBatch.close();
+      vectorSchemaRoot.close();
+      bufferAllocator.close();
+      reader4.freeArrowBatchMemory(rangeAddress);
+      reader4.close();
+      CarbonProperties.getInstance().addProperty(CarbonCommonConstants.DETAIL_QUERY_BATCH_SIZE,
+          String.valueOf(CarbonCommonConstants.DETAIL_QUERY_BATCH_SIZE_DEFAULT));
+
       // Read as arrow vector
       ArrowCarbonReader reader2 =
           CarbonReader.builder(path, "_temp").withRowRecordReader().buildArrowReader();
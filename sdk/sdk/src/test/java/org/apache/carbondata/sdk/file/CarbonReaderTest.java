@@ -40,7 +40,9 @@ import org.apache.carbondata.core.scan.expression.conditional.NotInExpression;
 import org.apache.carbondata.core.scan.expression.logical.AndExpression;
 import org.apache.carbondata.core.scan.expression.logical.OrExpression;
 import org.apache.carbondata.core.util.CarbonProperties;
+import org.apache.carbondata.hadoop.CarbonInputSplit;
 import org.apache.commons.io.FileUtils;
+import org.apache.hadoop.conf.Configuration;
 import org.apache.hadoop.mapreduce.InputSplit;
 import org.apache.log4j.Logger;
 import org.junit.Assert;
@@ -2932,6 +2934,84 @@ public class CarbonReaderTest extends TestCase {
     FileUtils.deleteDirectory(new File(path));
   }
 
+  @Test
+  public void testGetBlockletStatistics() throws IOException, InterruptedException {
+    String path = "./testWriteFiles/" + System.nanoTime();
+    FileUtils.deleteDirectory(new File(path));
+
+    Field[] fields = new Field[2];
+    fields[0] = new Field("name", DataTypes.STRING);
+    fields[1] = new Field("age", DataTypes.INT);
+
+    TestUtil.writeFilesAndVerify(1000 * 1000, new Schema(fields), path, null, 1, 100);
+
+    File[] dataFiles = new File(path).listFiles(new FilenameFilter() {
+      @Override
+      public boolean accept(File dir, String name) {
+        return name.endsWith("carbondata");
+      }
+    });
+    long[] statistics = CarbonSchemaReader
+        .getBlockletStatistics(dataFiles[0].getAbsolutePath(), new Configuration());
+    // one row count and one size for each of the 3 blocklets of the file
+    Assert.assertEquals(statistics.length, 6);
+
+    InputSplit[] splits = CarbonReader.builder(path).getSplits(true);
+    long totalRows = 0;
+    long totalSize = 0;
+    for (int i = 0; i < splits.length; i++) {
+      CarbonInputSplit split = (CarbonInputSplit) splits[i];
+      int blockletId = Integer.parseInt(split.getBlockletId());
+      Assert.assertEquals(statistics[2 * blockletId], split.getRowCount());
+      Assert.assertTrue(statistics[2 * blockletId + 1] > 0);
+      totalRows += statistics[2 * i];
+      totalSize += statistics[2 * i + 1];
+    }
+    Assert.assertEquals(totalRows, 1000000);
+    Assert.assertTrue(totalSize < dataFiles[0].length());
+    FileUtils.deleteDirectory(new File(path));
+  }
+
+  @Test
+  public void testReadSerializedSplits() throws IOException, InterruptedException {
+    String path = "./testWriteFiles/" + System.nanoTime();
+    FileUtils.deleteDirectory(new File(path));
+
+    Field[] fields = new Field[2];
+    fields[0] = new Field("name", DataTypes.STRING);
+    fields[1] = new Field("age", DataTypes.INT);
+
+    TestUtil.writeFilesAndVerify(1000 * 1000, new Schema(fields), path, null, 1, 100);
+
+    InputSplit[] splits = CarbonReader.builder(path).getSplits(true);
+    byte[] serializedSplits = CarbonReaderBuilder.serializeSplits(splits);
+    InputSplit[] readSplits = CarbonReader.builder(path).readSplits(serializedSplits);
+    Assert.assertEquals(splits.length, readSplits.length);
+
+    int totalCount = 0;
+    for (int k = 0; k < readSplits.length; k++) {
+      CarbonInputSplit split = (CarbonInputSplit) splits[k];
+      CarbonInputSplit readSplit = (CarbonInputSplit) readSplits[k];
+      Assert.assertEquals(split.getFilePath(), readSplit.getFilePath());
+      Assert.assertEquals(split.getBlockletId(), readSplit.getBlockletId());
+      Assert.assertEquals(split.getRowCount(), readSplit.getRowCount());
+
+      CarbonReader reader = CarbonReader
+          .builder(readSplit)
+          .build();
+      int i = 0;
+      while (reader.hasNext()) {
+        reader.readNextRow();
+        i++;
+      }
+      Assert.assertEquals(i, readSplit.getRowCount());
+      totalCount += i;
+      reader.close();
+    }
+    Assert.assertEquals(totalCount, 1000000);
+    FileUtils.deleteDirectory(new File(path));
+  }
+
   @Test
   public void testReadWithFilterNonResult() throws IOException, InterruptedException {
     String path = "./testWriteFiles";